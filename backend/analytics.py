@@ -0,0 +1,163 @@
+"""
+Resolution-time (SLA) analytics.
+
+Percentiles of time_duration_hours per module, developer, CR type and
+resolution type are computed server-side in a single $facet aggregation
+using $percentile (MongoDB 7.0+). Older servers fall back to streaming the
+resolved tickets' durations through one cursor and computing the
+percentiles in Python, since collecting the values server-side would exceed
+the 16 MB document limit on large collections. Results are cached per
+worker and reused until the ticket data version changes, i.e. until a
+ticket is created or changes status, or ANALYTICS_CACHE_SECONDS pass
+(open-ticket aging moves with the clock).
+"""
+
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from pymongo.errors import OperationFailure
+
+from database import tickets_reporting_collection, REPORTING_READS_FROM_PRIMARY
+from ticket_service import get_data_version
+from workload import OPEN_STATUSES
+
+# "unknown group operator '$percentile'" (before 7.0) and QueryFeatureNotAllowed
+# (7.0 binaries still at an older featureCompatibilityVersion)
+PERCENTILE_UNSUPPORTED_CODES = (15952, 224)
+
+# Off when reporting reads may come from a secondary lagging the data version
+ANALYTICS_CACHE_SECONDS = float(os.getenv("ANALYTICS_CACHE_SECONDS", 300)) if REPORTING_READS_FROM_PRIMARY else 0.0
+
+PERCENTILES = (0.5, 0.9, 0.99)
+DIMENSIONS = {
+    "by_module": "$module",
+    "by_developer": "$developer",
+    "by_cr_type": "$cr_type",
+    "by_resolution_type": "$resolution_type"
+}
+# Age of open tickets in hours; anything from 720h (30 days) up lands in the default bucket
+AGING_BOUNDARIES = [0, 24, 72, 168, 336, 720]
+AGING_LABELS = {0: "0-1d", 24: "1-3d", 72: "3-7d", 168: "7-14d", 336: "14-30d", "30d+": "30d+"}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _resolution_match(from_date: Optional[datetime], to_date: Optional[datetime]) -> dict:
+    match = {"status": {"$in": ["Completed", "Closed"]}, "time_duration_hours": {"$type": "number"}}
+    if from_date or to_date:
+        match["completed_on"] = {}
+        if from_date:
+            match["completed_on"]["$gte"] = from_date
+        if to_date:
+            match["completed_on"]["$lt"] = to_date
+    return match
+
+def _stats_group(key) -> dict:
+    return {"$group": {
+        "_id": key,
+        "count": {"$sum": 1},
+        "avg": {"$avg": "$time_duration_hours"},
+        "percentiles": {"$percentile": {
+            "input": "$time_duration_hours", "p": list(PERCENTILES), "method": "approximate"
+        }}
+    }}
+
+def _nearest_rank(sorted_values: list, p: float) -> float:
+    index = max(0, math.ceil(p * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def _format_row(row: dict) -> dict:
+    if "percentiles" in row:
+        p50, p90, p99 = row["percentiles"]
+    else:
+        values = sorted(row["values"])
+        p50, p90, p99 = (_nearest_rank(values, p) for p in PERCENTILES)
+    return {
+        "key": row["_id"],
+        "count": row["count"],
+        "avg_hours": round(row["avg"], 2),
+        "p50_hours": round(p50, 2),
+        "p90_hours": round(p90, 2),
+        "p99_hours": round(p99, 2)
+    }
+
+def _streamed_percentile_rows(match: dict) -> dict:
+    """Rows shaped like the $facet result, grouped in Python from a single cursor"""
+    fields = [key.lstrip("$") for key in DIMENSIONS.values()]
+    groups = {name: {} for name in DIMENSIONS}
+    overall = []
+    cursor = tickets_reporting_collection.find(
+        match, {"_id": 0, "time_duration_hours": 1, **{field: 1 for field in fields}}, batch_size=10000
+    )
+    for ticket in cursor:
+        value = ticket["time_duration_hours"]
+        overall.append(value)
+        for name, field in zip(DIMENSIONS, fields):
+            groups[name].setdefault(ticket.get(field), []).append(value)
+
+    def row(key, values):
+        return {"_id": key, "count": len(values), "avg": sum(values) / len(values), "values": values}
+
+    result = {
+        name: sorted((row(key, values) for key, values in by_key.items()), key=lambda r: -r["count"])
+        for name, by_key in groups.items()
+    }
+    result["overall"] = [row(None, overall)] if overall else []
+    return result
+
+def resolution_percentiles(from_date: Optional[datetime] = None, to_date: Optional[datetime] = None) -> dict:
+    def pipeline(group):
+        facets = {name: [group(key), {"$sort": {"count": -1}}] for name, key in DIMENSIONS.items()}
+        facets["overall"] = [group(None)]
+        return [{"$match": _resolution_match(from_date, to_date)}, {"$facet": facets}]
+
+    try:
+        result = next(tickets_reporting_collection.aggregate(pipeline(_stats_group)))
+    except OperationFailure as e:
+        # $percentile needs MongoDB 7.0; anything else (timeouts, auth) is a real failure
+        if e.code not in PERCENTILE_UNSUPPORTED_CODES:
+            raise
+        result = _streamed_percentile_rows(_resolution_match(from_date, to_date))
+
+    overall = result.pop("overall")
+    return {
+        "overall": _format_row(overall[0]) if overall else None,
+        **{name: [_format_row(row) for row in rows] for name, rows in result.items()}
+    }
+
+def open_ticket_aging() -> list:
+    rows = tickets_reporting_collection.aggregate([
+        {"$match": {"status": {"$in": list(OPEN_STATUSES)}, "cr_date": {"$type": "date"}}},
+        {"$bucket": {
+            "groupBy": {"$dateDiff": {"startDate": "$cr_date", "endDate": "$$NOW", "unit": "hour"}},
+            "boundaries": AGING_BOUNDARIES,
+            "default": "30d+",
+            "output": {"count": {"$sum": 1}}
+        }}
+    ])
+    counts = {row["_id"]: row["count"] for row in rows}
+    return [{"bucket": AGING_LABELS[key], "count": counts.get(key, 0)} for key in AGING_BOUNDARIES[:-1] + ["30d+"]]
+
+def get_resolution_analytics(from_date: Optional[datetime] = None, to_date: Optional[datetime] = None) -> dict:
+    version = get_data_version("tickets")
+    cache_key = (from_date, to_date)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+    if cached and cached["version"] == version and cached["expires_at"] > now:
+        return {**cached["result"], "cached": True}
+
+    result = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "resolution_hours": resolution_percentiles(from_date, to_date),
+        "open_aging": open_ticket_aging()
+    }
+    with _cache_lock:
+        if len(_cache) > 64:
+            _cache.clear()
+        _cache[cache_key] = {"version": version, "expires_at": now + ANALYTICS_CACHE_SECONDS, "result": result}
+    return {**result, "cached": False}
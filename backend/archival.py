@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Hot/cold archival of closed tickets.
+
+Tickets that have been Closed for longer than ARCHIVE_AFTER_DAYS are moved
+from the tickets collection to tickets_archive in batches, keeping the hot
+collection and its indexes small. Each move copies the batch, then deletes
+only the tickets that did not change since they were read, and records a
+tombstone so delta-sync clients drop them. A pass holds the "archival"
+lease (leases.py), so only one worker or manual run archives at a time.
+
+Runs periodically inside the API process, or manually:
+    python archival.py
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import DeleteOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from database import tickets_collection, tickets_archive_collection
+from leases import acquire_lease, release_lease
+from ticket_service import record_tombstones, bump_data_version
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 180))
+ARCHIVAL_BATCH_SIZE = int(os.getenv("ARCHIVAL_BATCH_SIZE", 500))
+ARCHIVAL_INTERVAL_SECONDS = float(os.getenv("ARCHIVAL_INTERVAL_SECONDS", 3600))
+# Renewed before every batch; a crashed run's lease is taken over after this long
+ARCHIVAL_LEASE_SECONDS = float(os.getenv("ARCHIVAL_LEASE_SECONDS", 300))
+ARCHIVAL_LEASE = "archival"
+DUPLICATE_KEY = 11000
+
+def archivable_query(now: datetime) -> dict:
+    cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+    return {
+        "status": "Closed",
+        "$or": [
+            {"closed_at": {"$lt": cutoff}},
+            # Closed before closed_at was recorded
+            {"closed_at": {"$exists": False}, "updated_at": {"$lt": cutoff}}
+        ]
+    }
+
+def archive_batch(tickets: list) -> int:
+    """Move one batch to the archive; returns the number of tickets moved"""
+    try:
+        tickets_archive_collection.insert_many(tickets, ordered=False)
+    except BulkWriteError as e:
+        # A previous, interrupted run may already have copied some of them
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+
+    # Only delete tickets nobody touched since they were read
+    result = tickets_collection.bulk_write([
+        DeleteOne({"_id": ticket["_id"], "status": "Closed", "updated_at": ticket.get("updated_at")})
+        for ticket in tickets
+    ], ordered=False)
+
+    if result.deleted_count != len(tickets):
+        ids = [ticket["_id"] for ticket in tickets]
+        still_hot = {doc["_id"] for doc in tickets_collection.find({"_id": {"$in": ids}}, {"_id": 1})}
+        if still_hot:
+            tickets_archive_collection.delete_many({"_id": {"$in": list(still_hot)}})
+        tickets = [ticket for ticket in tickets if ticket["_id"] not in still_hot]
+
+    record_tombstones(tickets, "archived")
+    return len(tickets)
+
+def archive_closed_tickets(batch_size: int = ARCHIVAL_BATCH_SIZE) -> int:
+    """Archive everything due; returns 0 without archiving while another run holds the lease"""
+    query = archivable_query(datetime.utcnow())
+    archived = 0
+    try:
+        # Renewing before each batch stops a run that lost its lease to a takeover
+        while acquire_lease(ARCHIVAL_LEASE, ARCHIVAL_LEASE_SECONDS):
+            batch = list(tickets_collection.find(query).limit(batch_size))
+            if not batch:
+                break
+            moved = archive_batch(batch)
+            archived += moved
+            if moved == 0:
+                # Everything in this batch changed under us; try again next run
+                break
+    finally:
+        release_lease(ARCHIVAL_LEASE)
+        if archived:
+            bump_data_version("tickets")
+    return archived
+
+def _archival_loop():
+    while True:
+        try:
+            archived = archive_closed_tickets()
+            if archived:
+                print(f"Archived {archived} closed ticket(s)")
+        except PyMongoError as e:
+            print(f"Error archiving closed tickets: {str(e)}")
+        time.sleep(ARCHIVAL_INTERVAL_SECONDS)
+
+def start_archival():
+    if ARCHIVAL_INTERVAL_SECONDS <= 0:
+        return
+    threading.Thread(target=_archival_loop, name="ticket-archival", daemon=True).start()
+
+if __name__ == "__main__":
+    print(f"Archived {archive_closed_tickets()} closed ticket(s)")
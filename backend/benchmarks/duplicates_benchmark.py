@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark for near-duplicate lookup (minhash.py).
+
+Seeds an LSH index with synthetic ticket descriptions spread over customer
+and module partitions, then queries it with perturbed copies of indexed
+tickets (true duplicates) and with fresh unrelated descriptions. Reports
+signature and lookup latency, recall on the duplicates and the false
+positive rate on the unrelated queries. No database is needed:
+    cd backend && python benchmarks/duplicates_benchmark.py --tickets 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from minhash import LSHIndex, signature  # noqa: E402
+
+MODULES = ["FI", "CO", "MM", "SD", "PP", "QM", "HR", "PM"]
+VOCABULARY = (
+    "invoice posting error document vendor customer payment report period ledger account "
+    "cost center material stock goods receipt purchase order delivery billing pricing "
+    "condition tax code batch production plan inspection lot employee payroll leave "
+    "approval workflow screen dump timeout printer output form field value missing "
+    "wrong duplicate blocked status release authorization user role migration balance "
+    "interface idoc message queue job schedule master data plant storage location"
+).split()
+
+def random_description(rng: random.Random) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(25, 60)))
+
+def perturb(text: str, rng: random.Random, edits: int) -> str:
+    """Re-worded copy: a few substituted, dropped and inserted words"""
+    words = text.split()
+    for _ in range(edits):
+        action = rng.random()
+        position = rng.randrange(len(words))
+        if action < 0.4:
+            words[position] = rng.choice(VOCABULARY)
+        elif action < 0.7 and len(words) > 5:
+            del words[position]
+        else:
+            words.insert(position, rng.choice(VOCABULARY))
+    return " ".join(words)
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+def micros(values: list) -> dict:
+    return {
+        "p50_us": round(percentile(values, 0.5) * 1e6, 1),
+        "p99_us": round(percentile(values, 0.99) * 1e6, 1),
+        "mean_us": round(statistics.mean(values) * 1e6, 1)
+    }
+
+def run(tickets: int, customers: int, queries: int, edits: int, threshold: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    index = LSHIndex()
+    corpus = []
+
+    build_started = time.perf_counter()
+    for number in range(tickets):
+        partition = (f"customer-{rng.randrange(customers)}", rng.choice(MODULES))
+        text = random_description(rng)
+        index.add(number, partition, signature(text))
+        corpus.append((partition, text))
+    build_seconds = time.perf_counter() - build_started
+
+    signature_times, lookup_times = [], []
+    found = 0
+    for _ in range(queries):
+        source = rng.randrange(tickets)
+        partition, text = corpus[source]
+        started = time.perf_counter()
+        sig = signature(perturb(text, rng, edits))
+        signed = time.perf_counter()
+        match = index.best_match(partition, sig, threshold)
+        lookup_times.append(time.perf_counter() - signed)
+        signature_times.append(signed - started)
+        if match and match[0] == source:
+            found += 1
+
+    false_positives = 0
+    for _ in range(queries):
+        partition = (f"customer-{rng.randrange(customers)}", rng.choice(MODULES))
+        if index.best_match(partition, signature(random_description(rng)), threshold):
+            false_positives += 1
+
+    return {
+        "tickets": tickets,
+        "partitions": customers * len(MODULES),
+        "queries": queries,
+        "edits_per_duplicate": edits,
+        "threshold": threshold,
+        "build_seconds": round(build_seconds, 3),
+        "signature": micros(signature_times),
+        "lookup": micros(lookup_times),
+        "recall": round(found / queries, 4),
+        "false_positive_rate": round(false_positives / queries, 4)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate ticket lookup")
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--edits", type=int, default=3, help="Word edits applied to each duplicate")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("DUPLICATE_THRESHOLD", 0.5)))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.tickets, args.customers, args.queries, args.edits, args.threshold, args.seed)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
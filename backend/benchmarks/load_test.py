@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the ticketing API.
+
+1. Seed MongoDB with realistic tickets spread over the real module routing
+   maps (needs MONGO_URL, like the server):
+       python benchmarks/load_test.py seed --tickets 50000
+2. Drive a running server with a mixed workload at fixed concurrency:
+       python benchmarks/load_test.py run --concurrency 32 --duration 60 \\
+           --output results/$(git rev-parse --short HEAD).json
+3. Compare two result files and flag regressions:
+       python benchmarks/load_test.py compare results/old.json results/new.json
+
+Workers are closed-loop: each picks an operation by weight, waits for the
+response and immediately picks the next one. The result file records, per
+operation, requests, errors, throughput and p50/p95/p99/max latency in
+milliseconds, along with the git commit and the settings used. Throughput
+is computed over the measured wall-clock time, which runs past --duration
+by however long the last in-flight requests take.
+
+Seeded tickets are numbered LT-YYYY-NNNNN from their own counter
+(loadtest_ticket_counter), so seeding never consumes real ticket numbers.
+They (created_by "loadtest") and tickets created during runs (remarks
+"loadtest") are removed with `seed --reset --tickets 0`.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOADTEST_USER = "loadtest"
+LOADTEST_MARK = "loadtest"
+LOADTEST_TICKET_PREFIX = "LT-"
+LOADTEST_COUNTER_COLLECTION = "loadtest_ticket_counter"
+
+CUSTOMERS = [
+    "Sky Cotex", "Sri Ranga Spinners", "Velmurugan Mills", "Kaveri Textiles", "Annai Spinning",
+    "Lakshmi Cotton Mills", "Pioneer Knit Fabrics", "Sakthi Weaving", "Jaya Paper Boards",
+    "Bharath Yarns", "Meenakshi Processors", "Amman Garments", "Vetri Exports", "KPR Fabrics",
+    "Sree Balaji Spinners", "Everest Paper Mills", "Royal Home Textiles", "Thirumalai Yarns"
+]
+CR_TYPES = ["Customer CR", "Internal CR"]
+ISSUE_TYPES = [
+    "Operational Issue", "Data Correction", "Report Issue", "New Requirement",
+    "Performance Issue", "Access Issue", "Printing Issue"
+]
+RESOLUTION_TYPES = [
+    "Fixed", "Enhancement Implemented", "Configuration Change", "Data Correction",
+    "Duplicate / Not Required", "User Error", "Deferred", "Cannot Reproduce"
+]
+PRIORITIES = ["High", "Medium", "Medium", "Medium", "Low"]
+# Share of seeded tickets per status
+STATUS_WEIGHTS = {"Assigned": 20, "In Progress": 12, "Pending": 5, "Completed": 18, "Closed": 45}
+SUBJECTS = [
+    "Rate master not updating", "Stock mismatch after transfer", "Invoice print alignment",
+    "Report shows wrong totals", "Unable to approve transaction", "Slow screen load",
+    "Duplicate entries in register", "Attendance not synced", "GST value rounding",
+    "Production entry locked", "Yarn count wise report missing", "Login access required"
+]
+
+DEFAULT_MIX = "login=2,list=30,detail=25,create=8,status=8,dashboard=10"
+DEFAULT_USERS = {
+    "admin": "admin123", "seenivasan": "support123", "vignesh": "support123",
+    "annamalai": "dev123", "sasi": "dev123", "manager": "manager123"
+}
+
+# ---------------------------------------------------------------- seeding
+
+def random_ticket(rng: random.Random, now: datetime, days: int, maps: dict) -> dict:
+    from ticket_service import queue_sort_fields
+
+    module = rng.choice(sorted(maps["developer"]))
+    developer = maps["developer"][module]
+    cr_date = now - timedelta(seconds=rng.randrange(days * 86400))
+    status = rng.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()))[0]
+    priority = rng.choice(PRIORITIES)
+    subject = rng.choice(SUBJECTS)
+    ticket = {
+        "customer": rng.choice(CUSTOMERS),
+        "cr_type": rng.choice(CR_TYPES),
+        "issue_type": rng.choice(ISSUE_TYPES),
+        "type": None,
+        "cr_date": cr_date,
+        "module": module,
+        "description": f"{subject} in {module}. Reported by {rng.choice(CUSTOMERS)} user, "
+                       f"reference #{rng.randrange(10000, 99999)}.",
+        "amc_cost": None,
+        "pr_approval": None,
+        "priority": priority,
+        "status": status,
+        "se_name": maps["support"].get(module),
+        "developer": developer,
+        "developer_email": maps["email"].get(developer),
+        "planned_date": None,
+        "commitment_date": None,
+        "completed_on": None,
+        "completed_by": None,
+        "time_duration_hours": None,
+        "resolution_type": None,
+        "completion_remarks": None,
+        "exe_sent": None,
+        "reason_for_issue": None,
+        "customer_call": None,
+        "remarks": None,
+        **queue_sort_fields(priority, None),
+        "created_by": LOADTEST_USER,
+        "created_at": cr_date,
+        "updated_at": cr_date
+    }
+    if status in ("Completed", "Closed"):
+        completed_on = min(cr_date + timedelta(hours=rng.expovariate(1 / 72)), now)
+        ticket.update({
+            "completed_on": completed_on,
+            "completed_by": developer,
+            "time_duration_hours": round((completed_on - cr_date).total_seconds() / 3600, 2),
+            "resolution_type": rng.choice(RESOLUTION_TYPES),
+            "completion_remarks": "Resolved during load test seeding",
+            "updated_at": completed_on
+        })
+        if status == "Closed":
+            ticket["closed_at"] = min(completed_on + timedelta(hours=rng.expovariate(1 / 24)), now)
+            ticket["updated_at"] = ticket["closed_at"]
+    return ticket
+
+def seed(args):
+    from database import db, tickets_collection
+    from routing import supportModuleMap, developerModuleMap, developerEmailMap
+    from rollups import backfill_rollups
+    from storage import MongoCounterRepository
+    from ticket_service import bump_data_version, format_ticket_number
+
+    counters = MongoCounterRepository(db[LOADTEST_COUNTER_COLLECTION])
+    if args.reset:
+        result = tickets_collection.delete_many(
+            {"$or": [{"created_by": LOADTEST_USER}, {"remarks": LOADTEST_MARK}]}
+        )
+        counters.collection.drop()
+        print(f"Removed {result.deleted_count} load test ticket(s)")
+        if not args.tickets:
+            backfill_rollups()
+            bump_data_version("tickets")
+            return
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    maps = {"support": supportModuleMap, "developer": developerModuleMap, "email": developerEmailMap}
+    started = time.perf_counter()
+    inserted = 0
+    while inserted < args.tickets:
+        batch = [random_ticket(rng, now, args.days, maps) for _ in range(min(args.batch_size, args.tickets - inserted))]
+        by_year = {}
+        for ticket in batch:
+            by_year.setdefault(ticket["cr_date"].year, []).append(ticket)
+        for year, tickets in by_year.items():
+            first = counters.reserve(year, len(tickets))
+            for offset, ticket in enumerate(tickets):
+                ticket["ticket_number"] = LOADTEST_TICKET_PREFIX + format_ticket_number(year, first + offset)
+        tickets_collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+        print(f"Seeded {inserted}/{args.tickets} tickets")
+
+    # Seeded tickets bypass the write paths that maintain rollups and cache versions
+    backfill_rollups()
+    bump_data_version("tickets")
+    print(f"Seeded {inserted} tickets in {time.perf_counter() - started:.1f}s")
+
+# ---------------------------------------------------------------- workload
+
+class Recorder:
+    def __init__(self):
+        self._latencies = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.recording = False
+        self.started_at = None
+
+    def start(self):
+        """End of warm-up: record from now on"""
+        self.started_at = time.monotonic()
+        self.recording = True
+
+    def elapsed(self) -> float:
+        """Measured seconds so far; call once every worker has finished"""
+        return time.monotonic() - self.started_at if self.started_at is not None else 0.0
+
+    def record(self, operation: str, seconds: float, ok: bool):
+        if not self.recording:
+            return
+        with self._lock:
+            self._latencies.setdefault(operation, []).append(seconds)
+            if not ok:
+                self._errors[operation] = self._errors.get(operation, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        # Recording never started: report zero throughput instead of dividing by zero
+        elapsed = elapsed or float("inf")
+
+        def percentile(ordered, p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        operations = {}
+        all_latencies = []
+        for operation, latencies in sorted(self._latencies.items()):
+            ordered = sorted(latencies)
+            all_latencies.extend(ordered)
+            operations[operation] = {
+                "requests": len(ordered),
+                "errors": self._errors.get(operation, 0),
+                "throughput_rps": round(len(ordered) / elapsed, 2),
+                "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2)
+            }
+        all_latencies.sort()
+        total = {
+            "requests": len(all_latencies),
+            "errors": sum(self._errors.values()),
+            "throughput_rps": round(len(all_latencies) / elapsed, 2)
+        }
+        if all_latencies:
+            total.update({
+                "p50_ms": round(percentile(all_latencies, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(all_latencies, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(all_latencies, 0.99) * 1000, 2)
+            })
+        return {"total": total, "operations": operations}
+
+class Worker:
+    """One simulated client with its own HTTP session and login"""
+
+    def __init__(self, base_url: str, username: str, password: str, shared: dict, recorder: Recorder, rng):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.shared = shared
+        self.recorder = recorder
+        self.rng = rng
+        self.session = requests.Session()
+        # Tickets this worker created and is moving through the status flow
+        self.own_tickets = []
+
+    def timed(self, operation: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(operation, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def login(self):
+        response = self.timed("login", "POST", "/api/auth/login",
+                              json={"username": self.username, "password": self.password})
+        if response is not None:
+            self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    def list_tickets(self):
+        params = {}
+        choice = self.rng.random()
+        if choice < 0.3:
+            params["module"] = self.rng.choice(self.shared["modules"])
+        elif choice < 0.5:
+            params["status"] = self.rng.choice(list(STATUS_WEIGHTS))
+        elif choice < 0.7:
+            to_date = datetime.utcnow() - timedelta(days=self.rng.randrange(0, 300))
+            params["from_date"] = (to_date - timedelta(days=30)).strftime("%Y-%m-%d")
+            params["to_date"] = to_date.strftime("%Y-%m-%d")
+        elif choice < 0.8:
+            params["customer"] = self.rng.choice(CUSTOMERS).split()[0]
+        self.timed("list", "GET", "/api/tickets", params=params)
+
+    def detail(self):
+        if self.shared["ticket_numbers"]:
+            self.timed("detail", "GET", f"/api/tickets/{self.rng.choice(self.shared['ticket_numbers'])}")
+
+    def create(self):
+        response = self.timed("create", "POST", "/api/tickets", json={
+            "customer": self.rng.choice(CUSTOMERS),
+            "cr_type": self.rng.choice(CR_TYPES),
+            "issue_type": self.rng.choice(ISSUE_TYPES),
+            "module": self.rng.choice(self.shared["modules"]),
+            "description": f"{self.rng.choice(SUBJECTS)} (load test {self.rng.randrange(10 ** 9)})",
+            "priority": self.rng.choice(PRIORITIES),
+            "remarks": LOADTEST_MARK
+        })
+        if response is not None:
+            self.own_tickets.append([response.json()["ticket_number"], "Assigned"])
+
+    def change_status(self):
+        if not self.own_tickets:
+            self.create()
+            return
+        ticket = self.own_tickets[0]
+        next_status = {"Assigned": "In Progress", "In Progress": "Completed", "Completed": "Closed"}[ticket[1]]
+        body = {"status": next_status}
+        if next_status == "Completed":
+            body.update({
+                "completed_by": self.username,
+                "resolution_type": self.rng.choice(RESOLUTION_TYPES),
+                "completion_remarks": "Closed by load test"
+            })
+        ok = self.timed("status", "PUT", f"/api/tickets/{ticket[0]}/status", json=body) is not None
+        if ok:
+            ticket[1] = next_status
+        if not ok or next_status == "Closed":
+            self.own_tickets.pop(0)
+
+    def dashboard(self):
+        self.timed("dashboard", "GET", "/api/dashboard/stats")
+
+    def run(self, mix: dict, deadline: float):
+        operations = {
+            "login": self.login, "list": self.list_tickets, "detail": self.detail,
+            "create": self.create, "status": self.change_status, "dashboard": self.dashboard
+        }
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        self.login()
+        while time.monotonic() < deadline:
+            operations[self.rng.choices(names, weights=weights)[0]]()
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"login", "list", "detail", "create", "status", "dashboard"}
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(args):
+    mix = parse_mix(args.mix)
+    users = list(DEFAULT_USERS.items())
+
+    # Reference data every worker samples from
+    bootstrap = requests.Session()
+    token = bootstrap.post(f"{args.base_url}/api/auth/login",
+                           json={"username": "admin", "password": DEFAULT_USERS["admin"]}).json()["access_token"]
+    bootstrap.headers["Authorization"] = f"Bearer {token}"
+    shared = {
+        "modules": bootstrap.get(f"{args.base_url}/api/modules").json()["modules"],
+        "ticket_numbers": [
+            ticket["ticket_number"]
+            for ticket in bootstrap.get(f"{args.base_url}/api/tickets", params={"status": "Closed"}).json()[:5000]
+        ]
+    }
+
+    recorder = Recorder()
+    master_rng = random.Random(args.seed)
+    workers = [
+        Worker(args.base_url, *users[i % len(users)], shared, recorder, random.Random(master_rng.random()))
+        for i in range(args.concurrency)
+    ]
+    started = time.monotonic()
+    deadline = started + args.warmup + args.duration
+    threading.Timer(args.warmup, recorder.start).start()
+    print(f"Running {args.concurrency} workers for {args.duration}s (+{args.warmup}s warm-up) against {args.base_url}")
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(worker.run, mix, deadline) for worker in workers]:
+            future.result()
+    elapsed = recorder.elapsed()
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "settings": {
+            "base_url": args.base_url, "concurrency": args.concurrency, "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup, "mix": mix, "seed": args.seed
+        },
+        "measured_seconds": round(elapsed, 2),
+        **recorder.summary(elapsed)
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+# ---------------------------------------------------------------- comparison
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = 0
+    print(f"{'operation':<12}{'p95 before':>12}{'p95 after':>12}{'change':>10}{'rps before':>12}{'rps after':>12}")
+    for operation, after in sorted(candidate["operations"].items()):
+        before = baseline["operations"].get(operation)
+        if not before:
+            continue
+        change = (after["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{operation:<12}{before['p95_ms']:>12}{after['p95_ms']:>12}{change:>9.1f}%"
+              f"{before['throughput_rps']:>12}{after['throughput_rps']:>12}{flag}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the ticketing API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Insert synthetic tickets into MongoDB")
+    seed_parser.add_argument("--tickets", type=int, default=20000)
+    seed_parser.add_argument("--days", type=int, default=365, help="Spread CR dates over this many days")
+    seed_parser.add_argument("--batch-size", type=int, default=1000)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.add_argument("--reset", action="store_true", help="Remove earlier load test tickets first")
+
+    run_parser = commands.add_parser("run", help="Drive a running server")
+    run_parser.add_argument("--base-url", default=os.getenv("LOADTEST_BASE_URL", "http://localhost:8001"))
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before measuring")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. " + DEFAULT_MIX)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="Write the results to this JSON file")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="p95 increase (%%) flagged as regression")
+
+    args = parser.parse_args()
+    {"seed": seed, "run": run, "compare": compare}[args.command](args)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pure-Python code run on every request or message.
+
+Covers email subject parsing, auto-assignment, JWT issue / verify, body
+extraction from large multipart emails and list responses: the per-ticket
+conversion (ticket_format) and the orjson rendering (json_response) of the
+user list. Runs against the memory storage
+backend, so no database is needed:
+    cd backend && python benchmarks/microbenchmarks.py
+
+Results are compared with the tracked baseline in
+benchmarks/baselines/microbenchmarks.json; a benchmark more than
+--threshold percent slower is flagged and the exit status is 1. Baselines
+are machine-specific: after an intentional change, or on a new machine,
+refresh them with --update-baseline and commit the file.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timedelta
+from email import message_from_bytes
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Must be set before anything imports database.py
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from bson import ObjectId  # noqa: E402
+
+import server  # noqa: E402
+from email_parsing import parse_email_subject, get_email_body  # noqa: E402
+from routing import current_routing  # noqa: E402
+from storage import storage  # noqa: E402
+from json_response import dumps as json_dumps  # noqa: E402
+from ticket_format import ticket_to_api  # noqa: E402
+from ticket_service import auto_assign_ticket  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "microbenchmarks.json")
+
+SUBJECT = "Acme Industries | FI | Bug | Error | Invoice posting fails for vendor 4711 in period 12"
+LONG_SUBJECT = "Acme Industries | SD | Change | Enhancement | " + " | ".join(
+    f"pricing condition ZP{i:02d} must apply to sales org 1000 and distribution channel 10" for i in range(20)
+)
+
+def make_multipart_email(attachments: int, attachment_bytes: int) -> bytes:
+    """A reply-chain style email: HTML part, attachments, then the text part last"""
+    rng = random.Random(7)
+    msg = MIMEMultipart()
+    msg["Subject"] = SUBJECT
+    msg.attach(MIMEText("<p>" + "Please see the log below. " * 2000 + "</p>", "html"))
+    for i in range(attachments):
+        msg.attach(MIMEApplication(rng.randbytes(attachment_bytes), Name=f"log{i}.zip"))
+    msg.attach(MIMEText("Please see the log below.\n" * 2000, "plain"))
+    return msg.as_bytes()
+
+def make_ticket(number: int, now: datetime) -> dict:
+    cr_date = now - timedelta(days=number % 400, minutes=number)
+    completed = number % 3 == 0
+    return {
+        "_id": ObjectId(),
+        "ticket_number": f"2024-{number:05d}",
+        "customer": f"Customer {number % 50}",
+        "cr_type": "Bug",
+        "issue_type": "Error",
+        "cr_date": cr_date,
+        "module": "FI",
+        "description": "Invoice posting fails for vendor " * 5,
+        "priority": "Medium",
+        "status": "Completed" if completed else "Assigned",
+        "se_name": "Seenivasan",
+        "developer": "Mariyaiya",
+        "completed_on": cr_date + timedelta(days=3) if completed else None,
+        "time_duration_hours": 72.0 if completed else None,
+        "created_at": cr_date,
+        "updated_at": cr_date
+    }
+
+def build_cases() -> dict:
+    """name -> zero-argument callable timing one operation"""
+    now = datetime.utcnow()
+    tickets = [make_ticket(number, now) for number in range(1000)]
+    users = [{"_id": ObjectId(), "username": f"user{i}", "full_name": f"User {i}", "role": "Developer"}
+             for i in range(50)]
+    storage.users.insert({"username": "admin", "password": "", "full_name": "System Admin", "role": "Admin"})
+    token = server.create_access_token({"sub": "admin"})
+    multipart = message_from_bytes(make_multipart_email(attachments=5, attachment_bytes=1024 * 1024))
+    module = current_routing().modules[0]
+
+    return {
+        "parse_email_subject": lambda: parse_email_subject(SUBJECT),
+        "parse_email_subject_long": lambda: parse_email_subject(LONG_SUBJECT),
+        "auto_assign_ticket": lambda: auto_assign_ticket(module),
+        "create_access_token": lambda: server.create_access_token({"sub": "admin"}),
+        "get_user_from_token": lambda: server.get_user_from_token(token),
+        "get_email_body_5mb_multipart": lambda: get_email_body(multipart),
+        "ticket_to_api_1000": lambda: [ticket_to_api(ticket) for ticket in tickets],
+        # GET /api/users: documents go to orjson as stored, ObjectIds included
+        "json_dumps_users_50": lambda: json_dumps(users),
+    }
+
+def measure(func, repeat: int) -> float:
+    """Best-of-`repeat` microseconds per call"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(only: list, repeat: int) -> dict:
+    cases = build_cases()
+    unknown = set(only) - set(cases)
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    results = {}
+    for name, func in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = {"us_per_op": round(measure(func, repeat), 3)}
+        print(f"{name:<32}{results[name]['us_per_op']:>14.3f} us", flush=True)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "benchmarks": results
+    }
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> int:
+    regressions = 0
+    print(f"\n{'benchmark':<32}{'baseline us':>14}{'now us':>14}{'change':>10}")
+    for name, after in candidate["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if not before:
+            print(f"{name:<32}{'-':>14}{after['us_per_op']:>14.3f}")
+            continue
+        change = (after["us_per_op"] - before["us_per_op"]) / before["us_per_op"] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<32}{before['us_per_op']:>14.3f}{after['us_per_op']:>14.3f}{change:>9.1f}%{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks for hot pure-Python paths")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=25, help="Slowdown (%%) flagged as regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run([name for name in args.only.split(",") if name], args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            sys.exit(1 if compare(json.load(f), results, args.threshold) else 0)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for serialising large ticket list responses.
+
+Times the work GET /api/tickets does after the query returns, for a list
+of synthetic stored tickets, along three paths:
+    encoder      ticket_to_api + FastAPI's jsonable_encoder + JSONResponse
+                 (what returning a list from the endpoint costs)
+    fast         ticket_to_api + FastJSONResponse (json_response.py)
+    fast_public  as fast, with public_ids (ticket number instead of _id)
+Reports wall and CPU milliseconds per response. No database is needed:
+    cd backend && python benchmarks/serialization_benchmark.py --tickets 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from json_response import FastJSONResponse  # noqa: E402
+from ticket_format import ticket_to_api  # noqa: E402
+
+MODULES = ["FI", "CO", "MM", "SD", "PP", "QM", "HR", "PM"]
+STATUSES = ["Assigned", "In Progress", "Pending", "Completed", "Closed"]
+
+def stored_ticket(number: int, rng: random.Random, now: datetime) -> dict:
+    """A ticket document as stored by the ticket service"""
+    cr_date = now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86400))
+    status = rng.choice(STATUSES)
+    completed_on = cr_date + timedelta(hours=rng.randint(1, 400)) if status in ("Completed", "Closed") else None
+    return {
+        "_id": ObjectId(),
+        "ticket_number": f"2024-{number:05d}",
+        "customer": f"Customer {rng.randrange(200)}",
+        "cr_type": rng.choice(["Bug", "Change", "Support"]),
+        "issue_type": rng.choice(["Error", "Enhancement", "Query"]),
+        "type": None,
+        "cr_date": cr_date,
+        "module": rng.choice(MODULES),
+        "description": "Invoice posting fails for the vendor when the period is closed. " * rng.randint(1, 6),
+        "amc_cost": None,
+        "pr_approval": None,
+        "priority": rng.choice(["High", "Medium", "Low"]),
+        "status": status,
+        "se_name": "Seenivasan",
+        "developer": "Mariyaiya",
+        "developer_email": "mariyaiya@example.com",
+        "planned_date": None,
+        "commitment_date": None,
+        "completed_on": completed_on,
+        "completed_by": "Mariyaiya" if completed_on else None,
+        "time_duration_hours": round((completed_on - cr_date).total_seconds() / 3600, 2) if completed_on else None,
+        "resolution_type": "Fixed" if completed_on else None,
+        "completion_remarks": "Corrected the posting period check" if completed_on else None,
+        "exe_sent": None,
+        "reason_for_issue": None,
+        "customer_call": None,
+        "remarks": None,
+        "priority_rank": 2,
+        "commitment_sort": "9999-12-31",
+        "created_by": "admin",
+        "created_at": cr_date,
+        "updated_at": completed_on or cr_date
+    }
+
+def encoder_path(tickets: list) -> bytes:
+    return JSONResponse(jsonable_encoder([ticket_to_api(t) for t in tickets])).body
+
+def fast_path(tickets: list) -> bytes:
+    return FastJSONResponse([ticket_to_api(t) for t in tickets]).body
+
+def fast_public_path(tickets: list) -> bytes:
+    return FastJSONResponse([ticket_to_api(t, public_id=True) for t in tickets]).body
+
+PATHS = {"encoder": encoder_path, "fast": fast_path, "fast_public": fast_public_path}
+
+def run(tickets: int, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    docs = [stored_ticket(number, rng, now) for number in range(tickets)]
+
+    # Same payload either way, apart from formatting
+    assert json.loads(encoder_path(docs[:50])) == json.loads(fast_path(docs[:50]))
+
+    results = {"tickets": tickets, "repeat": repeat, "paths": {}}
+    for name, serialize in PATHS.items():
+        wall, cpu = [], []
+        for _ in range(repeat):
+            wall_started, cpu_started = time.perf_counter(), time.process_time()
+            body = serialize(docs)
+            cpu.append(time.process_time() - cpu_started)
+            wall.append(time.perf_counter() - wall_started)
+        results["paths"][name] = {
+            "wall_ms": round(statistics.median(wall) * 1000, 2),
+            "cpu_ms": round(statistics.median(cpu) * 1000, 2),
+            "bytes": len(body)
+        }
+    baseline = results["paths"]["encoder"]["cpu_ms"]
+    for name, path in results["paths"].items():
+        path["cpu_vs_encoder"] = round(path["cpu_ms"] / baseline, 3) if baseline else None
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ticket list response serialisation")
+    parser.add_argument("--tickets", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.tickets, args.repeat, args.seed)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
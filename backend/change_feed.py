@@ -0,0 +1,243 @@
+"""
+Ticket change feed: one shared MongoDB change-stream consumer per worker,
+fanned out to connected clients (Server-Sent Events) through an in-process hub.
+
+Change streams need a replica set (a single-node replica set is enough:
+`mongod --replSet rs0` followed by `rs.initiate()`). Against a standalone
+mongod the hub falls back to local events published by this worker's own
+write paths, so tickets created by other processes are not seen in that mode.
+Local events published while the hub is still finding out which mode it is in
+are held back and delivered once it knows.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from database import STORAGE_BACKEND, tickets_collection
+from metrics import Gauge
+from ticket_format import ticket_to_api
+
+CHANGE_FEED_BUFFER_SIZE = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", 1000))
+CHANGE_FEED_CLIENT_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_CLIENT_QUEUE_SIZE", 500))
+
+# Error code MongoDB returns when change streams are used on a standalone server
+NOT_A_REPLICA_SET = 40573
+
+# Sentinel pushed to a subscriber whose queue overflowed; the client must reload
+RESET = object()
+
+def ticket_event(event_id: str, kind: str, ticket: Optional[dict], ticket_id: str,
+                 changed_fields: Optional[list] = None) -> dict:
+    """Build the event payload sent to clients"""
+    if ticket is not None:
+        ticket = ticket_to_api(ticket)
+    return {
+        "id": event_id,
+        "type": kind,
+        "ticket_id": ticket_id,
+        "ticket_number": ticket.get("ticket_number") if ticket else None,
+        "changed_fields": changed_fields or [],
+        "ticket": ticket
+    }
+
+def format_sse(event: dict) -> str:
+    data = json.dumps(event, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+class Subscriber:
+    def __init__(self, module: Optional[str] = None, developer: Optional[str] = None):
+        self.module = module
+        self.developer = developer
+        self.queue = asyncio.Queue(maxsize=CHANGE_FEED_CLIENT_QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, event: dict) -> bool:
+        ticket = event["ticket"]
+        if ticket is None:
+            # Deletions carry no fields to filter on; let the client drop the id
+            return True
+        if self.module and ticket.get("module") != self.module:
+            return False
+        if self.developer and ticket.get("developer") != self.developer:
+            return False
+        return True
+
+    def offer(self, event: dict):
+        """Runs on the event loop thread"""
+        if self.overflowed or not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up; tell it to resynchronise instead of buffering forever
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+class TicketEventHub:
+    """Fans ticket change events out to subscribers and keeps a short replay buffer"""
+
+    def __init__(self, buffer_size: int = CHANGE_FEED_BUFFER_SIZE):
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._local_ids = itertools.count(1)
+        self._local_prefix = uuid.uuid4().hex[:8]
+        # Local events published while the mode is still "starting"
+        self._held_events = deque(maxlen=buffer_size)
+        # "off" until start(), then "starting" until the change stream opens or is unavailable
+        self.mode = "off"
+
+    @property
+    def uses_local_events(self) -> bool:
+        return self.mode == "local"
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        if STORAGE_BACKEND != "mongo":
+            # No change stream to consume; local writes are still published
+            self._set_mode("local")
+            return
+        self.mode = "starting"
+        self._thread = threading.Thread(target=self._watch_loop, name="ticket-change-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def publish(self, event: dict):
+        """Thread-safe: record the event and hand it to every subscriber"""
+        with self._lock:
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        if self._loop is None:
+            return
+        for subscriber in subscribers:
+            self._loop.call_soon_threadsafe(subscriber.offer, event)
+
+    def publish_local(self, kind: str, ticket: dict, changed_fields: Optional[list] = None):
+        """Called from every write path; a no-op while the change stream is consumed or the hub is off"""
+        if self.mode in ("off", "change_stream"):
+            return
+        event_id = f"{self._local_prefix}-{next(self._local_ids)}"
+        event = ticket_event(event_id, kind, ticket, str(ticket.get("_id")), changed_fields)
+        with self._lock:
+            if self.mode == "starting":
+                self._held_events.append(event)
+                return
+        if self.uses_local_events:
+            self.publish(event)
+
+    def _set_mode(self, mode: str):
+        """Switch modes and deliver the local events held back while starting.
+
+        They are delivered in change stream mode as well: a write made just before
+        the stream opened is not in the stream, and a duplicate update is harmless.
+        """
+        with self._lock:
+            self.mode = mode
+            held = list(self._held_events)
+            self._held_events.clear()
+        for event in held:
+            self.publish(event)
+
+    def subscribe(self, module: Optional[str] = None, developer: Optional[str] = None,
+                  last_event_id: Optional[str] = None):
+        """Register a subscriber.
+
+        Returns (subscriber, backlog). backlog is the list of buffered events after
+        last_event_id, or None when that id is no longer buffered and the client
+        has to reload.
+        """
+        subscriber = Subscriber(module, developer)
+        with self._lock:
+            backlog = []
+            if last_event_id:
+                ids = [event["id"] for event in self._buffer]
+                if last_event_id in ids:
+                    start = ids.index(last_event_id) + 1
+                    backlog = [e for e in list(self._buffer)[start:] if subscriber.matches(e)]
+                else:
+                    backlog = None
+            self._subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def queued_events(self) -> int:
+        """Events waiting in subscriber queues, i.e. not yet written to clients"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return sum(subscriber.queue.qsize() for subscriber in subscribers)
+
+    def _watch_loop(self):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while not self._stop.is_set():
+            try:
+                with tickets_collection.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=resume_token,
+                    max_await_time_ms=1000
+                ) as stream:
+                    self._set_mode("change_stream")
+                    print("Ticket change feed: consuming MongoDB change stream")
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        self.publish(self._to_event(change))
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET:
+                    self._set_mode("local")
+                    print("Ticket change feed: MongoDB is not a replica set, using local events only")
+                    return
+                print(f"Ticket change feed error: {str(e)}")
+                time.sleep(5)
+            except PyMongoError as e:
+                print(f"Ticket change feed error: {str(e)}")
+                time.sleep(5)
+
+    @staticmethod
+    def _to_event(change: dict) -> dict:
+        event_id = change["_id"]["_data"]
+        ticket_id = str(change["documentKey"]["_id"])
+        operation = change["operationType"]
+        if operation == "delete":
+            return ticket_event(event_id, "deleted", None, ticket_id)
+        ticket = change.get("fullDocument")
+        if operation == "insert":
+            return ticket_event(event_id, "created", ticket, ticket_id)
+        changed_fields = list(change.get("updateDescription", {}).get("updatedFields", {}).keys())
+        kind = "status_changed" if "status" in changed_fields else "updated"
+        if ticket is None:
+            # Document was removed before the lookup ran
+            return ticket_event(event_id, "deleted", None, ticket_id)
+        return ticket_event(event_id, kind, ticket, ticket_id, changed_fields)
+
+ticket_events = TicketEventHub()
+
+Gauge("ticket_event_subscribers", "Connected ticket stream (SSE) clients",
+      callback=ticket_events.subscriber_count)
+Gauge("ticket_event_queue_depth", "Ticket events queued for stream clients but not yet sent",
+      callback=ticket_events.queued_events)
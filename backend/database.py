@@ -0,0 +1,148 @@
+"""
+MongoDB connection and collections shared by the API server and batch jobs
+"""
+
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+import os
+from dotenv import load_dotenv
+
+from metrics import mongo_command_metrics
+from tracing import trace_command_listener
+
+load_dotenv()
+
+# "mongo" (default) or "memory"; see storage.py
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
+
+# MongoDB Connection
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/erp_ticketing")
+
+# Connection pool per process and timeouts in milliseconds (0 = no limit)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0))
+
+# Where read-heavy reporting reads (ticket lists, dashboard, analytics, trends) go:
+# primary, primaryPreferred, secondary, secondaryPreferred or nearest. Anything but
+# primary only picks secondaries lagging at most MONGO_MAX_STALENESS_SECONDS (>= 90).
+MONGO_REPORTING_READ_PREFERENCE = os.getenv("MONGO_REPORTING_READ_PREFERENCE", "primary")
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", 90))
+
+READ_PREFERENCES = {
+    "primary": Primary, "primaryPreferred": PrimaryPreferred, "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred, "nearest": Nearest
+}
+
+def reporting_read_preference():
+    mode = READ_PREFERENCES.get(MONGO_REPORTING_READ_PREFERENCE)
+    if mode is None:
+        raise ValueError(f"Unknown MONGO_REPORTING_READ_PREFERENCE: {MONGO_REPORTING_READ_PREFERENCE}")
+    if mode is Primary:
+        return Primary()
+    if MONGO_MAX_STALENESS_SECONDS < 90:
+        # The server-selection spec's lower bound; smaller values fail every reporting read
+        raise ValueError("MONGO_MAX_STALENESS_SECONDS must be at least 90")
+    return mode(max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+client = MongoClient(
+    MONGO_URL,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS or None,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS or None,
+    event_listeners=[mongo_command_metrics, trace_command_listener]
+)
+db = client.get_database()
+
+# Collections
+users_collection = db["users"]
+tickets_collection = db["tickets"]
+# Closed tickets moved out of the hot collection by archival.py
+tickets_archive_collection = db["tickets_archive"]
+ticket_counter_collection = db["ticket_counter"]
+audit_logs_collection = db["audit_logs"]
+idempotency_keys_collection = db["idempotency_keys"]
+ticket_tombstones_collection = db["ticket_tombstones"]
+routing_collection = db["routing_config"]
+ticket_rollups_collection = db["ticket_rollups"]
+TICKET_ROLLUPS_INDEX = [("dimension", ASCENDING), ("day", ASCENDING), ("key", ASCENDING)]
+# Monotonic data versions used to invalidate per-worker caches
+cache_versions_collection = db["cache_versions"]
+# Expiring leases so only one worker at a time runs a background job (leases.py)
+job_leases_collection = db["job_leases"]
+
+# Reporting views of the read-heavy collections, routed by MONGO_REPORTING_READ_PREFERENCE.
+# Writes and read-your-writes paths (ticket detail, updates, work queues) use the ones above.
+_reporting = reporting_read_preference()
+# Secondary reads can lag the data version (read from the primary) that a cached
+# result would be stored under, so result caches stay off unless this is True
+REPORTING_READS_FROM_PRIMARY = isinstance(_reporting, Primary)
+tickets_reporting_collection = tickets_collection.with_options(read_preference=_reporting)
+tickets_archive_reporting_collection = tickets_archive_collection.with_options(read_preference=_reporting)
+ticket_rollups_reporting_collection = ticket_rollups_collection.with_options(read_preference=_reporting)
+
+# How long a stored Idempotency-Key response can be replayed
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 86400))
+
+# How long deletion/archival tombstones are kept for delta sync clients
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", 90))
+
+def ensure_indexes():
+    tickets_collection.create_index([("ticket_number", ASCENDING)], unique=True)
+    tickets_collection.create_index([("status", ASCENDING)])
+    tickets_collection.create_index([("module", ASCENDING)])
+    tickets_collection.create_index([("updated_at", ASCENDING)])
+    tickets_collection.create_index([("cr_date", DESCENDING)])
+    tickets_collection.create_index([("status", ASCENDING), ("completed_on", ASCENDING)])
+    tickets_collection.create_index([("ticket_number", ASCENDING), ("updated_at", ASCENDING)])
+    tickets_collection.create_index([("status", ASCENDING), ("closed_at", ASCENDING)])
+    # Personal work queues: owner, open status, then priority / commitment date / age
+    for owner_field in ("developer", "se_name"):
+        tickets_collection.create_index([
+            (owner_field, ASCENDING), ("status", ASCENDING), ("priority_rank", ASCENDING),
+            ("commitment_sort", ASCENDING), ("created_at", ASCENDING)
+        ])
+    tickets_collection.create_index(
+        [("email_message_id", ASCENDING)],
+        partialFilterExpression={"email_message_id": {"$type": "string"}}
+    )
+    # Full-text search (search.py); a collection can have only one text index
+    ticket_text_index = [("description", TEXT), ("remarks", TEXT), ("completion_remarks", TEXT)]
+    ticket_text_weights = {"description": 3, "remarks": 1, "completion_remarks": 2}
+    tickets_collection.create_index(ticket_text_index, weights=ticket_text_weights, name="ticket_text")
+    tickets_archive_collection.create_index([("ticket_number", ASCENDING)], unique=True)
+    tickets_archive_collection.create_index([("cr_date", DESCENDING)])
+    # Re-imports of archived mail are recognised by Message-ID (mbox_importer.py)
+    tickets_archive_collection.create_index(
+        [("email_message_id", ASCENDING)],
+        partialFilterExpression={"email_message_id": {"$type": "string"}}
+    )
+    tickets_archive_collection.create_index(ticket_text_index, weights=ticket_text_weights, name="ticket_text")
+    tickets_collection.create_index([("created_at", ASCENDING)])
+    tickets_collection.create_index(
+        [("possible_duplicate_of", ASCENDING)],
+        partialFilterExpression={"possible_duplicate_of": {"$type": "string"}}
+    )
+    users_collection.create_index([("username", ASCENDING)], unique=True)
+    # One counter per year: concurrent first-of-year upserts must not create two
+    ticket_counter_collection.create_index([("year", ASCENDING)], unique=True)
+    ticket_tombstones_collection.create_index([("deleted_at", ASCENDING)])
+    ticket_tombstones_collection.create_index(
+        [("expires_from", ASCENDING)], expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 86400
+    )
+    ticket_rollups_collection.create_index(TICKET_ROLLUPS_INDEX)
+    idempotency_keys_collection.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_KEY_TTL_SECONDS
+    )
+
+# The memory backend never talks to MongoDB (MongoClient connects lazily)
+if STORAGE_BACKEND == "mongo":
+    ensure_indexes()
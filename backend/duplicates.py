@@ -0,0 +1,160 @@
+"""
+Near-duplicate detection for new tickets.
+
+Keeps a MinHash/LSH index (minhash.py) of the descriptions of tickets
+created in the last DUPLICATE_WINDOW_DAYS, partitioned by customer and
+module. create_ticket_record consults it before inserting and flags a
+probable duplicate with `possible_duplicate_of` (the first ticket of the
+cluster) and `duplicate_similarity`; nothing is merged or closed
+automatically. Tickets created by other processes (email listener, importer)
+are picked up by a periodic resync on created_at, which every writer sets to
+the insert time.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
+
+from database import tickets_collection
+from minhash import LSHIndex, signature
+from storage import storage
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.5))
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", 90))
+DUPLICATE_RESYNC_SECONDS = float(os.getenv("DUPLICATE_RESYNC_SECONDS", 60))
+# Each resync re-reads this far behind the newest ticket it has seen, so tickets
+# stamped just before it but committed later by another process are not missed
+DUPLICATE_RESYNC_LAG_SECONDS = float(os.getenv("DUPLICATE_RESYNC_LAG_SECONDS", 300))
+
+INDEX_FIELDS = {
+    "_id": 0, "ticket_number": 1, "customer": 1, "module": 1,
+    "description": 1, "possible_duplicate_of": 1, "created_at": 1
+}
+
+def partition_key(ticket: dict) -> tuple:
+    return ((ticket.get("customer") or "").strip().lower(), ticket.get("module"))
+
+class DuplicateIndex:
+    def __init__(self):
+        self._index = LSHIndex()
+        # ticket_number -> (cluster root ticket_number, created_at)
+        self._tickets = {}
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._started = False
+
+    def start(self):
+        """Load recent tickets and start the periodic resync (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.sync()
+        threading.Thread(target=self._resync_loop, name="duplicate-index-resync", daemon=True).start()
+
+    def _resync_loop(self):
+        while True:
+            time.sleep(DUPLICATE_RESYNC_SECONDS)
+            try:
+                self.sync()
+            except PyMongoError as e:
+                print(f"Error resyncing duplicate index: {str(e)}")
+
+    def sync(self):
+        """Index tickets created since the last sync and drop those outside the window"""
+        cutoff = datetime.utcnow() - timedelta(days=DUPLICATE_WINDOW_DAYS)
+        since = cutoff
+        if self._watermark:
+            since = max(self._watermark - timedelta(seconds=DUPLICATE_RESYNC_LAG_SECONDS), cutoff)
+        for ticket in storage.tickets.find({"created_at": {"$gte": since}}, projection=INDEX_FIELDS):
+            if ticket["ticket_number"] not in self._tickets:
+                self.add(ticket)
+
+        with self._lock:
+            expired = [number for number, (_, created_at) in self._tickets.items() if created_at < cutoff]
+            for number in expired:
+                del self._tickets[number]
+        for number in expired:
+            self._index.remove(number)
+
+    def add(self, ticket: dict):
+        created_at = ticket.get("created_at")
+        if not isinstance(created_at, datetime):
+            return
+        sig = signature(ticket.get("description") or "")
+        if sig is None:
+            return
+        number = ticket["ticket_number"]
+        with self._lock:
+            self._tickets[number] = (ticket.get("possible_duplicate_of") or number, created_at)
+            if self._watermark is None or created_at > self._watermark:
+                self._watermark = created_at
+        self._index.add(number, partition_key(ticket), sig)
+
+    def find(self, ticket: dict) -> Optional[dict]:
+        """Most similar recent ticket for the same customer and module, if any"""
+        self.start()
+        sig = signature(ticket.get("description") or "")
+        if sig is None:
+            return None
+        match = self._index.best_match(partition_key(ticket), sig, DUPLICATE_THRESHOLD)
+        if match is None:
+            return None
+        number, score = match
+        with self._lock:
+            root = self._tickets.get(number, (number, None))[0]
+        return {"ticket_number": root, "matched_ticket": number, "similarity": round(score, 3)}
+
+duplicate_index = DuplicateIndex()
+
+def get_duplicate_clusters(module: Optional[str] = None, customer: Optional[str] = None,
+                           limit: int = 50) -> list:
+    """Clusters of flagged tickets grouped under the ticket they duplicate, largest first"""
+    match = {"possible_duplicate_of": {"$type": "string"}}
+    if module:
+        match["module"] = module
+    if customer:
+        match["customer"] = customer
+    clusters = list(tickets_collection.aggregate([
+        {"$match": match},
+        {"$sort": {"cr_date": DESCENDING}},
+        {"$group": {
+            "_id": "$possible_duplicate_of",
+            "count": {"$sum": 1},
+            "latest": {"$first": "$cr_date"},
+            "duplicates": {"$push": {
+                "ticket_number": "$ticket_number",
+                "status": "$status",
+                "similarity": "$duplicate_similarity",
+                "cr_date": "$cr_date"
+            }}
+        }},
+        {"$sort": {"count": DESCENDING, "latest": DESCENDING}},
+        {"$limit": limit}
+    ]))
+
+    originals = {
+        ticket["ticket_number"]: ticket
+        for ticket in tickets_collection.find(
+            {"ticket_number": {"$in": [cluster["_id"] for cluster in clusters]}},
+            {"_id": 0, "ticket_number": 1, "customer": 1, "module": 1, "status": 1, "description": 1}
+        )
+    }
+    return [
+        {
+            "ticket_number": cluster["_id"],
+            "original": originals.get(cluster["_id"]),
+            "duplicate_count": cluster["count"],
+            "duplicates": [
+                {**duplicate, "cr_date": duplicate["cr_date"].isoformat()
+                 if isinstance(duplicate.get("cr_date"), datetime) else duplicate.get("cr_date")}
+                for duplicate in cluster["duplicates"]
+            ]
+        }
+        for cluster in clusters
+    ]
@@ -6,7 +6,6 @@ Monitors incoming emails and automatically creates tickets
 
 import imaplib
 import email
-from email.header import decode_header
 import time
 import os
 from dotenv import load_dotenv
@@ -14,6 +13,8 @@ import requests
 from datetime import datetime
 import re
 
+from email_parsing import parse_email_subject, decode_email_subject, get_email_body
+
 load_dotenv()
 
 # Email Configuration
@@ -23,6 +24,10 @@ IMAP_SERVER = os.getenv("EMAIL_IMAP_SERVER", "imap.gmail.com")
 CHECK_INTERVAL = 60  # Check every 60 seconds
 API_URL = "http://localhost:8001"
 
+# Ingestion mode: "direct" creates tickets through the ticket service against
+# the database, "http" posts them to the API as the admin user
+INGEST_MODE = os.getenv("EMAIL_INGEST_MODE", "direct").lower()
+
 # Admin credentials for API authentication
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"
@@ -43,29 +48,50 @@ def get_auth_token():
         print(f"Error getting auth token: {str(e)}")
         return None
 
-def parse_email_subject(subject):
-    """
-    Parse email subject in format:
-    Customer | Module | CRType | Issue Type | Description
-    
-    Returns dict or None if format is invalid
-    """
-    parts = [part.strip() for part in subject.split("|")]
+def create_ticket_via_api(ticket_data, token, message_id=None):
+    """Create ticket via API"""
+    try:
+        headers = {"Authorization": f"Bearer {token}"}
+        if message_id:
+            # Retries of the same email replay the original ticket instead of duplicating it
+            headers["Idempotency-Key"] = message_id
+        response = requests.post(
+            f"{API_URL}/api/tickets",
+            json=ticket_data,
+            headers=headers
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            print(f"✗ Failed to create ticket: {response.text}")
+            return None
+    except Exception as e:
+        print(f"✗ Error creating ticket: {str(e)}")
+        return None
+
+def create_ticket_direct(ticket_data):
+    """Create ticket through the ticket service, bypassing the HTTP API"""
+    # Imported lazily so HTTP mode does not need database access
+    from ticket_service import create_ticket_record
     
-    if len(parts) >= 5:
-        return {
-            "customer": parts[0],
-            "module": parts[1],
-            "cr_type": parts[2],
-            "issue_type": parts[3],
-            "description": " | ".join(parts[4:])
-        }
-    else:
-        print(f"Invalid subject format (expected 5+ parts, got {len(parts)}): {subject}")
+    try:
+        return create_ticket_record(ticket_data, ADMIN_USERNAME)
+    except Exception as e:
+        print(f"✗ Error creating ticket: {str(e)}")
         return None
 
-def create_ticket_from_email(subject, body, token):
-    """Create ticket via API"""
+def find_ticket_for_message(message_id):
+    """Ticket already created from this Message-ID, if any (direct mode)"""
+    from storage import storage
+    
+    tickets = storage.tickets.find(
+        {"email_message_id": message_id}, limit=1, projection={"ticket_number": 1, "developer": 1}
+    )
+    return tickets[0] if tickets else None
+
+def create_ticket_from_email(subject, body, token=None, message_id=None):
+    """Create ticket from a parsed email using the configured ingestion mode"""
     parsed = parse_email_subject(subject)
     
     if not parsed:
@@ -83,59 +109,25 @@ def create_ticket_from_email(subject, body, token):
         "remarks": f"Auto-created from email. Subject: {subject}"
     }
     
-    try:
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.post(
-            f"{API_URL}/api/tickets",
-            json=ticket_data,
-            headers=headers
-        )
-        
-        if response.status_code == 200:
-            ticket = response.json()
-            print(f"✓ Created ticket {ticket['ticket_number']} from email")
-            print(f"  Customer: {parsed['customer']}")
-            print(f"  Module: {parsed['module']}")
-            print(f"  Assigned to: {ticket['developer']}")
+    message_id = (message_id or "").strip() or None
+    if INGEST_MODE == "http":
+        ticket = create_ticket_via_api(ticket_data, token, message_id)
+    else:
+        # Re-polling a mail that was ticketed but not marked read must not duplicate it
+        existing = find_ticket_for_message(message_id) if message_id else None
+        if existing:
+            print(f"↺ Email already ticketed as {existing['ticket_number']}, skipping")
             return True
-        else:
-            print(f"✗ Failed to create ticket: {response.text}")
-            return False
-    except Exception as e:
-        print(f"✗ Error creating ticket: {str(e)}")
+        ticket = create_ticket_direct({**ticket_data, "email_subject": subject, "email_message_id": message_id})
+    
+    if not ticket:
         return False
-
-def decode_email_subject(subject):
-    """Decode email subject"""
-    decoded_parts = []
-    for part, encoding in decode_header(subject):
-        if isinstance(part, bytes):
-            decoded_parts.append(part.decode(encoding or 'utf-8', errors='ignore'))
-        else:
-            decoded_parts.append(part)
-    return ''.join(decoded_parts)
-
-def get_email_body(msg):
-    """Extract email body"""
-    body = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            content_type = part.get_content_type()
-            content_disposition = str(part.get("Content-Disposition"))
-            
-            if content_type == "text/plain" and "attachment" not in content_disposition:
-                try:
-                    body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    break
-                except:
-                    pass
-    else:
-        try:
-            body = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
-        except:
-            body = str(msg.get_payload())
     
-    return body.strip()
+    print(f"✓ Created ticket {ticket['ticket_number']} from email")
+    print(f"  Customer: {parsed['customer']}")
+    print(f"  Module: {parsed['module']}")
+    print(f"  Assigned to: {ticket['developer']}")
+    return True
 
 def check_new_emails():
     """Check for new emails and create tickets"""
@@ -147,11 +139,13 @@ def check_new_emails():
         return
     
     try:
-        # Get authentication token
-        token = get_auth_token()
-        if not token:
-            print("✗ Failed to authenticate with API")
-            return
+        # Get authentication token (only needed when posting to the API)
+        token = None
+        if INGEST_MODE == "http":
+            token = get_auth_token()
+            if not token:
+                print("✗ Failed to authenticate with API")
+                return
         
         # Connect to IMAP server
         mail = imaplib.IMAP4_SSL(IMAP_SERVER)
@@ -193,7 +187,7 @@ def check_new_emails():
                 print(f"  Subject: {subject}")
                 
                 # Create ticket
-                if create_ticket_from_email(subject, body, token):
+                if create_ticket_from_email(subject, body, token, msg["Message-ID"]):
                     # Mark as read only if ticket creation was successful
                     mail.store(email_id, '+FLAGS', '\\Seen')
                 
@@ -216,6 +210,7 @@ def main():
     print(f"Monitoring: {EMAIL_ADDRESS}")
     print(f"IMAP Server: {IMAP_SERVER}")
     print(f"Check Interval: {CHECK_INTERVAL} seconds")
+    print(f"Ingestion Mode: {INGEST_MODE}")
     print("=" * 70)
     print("\nExpected Email Subject Format:")
     print("Customer | Module | CRType | Issue Type | Description")
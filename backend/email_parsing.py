@@ -0,0 +1,63 @@
+"""
+Parsing of incoming CR emails, shared by the API server, the email listener
+and the mail archive importer.
+
+Subjects follow `Customer | Module | CRType | Issue Type | Description`;
+anything after the fourth separator belongs to the description, so a
+description may itself contain `|`.
+"""
+
+from email.header import decode_header
+from typing import Optional
+
+SUBJECT_FIELDS = ("customer", "module", "cr_type", "issue_type")
+
+def parse_email_subject(subject: str) -> Optional[dict]:
+    """Parse email subject: Customer | Module | CRType | Issue Type | Description
+
+    Returns None if the subject has fewer than five parts.
+    """
+    parts = subject.split("|", 4)
+    if len(parts) < 5:
+        return None
+    parsed = {field: part.strip() for field, part in zip(SUBJECT_FIELDS, parts)}
+    description = parts[4]
+    if "|" in description:
+        description = " | ".join(part.strip() for part in description.split("|"))
+    else:
+        description = description.strip()
+    parsed["description"] = description
+    return parsed
+
+def decode_email_subject(subject):
+    """Decode email subject"""
+    decoded_parts = []
+    for part, encoding in decode_header(subject):
+        if isinstance(part, bytes):
+            decoded_parts.append(part.decode(encoding or 'utf-8', errors='ignore'))
+        else:
+            decoded_parts.append(part)
+    return ''.join(decoded_parts)
+
+def get_email_body(msg):
+    """Extract email body: the first inline text/plain part"""
+    body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            # Cheap content-type check first; attachments are never decoded
+            if part.get_content_type() != "text/plain":
+                continue
+            if "attachment" in str(part.get("Content-Disposition")):
+                continue
+            try:
+                body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+                break
+            except:
+                pass
+    else:
+        try:
+            body = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
+        except:
+            body = str(msg.get_payload())
+
+    return body.strip()
@@ -0,0 +1,37 @@
+"""
+Expiring leases for background jobs that must not run in several workers at once.
+
+Every uvicorn worker starts the same background threads; a job holding a
+lease (one document per job in job_leases) is the only one running until it
+releases the lease or stops renewing it for `seconds`, e.g. because its
+process died.
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from database import job_leases_collection
+
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+def acquire_lease(name: str, seconds: float) -> bool:
+    """Take or renew the lease; False while another owner holds an unexpired one"""
+    now = datetime.utcnow()
+    try:
+        job_leases_collection.find_one_and_update(
+            {"_id": name, "$or": [{"owner": LEASE_OWNER}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": LEASE_OWNER, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lease document exists and is held by someone else
+        return False
+    return True
+
+def release_lease(name: str):
+    job_leases_collection.update_one(
+        {"_id": name, "owner": LEASE_OWNER}, {"$set": {"expires_at": datetime.utcnow()}}
+    )
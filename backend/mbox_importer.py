@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Offline Mail Archive Importer for ERP Ticketing System
+Bulk-loads historical CR emails from mbox files or Maildir folders as tickets
+
+Usage:
+    python mbox_importer.py archive/2023.mbox archive/maildir/ --workers 4
+
+Subjects are parsed with the same rules as the live listener
+(Customer | Module | CRType | Issue Type | Description). The original email
+Date header is kept as the ticket's cr_date/cr_time; created_at is the
+import time, so delta sync and the duplicate index see the new tickets.
+Archived mail is history, so tickets are created Closed (closed at the email
+date) and stay out of queues and pending counts; `--status Assigned` imports
+them as open work instead. Messages whose Message-ID is already on a live or
+archived ticket are skipped.
+Progress is checkpointed after every batch so an interrupted run can be restarted with the same
+arguments, and rejected messages are appended to a CSV report.
+"""
+
+import argparse
+import csv
+import email
+import json
+import mailbox
+import os
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from multiprocessing import Pool
+
+from email_parsing import decode_email_subject, get_email_body, parse_email_subject
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_STATE_FILE = "mbox_import_state.json"
+DEFAULT_REPORT_FILE = "mbox_import_rejected.csv"
+IMPORT_USER = "mbox_import"
+IMPORT_STATUSES = ("Closed", "Assigned")
+
+def open_mailbox(path, fmt="auto"):
+    """Open an mbox file or Maildir directory without loading messages"""
+    if fmt == "auto":
+        fmt = "maildir" if os.path.isdir(path) else "mbox"
+    if fmt == "maildir":
+        return mailbox.Maildir(path, factory=None, create=False)
+    return mailbox.mbox(path, factory=None, create=False)
+
+def iter_raw_messages(box, skip=0):
+    """Yield (key, raw bytes) pairs in a stable order, one message at a time"""
+    keys = box.keys()
+    if isinstance(box, mailbox.Maildir):
+        keys = sorted(keys)
+    for key in keys[skip:]:
+        yield str(key), box.get_bytes(key)
+
+def parse_raw_message(item):
+    """Decode one raw message (runs in a worker process, never touches the database)"""
+    key, raw = item
+    result = {"key": key, "message_id": None, "date": None, "subject": "", "body": "",
+              "parsed": None, "reason": None}
+    try:
+        msg = email.message_from_bytes(raw)
+        result["message_id"] = (msg["Message-ID"] or "").strip() or None
+        result["subject"] = decode_email_subject(msg["Subject"] or "")
+
+        date_header = msg["Date"]
+        if not date_header:
+            result["reason"] = "Missing Date header"
+            return result
+        try:
+            sent_at = parsedate_to_datetime(date_header)
+        except (TypeError, ValueError):
+            result["reason"] = f"Unparseable Date header: {date_header}"
+            return result
+        if sent_at.tzinfo is not None:
+            sent_at = sent_at.astimezone(timezone.utc).replace(tzinfo=None)
+        result["date"] = sent_at
+        result["body"] = get_email_body(msg)
+    except Exception as e:
+        result["reason"] = f"Unreadable message: {str(e)}"
+    return result
+
+def apply_subject_rules(results):
+    """Parse subjects with the server's rules; flags invalid ones as rejected"""
+    for result in results:
+        if result["reason"] is not None:
+            continue
+        result["parsed"] = parse_email_subject(result["subject"])
+        if not result["parsed"]:
+            parts = len(result["subject"].split("|"))
+            result["reason"] = f"Invalid subject format (expected 5+ parts, got {parts})"
+    return results
+
+def load_state(state_file):
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            return json.load(f)
+    return {"sources": {}, "imported": 0, "rejected": 0, "duplicates": 0}
+
+def save_state(state_file, state):
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, state_file)
+
+def write_rejections(report_file, source, rejected):
+    if not rejected:
+        return
+    new_file = not os.path.exists(report_file)
+    with open(report_file, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["source", "key", "date", "reason", "subject"])
+        for item in rejected:
+            date = item["date"].isoformat() if item["date"] else ""
+            writer.writerow([source, item["key"], date, item["reason"], item["subject"]])
+
+def build_ticket_docs(messages, created_by, status="Closed"):
+    """Build ticket documents, reserving ticket numbers per CR year"""
+    from ticket_service import (
+        auto_assign_ticket, format_ticket_number, reserve_ticket_numbers, queue_sort_fields
+    )
+
+    by_year = {}
+    for item in messages:
+        by_year.setdefault(item["date"].year, []).append(item)
+
+    now = datetime.utcnow()
+    docs = []
+    for year, items in by_year.items():
+        first = reserve_ticket_numbers(year, len(items))
+        for offset, item in enumerate(items):
+            parsed = item["parsed"]
+            sent_at = item["date"]
+            assignment = auto_assign_ticket(parsed["module"], open_ticket=status != "Closed")
+            docs.append({
+                "ticket_number": format_ticket_number(year, first + offset),
+                "customer": parsed["customer"],
+                "cr_type": parsed["cr_type"],
+                "issue_type": parsed["issue_type"],
+                "type": None,
+                "cr_date": sent_at,
+                "module": parsed["module"],
+                "description": f"{parsed['description']}\n\n--- Original Email Body ---\n{item['body']}",
+                "amc_cost": None,
+                "pr_approval": None,
+                "priority": "Medium",
+                "status": status,
+                "se_name": assignment["support_engineer"],
+                "developer": assignment["developer"],
+                "developer_email": assignment["developer_email"],
+                "planned_date": None,
+                "commitment_date": None,
+                "completed_on": None,
+                "completed_by": None,
+                "time_duration_hours": None,
+                "resolution_type": None,
+                "completion_remarks": None,
+                "exe_sent": None,
+                "reason_for_issue": None,
+                "customer_call": None,
+                "remarks": f"Imported from mail archive. Subject: {item['subject']}",
+                **queue_sort_fields("Medium", None),
+                "email_subject": item["subject"],
+                "email_message_id": item["message_id"],
+                "created_by": created_by,
+                "created_at": now,
+                "updated_at": now
+            })
+            if status == "Closed":
+                docs[-1]["closed_at"] = sent_at
+    return docs
+
+def imported_message_ids(message_ids):
+    """Message-IDs already on a live or archived ticket"""
+    from storage import storage
+
+    if not message_ids:
+        return set()
+    query = {"email_message_id": {"$in": message_ids}}
+    seen = {doc["email_message_id"] for doc in storage.tickets.find(query, projection={"email_message_id": 1})}
+    if storage.uses_mongo:
+        from database import tickets_archive_collection
+        seen.update(doc["email_message_id"] for doc in tickets_archive_collection.find(query, {"email_message_id": 1}))
+    return seen
+
+def write_batch(messages, created_by, status="Closed"):
+    """Insert one batch of parsed messages; returns (inserted, duplicates)"""
+    from rollups import record_rollups
+    from storage import storage
+    from ticket_service import bump_data_version
+
+    # Skip messages imported by an earlier, interrupted run, including since-archived ones
+    seen = imported_message_ids([m["message_id"] for m in messages if m["message_id"]])
+    fresh = []
+    for item in messages:
+        if item["message_id"] and item["message_id"] in seen:
+            continue
+        if item["message_id"]:
+            seen.add(item["message_id"])
+        fresh.append(item)
+
+    if not fresh:
+        return 0, len(messages)
+
+    docs = build_ticket_docs(fresh, created_by, status)
+    storage.tickets.insert_many(docs)
+
+    timestamp = datetime.utcnow().isoformat()
+    storage.audit_logs.append_many([
+        {
+            "ticket_id": str(doc["_id"]),
+            "action": "created",
+            "user": created_by,
+            "changes": {**doc, "_id": str(doc["_id"])},
+            "timestamp": timestamp
+        }
+        for doc in docs
+    ])
+    if storage.uses_mongo:
+        record_rollups(
+            [(doc["cr_date"], "opened", doc) for doc in docs]
+            + [(doc["closed_at"], "closed", doc) for doc in docs if doc.get("closed_at")]
+        )
+    bump_data_version("tickets")
+
+    return len(docs), len(messages) - len(docs)
+
+def import_source(path, pool, state, args):
+    source_state = state["sources"].setdefault(path, {"processed": 0, "done": False})
+    if source_state["done"]:
+        print(f"Skipping {path} (already imported)")
+        return
+
+    box = open_mailbox(path, args.format)
+    print(f"\nImporting {path} (resuming after {source_state['processed']} message(s))")
+
+    batch = []
+    stream = iter_raw_messages(box, skip=source_state["processed"])
+    while True:
+        batch.clear()
+        for item in stream:
+            batch.append(item)
+            if len(batch) >= args.batch_size:
+                break
+        if not batch:
+            break
+
+        chunksize = max(1, len(batch) // (args.workers * 4))
+        results = apply_subject_rules(pool.map(parse_raw_message, batch, chunksize=chunksize))
+        accepted = [r for r in results if r["reason"] is None]
+        rejected = [r for r in results if r["reason"] is not None]
+
+        inserted, duplicates = (0, 0)
+        if accepted and not args.dry_run:
+            inserted, duplicates = write_batch(accepted, args.created_by, args.status)
+        write_rejections(args.report, path, rejected)
+
+        source_state["processed"] += len(batch)
+        state["imported"] += inserted
+        state["duplicates"] += duplicates
+        state["rejected"] += len(rejected)
+        if not args.dry_run:
+            save_state(args.state_file, state)
+
+        print(f"  {source_state['processed']} processed | {inserted} imported | "
+              f"{len(rejected)} rejected | {duplicates} duplicate(s)")
+
+    source_state["done"] = True
+    box.close()
+    if not args.dry_run:
+        save_state(args.state_file, state)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import archived CR emails (mbox/Maildir) as tickets")
+    parser.add_argument("paths", nargs="+", help="mbox files or Maildir directories")
+    parser.add_argument("--format", choices=["auto", "mbox", "maildir"], default="auto")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE)
+    parser.add_argument("--report", default=DEFAULT_REPORT_FILE, help="CSV file for rejected subjects")
+    parser.add_argument("--created-by", default=IMPORT_USER)
+    parser.add_argument("--status", choices=IMPORT_STATUSES, default="Closed",
+                        help="Closed (default) keeps historical mail out of queues; Assigned imports it as open work")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report without writing tickets")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ERP TICKETING SYSTEM - MAIL ARCHIVE IMPORTER")
+    print("=" * 70)
+
+    state = load_state(args.state_file)
+    with Pool(processes=args.workers) as pool:
+        for path in args.paths:
+            import_source(path, pool, state, args)
+
+    print("=" * 70)
+    print(f"Imported: {state['imported']}  Rejected: {state['rejected']}  "
+          f"Duplicates skipped: {state['duplicates']}")
+    print(f"Rejected subjects report: {args.report}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
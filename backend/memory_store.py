@@ -0,0 +1,279 @@
+"""
+In-memory document store used by the "memory" storage backend (storage.py).
+
+Documents are kept in a dict per collection with optional unique and
+secondary hash indexes. Queries use the subset of MongoDB query syntax this
+codebase relies on: equality (None matches null or missing), $in, $nin,
+$ne, $gt/$gte/$lt/$lte, $exists, $regex/$options, $type, $or and $and.
+Equality and $in on an indexed field narrow the candidates through the
+index; everything else is a scan. Sorting follows MongoDB's ordering of
+mixed types closely enough for tickets and users.
+
+Stored documents are copied on the way in and out (shallow copies: ticket
+and user documents only hold scalar values), so callers cannot change
+stored state by mutating a returned dict.
+"""
+
+import re
+import threading
+from datetime import datetime
+from typing import Iterable, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+_TYPE_ORDER = {type(None): 0, int: 1, float: 1, bool: 5, str: 2, dict: 3, list: 4, ObjectId: 6, datetime: 7}
+_TYPE_ALIASES = {
+    "string": (str,), "date": (datetime,), "number": (int, float), "int": (int,),
+    "double": (float,), "bool": (bool,), "null": (type(None),), "objectId": (ObjectId,)
+}
+_MISSING = object()
+
+def _get(doc: dict, field: str):
+    value = doc
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _sort_key(value):
+    if value is _MISSING:
+        value = None
+    return (_TYPE_ORDER.get(type(value), 8), value if value is not None else 0)
+
+def _compare(value, operand, op) -> bool:
+    if value is _MISSING or value is None or operand is None:
+        return False
+    if _TYPE_ORDER.get(type(value)) != _TYPE_ORDER.get(type(operand)):
+        # MongoDB only compares values of the same type bracket
+        return False
+    return op(value, operand)
+
+def _equals(value, operand) -> bool:
+    if operand is None:
+        return value is _MISSING or value is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+_OPERATORS = {
+    "$eq": lambda value, operand, doc: _equals(value, operand),
+    "$ne": lambda value, operand, doc: not _equals(value, operand),
+    "$in": lambda value, operand, doc: any(_equals(value, item) for item in operand),
+    "$nin": lambda value, operand, doc: not any(_equals(value, item) for item in operand),
+    "$gt": lambda value, operand, doc: _compare(value, operand, lambda a, b: a > b),
+    "$gte": lambda value, operand, doc: _compare(value, operand, lambda a, b: a >= b),
+    "$lt": lambda value, operand, doc: _compare(value, operand, lambda a, b: a < b),
+    "$lte": lambda value, operand, doc: _compare(value, operand, lambda a, b: a <= b),
+    "$exists": lambda value, operand, doc: (value is not _MISSING) == bool(operand),
+    "$type": lambda value, operand, doc: value is not _MISSING and isinstance(
+        value, _TYPE_ALIASES.get(operand, ())
+    ) and not (operand != "bool" and isinstance(value, bool)),
+}
+
+def _regex(condition: dict) -> re.Pattern:
+    flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+    pattern = condition["$regex"]
+    return pattern if isinstance(pattern, re.Pattern) else re.compile(pattern, flags)
+
+def matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if field == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value = _get(doc, field)
+        if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+            for op, operand in condition.items():
+                if op == "$regex":
+                    if not isinstance(value, str) or not _regex(condition).search(value):
+                        return False
+                elif op == "$options":
+                    continue
+                elif op not in _OPERATORS:
+                    raise NotImplementedError(f"Query operator {op} is not supported by the memory store")
+                elif not _OPERATORS[op](value, operand, doc):
+                    return False
+        elif isinstance(condition, re.Pattern):
+            if not isinstance(value, str) or not condition.search(value):
+                return False
+        elif not _equals(value, condition):
+            return False
+    return True
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return dict(doc)
+    include = {field for field, flag in projection.items() if flag and field != "_id"}
+    if include:
+        result = {field: doc[field] for field in include if field in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {field: value for field, value in doc.items() if field not in projection}
+
+class MemoryCollection:
+    """A thread-safe collection with unique and secondary hash indexes"""
+
+    def __init__(self, unique: Iterable[str] = (), indexed: Iterable[str] = ()):
+        self._docs = {}
+        self._unique = {field: {} for field in unique}
+        self._indexes = {field: {} for field in indexed}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # -- index maintenance
+
+    def _index_add(self, doc: dict):
+        for field, index in self._unique.items():
+            value = doc.get(field)
+            if value is not None:
+                index[value] = doc["_id"]
+        for field, index in self._indexes.items():
+            index.setdefault(doc.get(field), set()).add(doc["_id"])
+
+    def _index_remove(self, doc: dict):
+        for field, index in self._unique.items():
+            if index.get(doc.get(field)) == doc["_id"]:
+                del index[doc.get(field)]
+        for field, index in self._indexes.items():
+            ids = index.get(doc.get(field))
+            if ids is not None:
+                ids.discard(doc["_id"])
+                if not ids:
+                    del index[doc.get(field)]
+
+    def _check_unique(self, doc: dict, ignore_id=None):
+        for field, index in self._unique.items():
+            value = doc.get(field)
+            if value is not None and index.get(value, ignore_id) != ignore_id:
+                raise DuplicateKeyError(f"E11000 duplicate key error: {field} {value!r}", 11000)
+
+    def _candidates(self, query: dict) -> Iterable:
+        """Smallest set of document ids an index can narrow the query to"""
+        best = None
+        for field, condition in query.items():
+            if field in self._unique and not isinstance(condition, dict):
+                doc_id = self._unique[field].get(condition)
+                return [doc_id] if doc_id is not None else []
+            index = self._indexes.get(field)
+            if index is None:
+                continue
+            if isinstance(condition, dict):
+                if set(condition) != {"$in"}:
+                    continue
+                ids = set()
+                for value in condition["$in"]:
+                    ids |= index.get(value, set())
+            else:
+                ids = index.get(condition, set())
+            if best is None or len(ids) < len(best):
+                best = ids
+        return list(best) if best is not None else list(self._docs)
+
+    # -- reads
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+             sort: Optional[list] = None, skip: int = 0, limit: int = 0) -> list:
+        query = query or {}
+        with self._lock:
+            docs = [self._docs[doc_id] for doc_id in self._candidates(query)]
+            docs = [doc for doc in docs if matches(doc, query)]
+            if sort:
+                for field, direction in reversed(sort):
+                    docs.sort(key=lambda doc: _sort_key(_get(doc, field)), reverse=direction < 0)
+            if skip:
+                docs = docs[skip:]
+            if limit:
+                docs = docs[:limit]
+            return [project(doc, projection) for doc in docs]
+
+    def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]:
+        found = self.find(query, projection, limit=1)
+        return found[0] if found else None
+
+    def count(self, query: Optional[dict] = None) -> int:
+        query = query or {}
+        if not query:
+            return len(self._docs)
+        with self._lock:
+            return sum(1 for doc_id in self._candidates(query) if matches(self._docs[doc_id], query))
+
+    def count_by(self, field: str, query: Optional[dict] = None) -> dict:
+        counts = {}
+        query = query or {}
+        with self._lock:
+            for doc_id in self._candidates(query):
+                doc = self._docs[doc_id]
+                if matches(doc, query):
+                    value = _get(doc, field)
+                    value = None if value is _MISSING else value
+                    counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def distinct(self, field: str, query: Optional[dict] = None) -> list:
+        return list(self.count_by(field, query))
+
+    # -- writes
+
+    def insert(self, doc: dict) -> ObjectId:
+        doc.setdefault("_id", ObjectId())
+        stored = dict(doc)
+        with self._lock:
+            if stored["_id"] in self._docs:
+                raise DuplicateKeyError(f"E11000 duplicate key error: _id {stored['_id']!r}", 11000)
+            self._check_unique(stored)
+            self._docs[stored["_id"]] = stored
+            self._index_add(stored)
+        return stored["_id"]
+
+    def update(self, query: dict, set_fields: Optional[dict] = None, unset_fields: Iterable[str] = (),
+               inc_fields: Optional[dict] = None, multi: bool = False) -> int:
+        """Apply $set / $unset / $inc to matching documents; returns the number matched"""
+        matched = 0
+        with self._lock:
+            for doc_id in self._candidates(query):
+                current = self._docs[doc_id]
+                if not matches(current, query):
+                    continue
+                updated = dict(current)
+                updated.update(set_fields or {})
+                for field in unset_fields:
+                    updated.pop(field, None)
+                for field, amount in (inc_fields or {}).items():
+                    updated[field] = updated.get(field, 0) + amount
+                self._check_unique(updated, ignore_id=doc_id)
+                self._index_remove(current)
+                self._docs[doc_id] = updated
+                self._index_add(updated)
+                matched += 1
+                if not multi:
+                    break
+        return matched
+
+    def increment(self, query: dict, field: str, amount: int, upsert: bool = False) -> Optional[dict]:
+        """Atomic $inc returning the updated document, like find_one_and_update"""
+        with self._lock:
+            if not self.update(query, inc_fields={field: amount}) and upsert:
+                self.insert({**query, field: amount})
+            return self.find_one(query)
+
+    def delete(self, query: dict, multi: bool = False) -> int:
+        deleted = 0
+        with self._lock:
+            for doc_id in self._candidates(query):
+                doc = self._docs[doc_id]
+                if matches(doc, query):
+                    self._index_remove(doc)
+                    del self._docs[doc_id]
+                    deleted += 1
+                    if not multi:
+                        break
+        return deleted
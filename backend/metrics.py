@@ -0,0 +1,235 @@
+"""
+In-process metrics with Prometheus text exposition, served at GET /api/metrics.
+
+Besides the metric types this module provides the two collectors that feed
+the request and database metrics: an ASGI middleware timing every request by
+route template, and a pymongo command listener timing every MongoDB command
+by collection and operation. Both only take a lock and update a few numbers
+per event, so they stay on in production.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+from pymongo import monitoring
+
+REGISTRY = []
+
+class Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def collect(self) -> list:
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Counter(Metric):
+    """Monotonic counter with optional labels"""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    """Value that goes up and down; `callback` computes it at scrape time instead"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def collect(self) -> list:
+        if self._callback is None:
+            return super().collect()
+        return self.header() + [f"{self.name} {self._callback()}"]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram of observed values (e.g. seconds)"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> list:
+        lines = self.header()
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = format_labels(self.labelnames + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+def format_labels(labelnames: tuple, values: tuple) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start until the response headers are sent, by route template",
+    ("method", "route", "status")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled"
+)
+mongodb_command_duration_seconds = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command round-trip time by collection and command",
+    ("collection", "command"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+mongodb_command_failures_total = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error, by collection and command",
+    ("collection", "command")
+)
+background_tasks_pending = Gauge(
+    "background_tasks_pending",
+    "Background tasks scheduled but not yet finished, by task",
+    ("task",)
+)
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        async def send_with_metrics(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                self.observe(scope, message["status"], started)
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            http_requests_in_flight.dec()
+            if not responded:
+                # Failed before any response was started
+                self.observe(scope, 500, started)
+
+    @staticmethod
+    def observe(scope, status_code: int, started: float):
+        # Label by route template (/api/tickets/{ticket_id}) to keep cardinality bounded
+        route = scope.get("route")
+        http_request_duration_seconds.observe(
+            time.perf_counter() - started,
+            method=scope["method"],
+            route=getattr(route, "path", "unmatched"),
+            status=status_code
+        )
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding the mongodb_command_* metrics"""
+
+    def __init__(self):
+        self._collections = {}
+
+    @staticmethod
+    def _request_key(event) -> tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        self._collections[self._request_key(event)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(self._request_key(event), "")
+        mongodb_command_duration_seconds.observe(
+            event.duration_micros / 1e6, collection=collection, command=event.command_name
+        )
+
+    def failed(self, event):
+        collection = self._collections.pop(self._request_key(event), "")
+        mongodb_command_duration_seconds.observe(
+            event.duration_micros / 1e6, collection=collection, command=event.command_name
+        )
+        mongodb_command_failures_total.inc(collection=collection, command=event.command_name)
+
+mongo_command_metrics = MongoCommandMetrics()
+
+conditional_requests_total = Counter(
+    "http_conditional_requests_total",
+    "GET responses by ETag outcome (not_modified = 304 served from If-None-Match)",
+    ("endpoint", "result")
+)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Online data migrations for the tickets collection.
+
+Ticket datetime migration: converts the legacy string fields (cr_date +
+cr_time, completed_on + completed_time, created_at, updated_at) to native
+datetimes and the "N days" time_duration to time_duration_hours. It runs in
+small batches with a pause between them, and each update only applies if the
+ticket's updated_at is unchanged, so concurrent edits are never overwritten
+(the ticket is simply picked up again by a later batch). A run holds the
+"ticket-datetime-migration" lease (leases.py), so only one worker or manual
+run migrates at a time.
+
+Runs in the background on API startup, or manually:
+    python migrations.py
+"""
+
+import os
+import threading
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from database import tickets_collection
+from leases import acquire_lease, release_lease
+from ticket_format import as_datetime
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 500))
+MIGRATION_PAUSE_SECONDS = float(os.getenv("MIGRATION_PAUSE_SECONDS", 0.1))
+# Renewed before every batch; a crashed run's lease is taken over after this long
+MIGRATION_LEASE_SECONDS = float(os.getenv("MIGRATION_LEASE_SECONDS", 300))
+MIGRATION_LEASE = "ticket-datetime-migration"
+
+LEGACY_DATETIME_QUERY = {"$or": [
+    {"cr_date": {"$type": "string"}},
+    {"completed_on": {"$type": "string"}},
+    {"created_at": {"$type": "string"}},
+    {"updated_at": {"$type": "string"}}
+]}
+
+LEGACY_FIELDS = {
+    "cr_date": 1, "cr_time": 1, "completed_on": 1, "completed_time": 1,
+    "time_duration": 1, "created_at": 1, "updated_at": 1
+}
+
+def convert_legacy_datetimes(ticket: dict) -> dict:
+    """Build the $set/$unset update for one legacy ticket"""
+    cr_date = as_datetime(ticket.get("cr_date"), ticket.get("cr_time"))
+    completed_on = as_datetime(ticket.get("completed_on") or None, ticket.get("completed_time"))
+    created_at = as_datetime(ticket.get("created_at")) or cr_date
+    updated_at = as_datetime(ticket.get("updated_at")) or created_at
+
+    time_duration_hours = None
+    if cr_date and completed_on:
+        time_duration_hours = round((completed_on - cr_date).total_seconds() / 3600, 2)
+
+    return {
+        "$set": {
+            "cr_date": cr_date,
+            "completed_on": completed_on,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "time_duration_hours": time_duration_hours
+        },
+        "$unset": {"cr_time": "", "completed_time": "", "time_duration": ""}
+    }
+
+def migrate_ticket_datetimes(batch_size: int = MIGRATION_BATCH_SIZE,
+                             pause_seconds: float = MIGRATION_PAUSE_SECONDS) -> int:
+    """Migrate every legacy ticket; returns 0 without migrating while another run holds the lease"""
+    migrated = 0
+    failed_ids = set()
+    try:
+        # Renewing before each batch stops a run that lost its lease to a takeover
+        while acquire_lease(MIGRATION_LEASE, MIGRATION_LEASE_SECONDS):
+            query = dict(LEGACY_DATETIME_QUERY)
+            if failed_ids:
+                query["_id"] = {"$nin": list(failed_ids)}
+            batch = list(tickets_collection.find(query, LEGACY_FIELDS).limit(batch_size))
+            if not batch:
+                break
+
+            operations = []
+            for ticket in batch:
+                try:
+                    update = convert_legacy_datetimes(ticket)
+                except (TypeError, ValueError) as e:
+                    print(f"Skipping ticket {ticket['_id']} in datetime migration: {str(e)}")
+                    failed_ids.add(ticket["_id"])
+                    continue
+                # Only apply if nobody wrote to the ticket since it was read
+                operations.append(UpdateOne({"_id": ticket["_id"], "updated_at": ticket.get("updated_at")}, update))
+
+            if operations:
+                result = tickets_collection.bulk_write(operations, ordered=False)
+                migrated += result.modified_count
+            time.sleep(pause_seconds)
+    finally:
+        release_lease(MIGRATION_LEASE)
+
+    return migrated
+
+def _run_ticket_datetime_migration():
+    try:
+        migrated = migrate_ticket_datetimes()
+        if migrated:
+            print(f"Ticket datetime migration: converted {migrated} ticket(s)")
+    except PyMongoError as e:
+        print(f"Ticket datetime migration failed: {str(e)}")
+
+def start_ticket_datetime_migration():
+    """Run the migration in a background thread so startup and traffic are not blocked"""
+    if tickets_collection.find_one(LEGACY_DATETIME_QUERY, {"_id": 1}) is None:
+        return
+    threading.Thread(target=_run_ticket_datetime_migration, name="ticket-datetime-migration", daemon=True).start()
+
+if __name__ == "__main__":
+    print(f"Converted {migrate_ticket_datetimes()} ticket(s)")
@@ -0,0 +1,108 @@
+"""
+MinHash signatures and a banded LSH index for near-duplicate text.
+
+Pure Python with no database access, so it can be benchmarked on its own
+(see benchmarks/duplicates_benchmark.py). Texts are reduced to word
+shingles, each shingle set to NUM_PERM min-hashes, and signatures are
+bucketed in BANDS bands of ROWS hashes: two texts share a bucket with high
+probability once their Jaccard similarity passes roughly
+(1 / BANDS) ** (1 / ROWS), i.e. about 0.5 with the defaults.
+"""
+
+import hashlib
+import random
+import re
+import threading
+from collections import defaultdict
+from typing import Hashable, Optional
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# One 64-bit hash per shingle, re-randomised per signature slot by XOR with a
+# fixed mask: much cheaper in Python than a multiply-mod permutation per slot
+_rng = random.Random(20240601)
+_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+
+def signature(text: str) -> Optional[tuple]:
+    """MinHash signature of a text, or None when it has no words"""
+    hashes = [_hash64(shingle) for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min([h ^ mask for h in hashes]) for mask in _MASKS)
+
+def similarity(first: tuple, second: tuple) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERM
+
+def _band_keys(sig: tuple) -> list:
+    return [(band, sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+class LSHIndex:
+    """Signatures grouped by partition; only texts in the same partition are compared"""
+
+    def __init__(self):
+        self._buckets = defaultdict(set)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def add(self, key: Hashable, partition: Hashable, sig: tuple):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (partition, sig)
+            for band_key in _band_keys(sig):
+                self._buckets[(partition, band_key)].add(key)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        partition, sig = entry
+        for band_key in _band_keys(sig):
+            bucket = self._buckets.get((partition, band_key))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[(partition, band_key)]
+
+    def candidates(self, partition: Hashable, sig: tuple) -> set:
+        with self._lock:
+            found = set()
+            for band_key in _band_keys(sig):
+                found |= self._buckets.get((partition, band_key), set())
+            return found
+
+    def best_match(self, partition: Hashable, sig: tuple, threshold: float) -> Optional[tuple]:
+        """(key, similarity) of the most similar indexed text at or above threshold"""
+        best = None
+        for key in self.candidates(partition, sig):
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            score = similarity(sig, entry[1])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
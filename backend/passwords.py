@@ -0,0 +1,16 @@
+"""
+Password hashing shared by the API and the bulk user importer.
+
+Kept free of database imports so process-pool workers hashing passwords
+(user_import.py) only load passlib.
+"""
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
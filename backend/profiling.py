@@ -0,0 +1,266 @@
+"""
+On-demand profiling of a single live request.
+
+An Admin sends `X-Profile: sample` (or `?profile=sample`) with an otherwise
+normal request. The request then runs under a sampling profiler that snapshots
+the handling thread's stack every PROFILE_SAMPLE_INTERVAL_MS. The result is
+stored in collapsed-stack format (`frame;frame;frame count`), ready for
+flamegraph.pl or speedscope. `X-Profile: cprofile` uses the deterministic
+profiler instead and stores the pstats report. The response carries
+`X-Profile-Id`; fetch the output from GET /api/admin/profiles/{id}.
+
+At most one request per worker is profiled at a time, and no more often than
+every PROFILE_MIN_INTERVAL_SECONDS. Requests over that limit run unprofiled
+with `X-Profile-Status: rate-limited`. Without the header or flag, the
+middleware only checks for them, and cProfile/pstats are never imported.
+
+The sampler sees the whole event-loop thread, so other requests being served
+at the same time show up in the samples too. Work the request hands to the
+threadpool is only covered when the callable is wrapped with
+profile_in_thread (ResponseCache does this); its stacks are collapsed under
+a `threadpool` root frame, and its cProfile stats are merged into the report.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5))
+PROFILE_MIN_INTERVAL_SECONDS = float(os.getenv("PROFILE_MIN_INTERVAL_SECONDS", 30))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+PROFILES_KEPT = 20
+
+PROFILE_MODES = ("sample", "cprofile")
+
+_profiles = OrderedDict()
+_busy = threading.Lock()
+_last_started = 0.0
+# The profile of the request being handled, seen by its tasks and threadpool calls
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+def is_profiling() -> bool:
+    return _active_profile.get() is not None
+
+def profile_in_thread(func: Callable) -> Callable:
+    """Wrap a callable about to be run in a worker thread so the active request profile covers it"""
+    session = _active_profile.get()
+    if session is None:
+        return func
+
+    def profiled(*args, **kwargs):
+        with session.thread():
+            return func(*args, **kwargs)
+    return profiled
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    return _profiles.get(profile_id)
+
+def list_profiles() -> list:
+    return [
+        {key: value for key, value in profile.items() if key != "output"}
+        for profile in reversed(_profiles.values())
+    ]
+
+def _store(profile: dict):
+    _profiles[profile["id"]] = profile
+    while len(_profiles) > PROFILES_KEPT:
+        _profiles.popitem(last=False)
+    if PROFILE_DIR:
+        extension = "collapsed" if profile["mode"] == "sample" else "txt"
+        with open(os.path.join(PROFILE_DIR, f"{profile['id']}.{extension}"), "w") as f:
+            f.write(profile["output"])
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class StackSampler:
+    """Samples one thread's Python stack, plus any worker threads added, from a helper thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._workers = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def add_thread(self, thread_id: int):
+        self._workers.add(thread_id)
+
+    def remove_thread(self, thread_id: int):
+        self._workers.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            self._sample(frames.get(self.thread_id), [])
+            for thread_id in list(self._workers):
+                self._sample(frames.get(thread_id), ["threadpool"])
+            self.samples += 1
+
+    def _sample(self, frame, root: list):
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        self.stacks[";".join(root + list(reversed(stack)))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+class ProfileSession:
+    """One profiled request: its sampler or cProfile, and the worker threads it spread to"""
+
+    def __init__(self, sampler: Optional[StackSampler] = None):
+        self.sampler = sampler
+        self.thread_profilers = []
+
+    @contextmanager
+    def thread(self):
+        thread_id = threading.get_ident()
+        if self.sampler:
+            self.sampler.add_thread(thread_id)
+            try:
+                yield
+            finally:
+                self.sampler.remove_thread(thread_id)
+            return
+
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per interpreter
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.thread_profilers.append(profiler)
+
+def _request_mode(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.decode("latin-1").strip().lower() or "sample"
+    query = scope.get("query_string", b"")
+    if b"profile=" in query:
+        for pair in query.decode("latin-1").split("&"):
+            key, _, value = pair.partition("=")
+            if key == "profile":
+                return value.strip().lower() or "sample"
+    return None
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return token.strip()
+    return None
+
+class ProfileMiddleware:
+    """ASGI middleware profiling requests that ask for it (Admin only)
+
+    `authorize(token)` returns True when the bearer token belongs to an Admin.
+    """
+
+    def __init__(self, app, authorize: Callable[[str], bool]):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        mode = _request_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = _bearer_token(scope)
+        if mode not in PROFILE_MODES or not token or not self.authorize(token):
+            # Not for us to honour; serve the request as if the flag were absent
+            await self.app(scope, receive, send)
+            return
+
+        global _last_started
+        now = time.monotonic()
+        if now - _last_started < PROFILE_MIN_INTERVAL_SECONDS or not _busy.acquire(blocking=False):
+            await self.app(scope, receive, self._with_headers(send, {"X-Profile-Status": "rate-limited"}))
+            return
+        _last_started = now
+
+        profile_id = uuid.uuid4().hex[:12]
+        try:
+            started = time.perf_counter()
+            sampler = profiler = None
+            if mode == "sample":
+                sampler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+                sampler.start()
+            else:
+                import cProfile
+                profiler = cProfile.Profile()
+                profiler.enable()
+            session = ProfileSession(sampler)
+            context_token = _active_profile.set(session)
+            try:
+                await self.app(scope, receive, self._with_headers(send, {"X-Profile-Id": profile_id}))
+            finally:
+                _active_profile.reset(context_token)
+                if sampler:
+                    sampler.stop()
+                    output = sampler.collapsed()
+                else:
+                    profiler.disable()
+                    output = self._pstats_report(profiler, session.thread_profilers)
+                _store({
+                    "id": profile_id,
+                    "mode": mode,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "samples": sampler.samples if sampler else None,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "output": output
+                })
+        finally:
+            _busy.release()
+
+    @staticmethod
+    def _pstats_report(profiler, thread_profilers: list) -> str:
+        import io
+        import pstats
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        for thread_profiler in thread_profilers:
+            stats.add(thread_profiler)
+        stats.sort_stats("cumulative").print_stats(60)
+        return stream.getvalue()
+
+    @staticmethod
+    def _with_headers(send, headers: dict):
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()
+                ]
+            await send(message)
+        return send_with_headers
@@ -0,0 +1,88 @@
+"""
+Single-flight coalescing with a short TTL cache for expensive read endpoints.
+
+`await cache.get(key, compute, *args)` returns the cached result for `key`
+while it is younger than the cache's TTL and the ticket data version
+(ticket_service.bump_data_version) has not moved since it was computed, so
+any ticket write, in any worker, invalidates it. On a miss, `compute` runs
+once in the threadpool. Identical requests arriving meanwhile await that
+same computation instead of starting their own (coalesced). A TTL of 0
+keeps the coalescing and disables the cache; it is always 0 when
+reporting reads may be served by a secondary (MONGO_REPORTING_READ_PREFERENCE),
+whose data can be older than the version it would be cached under. A
+profiled request (profiling.py) always runs its own computation, profiled in
+its worker thread, so the profile shows the work rather than a cache hit.
+
+Outcomes are counted in response_cache_requests_total{cache, result}, with
+result = hit, miss or coalesced.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+from database import REPORTING_READS_FROM_PRIMARY
+from metrics import Counter
+from profiling import is_profiling, profile_in_thread
+from ticket_service import get_data_version
+
+# Reporting reads served by a lagging secondary must not be cached under the newer version
+RESPONSE_CACHE_SECONDS = float(os.getenv("RESPONSE_CACHE_SECONDS", 5)) if REPORTING_READS_FROM_PRIMARY else 0.0
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 64))
+
+response_cache_requests_total = Counter(
+    "response_cache_requests_total",
+    "Cached endpoint lookups by outcome (hit, miss, coalesced)",
+    ("cache", "result")
+)
+
+class ResponseCache:
+    def __init__(self, name: str, ttl_seconds: float = RESPONSE_CACHE_SECONDS,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, dataset: str = "tickets"):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.dataset = dataset
+        # key -> (data version, expires_at, value); only touched from the event loop
+        self._entries = {}
+        self._inflight = {}
+
+    async def get(self, key: Hashable, compute: Callable[..., Any], *args) -> Any:
+        if is_profiling():
+            response_cache_requests_total.inc(cache=self.name, result="miss")
+            return await run_in_threadpool(profile_in_thread(compute), *args)
+        version = await run_in_threadpool(get_data_version, self.dataset)
+        entry = self._entries.get(key)
+        if entry and entry[0] == version and entry[1] > time.monotonic():
+            response_cache_requests_total.inc(cache=self.name, result="hit")
+            return entry[2]
+
+        flight_key = (key, version)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            # A task of its own, so a disconnecting first caller cannot cancel it for the others
+            task = asyncio.ensure_future(run_in_threadpool(compute, *args))
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda done: self._finish(key, version, done))
+            response_cache_requests_total.inc(cache=self.name, result="miss")
+        else:
+            response_cache_requests_total.inc(cache=self.name, result="coalesced")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, version: int, task: asyncio.Future):
+        self._inflight.pop((key, version), None)
+        # Retrieving the exception also keeps asyncio from logging it as unhandled
+        if task.cancelled() or task.exception() is not None or self.ttl_seconds <= 0:
+            return
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: e for k, e in self._entries.items() if e[1] > now}
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (version, now + self.ttl_seconds, task.result())
+
+    def clear(self):
+        self._entries.clear()
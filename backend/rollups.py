@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Daily ticket rollups for trend reporting.
+
+One document per day per dimension value (module, developer, customer, plus
+a "total" row) counts tickets opened, completed and closed that day. The
+ticket write paths increment them as they happen; a backfill rebuilds them
+from the tickets and tickets_archive collections (archived tickets keep their
+history) into a scratch collection and swaps it in, so
+live increments never mix with the rebuild (those landing while it runs
+may be missed; run it at a quiet time):
+    python rollups.py --backfill
+"""
+
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from pymongo import UpdateOne
+
+from database import (
+    db, tickets_collection, tickets_archive_collection, ticket_rollups_collection,
+    ticket_rollups_reporting_collection, TICKET_ROLLUPS_INDEX
+)
+
+ROLLUP_DIMENSIONS = ("module", "developer", "customer")
+ROLLUP_COUNTERS = ("opened", "completed", "closed")
+TOTAL_DIMENSION = "total"
+
+def day_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+def rollup_keys(ticket: dict) -> list:
+    """(dimension, key) pairs a ticket contributes to"""
+    keys = [(TOTAL_DIMENSION, "all")]
+    for dimension in ROLLUP_DIMENSIONS:
+        if ticket.get(dimension):
+            keys.append((dimension, ticket[dimension]))
+    return keys
+
+def rollup_id(day: datetime, dimension: str, key: str) -> str:
+    return f"{day.strftime('%Y-%m-%d')}|{dimension}|{key}"
+
+def record_rollups(events: Iterable[tuple]):
+    """Apply (timestamp, counter, ticket) events as one batch of upserts"""
+    increments = Counter()
+    for timestamp, counter, ticket in events:
+        day = day_start(timestamp)
+        for dimension, key in rollup_keys(ticket):
+            increments[(day, dimension, key, counter)] += 1
+    if not increments:
+        return
+
+    operations = [
+        UpdateOne(
+            {"_id": rollup_id(day, dimension, key)},
+            {
+                "$inc": {counter: amount},
+                "$setOnInsert": {"day": day, "dimension": dimension, "key": key}
+            },
+            upsert=True
+        )
+        for (day, dimension, key, counter), amount in increments.items()
+    ]
+    ticket_rollups_collection.bulk_write(operations, ordered=False)
+
+def record_rollup(timestamp: datetime, counter: str, ticket: dict):
+    record_rollups([(timestamp, counter, ticket)])
+
+def backfill_rollups():
+    """Rebuild every rollup document from the live and archived tickets"""
+    sources = {
+        "opened": ({}, "$cr_date"),
+        "completed": ({"completed_on": {"$type": "date"}}, "$completed_on"),
+        # Tickets closed before closed_at existed fall back to their last update
+        "closed": ({"status": "Closed"}, {"$ifNull": ["$closed_at", "$updated_at"]})
+    }
+    rebuild = db[f"{ticket_rollups_collection.name}_rebuild"]
+    rebuild.drop()
+    rebuild.create_index(TICKET_ROLLUPS_INDEX)
+    for counter, (match, date_field) in sources.items():
+        for dimension in ROLLUP_DIMENSIONS + (TOTAL_DIMENSION,):
+            key = "all" if dimension == TOTAL_DIMENSION else f"${dimension}"
+            ticket_filter = {**match, "cr_date": {"$type": "date"}}
+            if dimension != TOTAL_DIMENSION:
+                ticket_filter[dimension] = {"$nin": [None, ""]}
+            tickets_collection.aggregate([
+                {"$match": ticket_filter},
+                {"$unionWith": {"coll": tickets_archive_collection.name, "pipeline": [{"$match": ticket_filter}]}},
+                # Legacy string timestamps (not yet migrated) cannot be truncated to a day
+                {"$addFields": {"_rollup_date": date_field}},
+                {"$match": {"_rollup_date": {"$type": "date"}}},
+                {"$group": {
+                    "_id": {"day": {"$dateTrunc": {"date": "$_rollup_date", "unit": "day"}}, "key": key},
+                    counter: {"$sum": 1}
+                }},
+                {"$project": {
+                    "_id": {"$concat": [
+                        {"$dateToString": {"date": "$_id.day", "format": "%Y-%m-%d"}},
+                        f"|{dimension}|",
+                        "$_id.key"
+                    ]},
+                    "day": "$_id.day",
+                    "dimension": dimension,
+                    "key": "$_id.key",
+                    counter: 1
+                }},
+                {"$merge": {
+                    "into": rebuild.name,
+                    "on": "_id",
+                    "whenMatched": [{"$set": {counter: "$$new." + counter}}],
+                    "whenNotMatched": "insert"
+                }}
+            ], allowDiskUse=True)
+    # Atomic swap: readers and record_rollups see either the old or the rebuilt rollups
+    rebuild.rename(ticket_rollups_collection.name, dropTarget=True)
+
+def get_trends(dimension: str, days: int, key: Optional[str] = None) -> list:
+    since = day_start(datetime.utcnow()) - timedelta(days=days - 1)
+    query = {"dimension": dimension, "day": {"$gte": since}}
+    if key:
+        query["key"] = key
+    rows = ticket_rollups_reporting_collection.find(query, {"_id": 0}).sort([("day", 1), ("key", 1)])
+    return [
+        {
+            "day": row["day"].strftime("%Y-%m-%d"),
+            "key": row["key"],
+            **{counter: row.get(counter, 0) for counter in ROLLUP_COUNTERS}
+        }
+        for row in rows
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain daily ticket rollups")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild all rollups from tickets")
+    args = parser.parse_args()
+    if args.backfill:
+        backfill_rollups()
+        print(f"Rebuilt {ticket_rollups_collection.count_documents({})} rollup document(s)")
+    else:
+        parser.print_help()
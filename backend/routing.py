@@ -0,0 +1,190 @@
+"""
+Auto-assignment routing table.
+
+The module -> support engineer / developer maps live in MongoDB so they can be
+changed without a deploy. Every process holds an immutable snapshot of the
+table; lookups read the current snapshot without locking and a background
+poller swaps in a new snapshot whenever the stored version changes.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from database import STORAGE_BACKEND, routing_collection
+
+ROUTING_DOC_ID = "default"
+ROUTING_REFRESH_SECONDS = float(os.getenv("ROUTING_REFRESH_SECONDS", 5))
+
+# Module Mappings (AS-IS from requirements), used to seed the routing table
+supportModuleMap = {
+    "PO": "Seenivasan", "Invy": "Seenivasan", "RMI": "Seenivasan",
+    "Paper RMI": "Muthuvel", "HT RMI": "Seenivasan", "WVG Yinvy": "Seenivasan",
+    "Knitting Yinvy": "Seenivasan", "Import": "Seenivasan", "Paper Import": "Seenivasan",
+    "PPC": "Vignesh", "Pre Spg": "Vignesh", "Spg": "Vignesh",
+    "Post Spg": "Vignesh", "QC": "Vignesh", "Knitting Prodn": "Vignesh",
+    "WVG Prep": "Vignesh", "WVG Prodn": "Vignesh", "Paper Prodn": "Vignesh",
+    "HT Prodn": "Vignesh", "MMS": "Mariyaiya", "EMS": "Mariyaiya",
+    "Power": "Mariyaiya", "DSales": "Seenivasan", "Paper Sales": "Seenivasan",
+    "WSales": "Seenivasan", "SSales": "Seenivasan", "ESales": "Seenivasan",
+    "WVG ESales": "Seenivasan", "Knitting Sales": "Seenivasan", "WVG Sales": "Seenivasan",
+    "HT Sales": "Seenivasan", "Payroll": "Palanivel", "HR": "Palanivel",
+    "Canteen": "Seenivasan", "GMS": "Seenivasan", "FA": "Palanivel",
+    "FAD": "Palanivel", "Costing": "Palanivel", "MIS": "Palanivel",
+    "WVG MIS": "Palanivel", "Txn Approval": "Seenivasan", "Web Reports": "Seenivasan",
+    "System Admin": "Seenivasan", "User Rights": "Palanivel", "Automail": "Seenivasan"
+}
+
+developerModuleMap = {
+    "PO": "Mariyaiya", "Invy": "Mariyaiya", "RMI": "Mariyaiya",
+    "Paper RMI": "Mariyaiya", "HT RMI": "Mariyaiya", "WVG Yinvy": "Mariyaiya",
+    "Knitting Yinvy": "Mariyaiya", "Import": "Sasi", "Paper Import": "Sasi",
+    "PPC": "Annamalai", "Pre Spg": "Annamalai", "Spg": "Annamalai",
+    "Post Spg": "Annamalai", "QC": "Annamalai", "Knitting Prodn": "Annamalai",
+    "WVG Prep": "Annamalai", "WVG Prodn": "Annamalai", "Paper Prodn": "Annamalai",
+    "HT Prodn": "Mariya", "MMS": "Mariyaiya", "EMS": "Mariyaiya",
+    "Power": "Mariyaiya", "DSales": "Annamalai", "Paper Sales": "Annamalai",
+    "WSales": "Annamalai", "SSales": "Annamalai", "ESales": "Annamalai",
+    "WVG ESales": "Annamalai", "Knitting Sales": "Annamalai", "WVG Sales": "Annamalai",
+    "HT Sales": "Mariya", "Payroll": "Sasi", "HR": "Sasi",
+    "Canteen": "Mariyaiya", "GMS": "Mariyaiya", "FA": "Sasi",
+    "FAD": "Sasi", "Costing": "Sasi", "MIS": "Mariya",
+    "WVG MIS": "Sasi", "PO Approval": "Mohan Babu", "Txn Approval": "Mohan Babu",
+    "Web Reports": "Mohan Babu", "System Admin": "Sasi", "User Rights": "Mariya",
+    "Automail": "Mohan Babu", "All Modules Report": "Udhay", "FGI": "Annamalai",
+    "PPS": "Mariya", "CSM": "Mohan Babu"
+}
+
+developerEmailMap = {
+    "Mariyaiya": "mariyaiya.m@kalsofte.com",
+    "Annamalai": "annamalai.s@kalsofte.com",
+    "Sasi": "sasikumar.r@kalsofte.com",
+    "Mariya": "maria@kalsofte.com",
+    "Mohan Babu": "mohanbabuvn@kalsofte.com",
+    "Udhay": "udhay@kalsofte.com"
+}
+
+@dataclass(frozen=True)
+class RoutingSnapshot:
+    version: int
+    support_module_map: Mapping[str, str]
+    developer_module_map: Mapping[str, str]
+    developer_email_map: Mapping[str, str]
+    # Modules routed to the least-loaded member of a developer pool
+    developer_pool_map: Mapping[str, Tuple[str, ...]]
+    # Precomputed reference data served by /api/modules, /api/developers, /api/support-engineers
+    modules: tuple
+    developers: tuple
+    support_engineers: tuple
+
+def build_snapshot(doc: dict) -> RoutingSnapshot:
+    support = dict(doc["support_module_map"])
+    developer = dict(doc["developer_module_map"])
+    pools = {module: tuple(names) for module, names in doc.get("developer_pool_map", {}).items() if names}
+    pooled_developers = {name for names in pools.values() for name in names}
+    return RoutingSnapshot(
+        version=doc["version"],
+        support_module_map=MappingProxyType(support),
+        developer_module_map=MappingProxyType(developer),
+        developer_email_map=MappingProxyType(dict(doc["developer_email_map"])),
+        developer_pool_map=MappingProxyType(pools),
+        modules=tuple(support.keys()),
+        developers=tuple(sorted(set(developer.values()) | pooled_developers)),
+        support_engineers=tuple(sorted(set(support.values())))
+    )
+
+_snapshot: Optional[RoutingSnapshot] = None
+_start_lock = threading.Lock()
+_poller = None
+
+def seed_routing_doc() -> dict:
+    """The built-in maps as routing table version 1"""
+    return {
+        "_id": ROUTING_DOC_ID,
+        "version": 1,
+        "support_module_map": supportModuleMap,
+        "developer_module_map": developerModuleMap,
+        "developer_email_map": developerEmailMap,
+        "developer_pool_map": {},
+        "updated_at": datetime.utcnow().isoformat(),
+        "updated_by": "seed"
+    }
+
+def seed_routing_table():
+    """Store the built-in maps as version 1 if no routing table exists yet"""
+    try:
+        routing_collection.insert_one(seed_routing_doc())
+    except DuplicateKeyError:
+        pass
+
+def reload_routing() -> RoutingSnapshot:
+    """Load the stored table and swap it in"""
+    global _snapshot
+    doc = routing_collection.find_one({"_id": ROUTING_DOC_ID})
+    if doc is None:
+        seed_routing_table()
+        doc = routing_collection.find_one({"_id": ROUTING_DOC_ID})
+    _snapshot = build_snapshot(doc)
+    return _snapshot
+
+def _poll_routing_version():
+    while True:
+        time.sleep(ROUTING_REFRESH_SECONDS)
+        try:
+            doc = routing_collection.find_one({"_id": ROUTING_DOC_ID}, {"version": 1})
+            if doc and (_snapshot is None or doc["version"] != _snapshot.version):
+                snapshot = reload_routing()
+                print(f"Routing table reloaded (version {snapshot.version})")
+        except PyMongoError as e:
+            print(f"Error refreshing routing table: {str(e)}")
+
+def start_routing():
+    """Load the routing table and start the version poller (idempotent)"""
+    global _poller, _snapshot
+    with _start_lock:
+        if _poller is not None:
+            return
+        if STORAGE_BACKEND != "mongo":
+            # The memory backend has no routing table to poll; serve the built-in maps
+            if _snapshot is None:
+                _snapshot = build_snapshot(seed_routing_doc())
+            return
+        reload_routing()
+        _poller = threading.Thread(target=_poll_routing_version, name="routing-refresh", daemon=True)
+        _poller.start()
+
+def current_routing() -> RoutingSnapshot:
+    snapshot = _snapshot
+    if snapshot is None:
+        start_routing()
+        snapshot = _snapshot
+    return snapshot
+
+def update_routing(changes: dict, expected_version: Optional[int], updated_by: str) -> Optional[RoutingSnapshot]:
+    """Replace one or more maps, bumping the version.
+
+    Returns None when expected_version no longer matches (concurrent edit).
+    """
+    query = {"_id": ROUTING_DOC_ID}
+    if expected_version is not None:
+        query["version"] = expected_version
+    doc = routing_collection.find_one_and_update(
+        query,
+        {
+            "$set": {**changes, "updated_at": datetime.utcnow().isoformat(), "updated_by": updated_by},
+            "$inc": {"version": 1}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        return None
+    global _snapshot
+    _snapshot = build_snapshot(doc)
+    return _snapshot
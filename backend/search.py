@@ -0,0 +1,104 @@
+"""
+Full-text ticket search.
+
+Backed by a MongoDB text index over description, remarks and
+completion_remarks (see database.py), so matching, stemming and relevance
+scoring happen in the server. Results are ranked by textScore and carry short
+highlighted snippets built here from the matched fields.
+"""
+
+import html
+import os
+import re
+from typing import Optional
+
+from database import tickets_collection, tickets_archive_collection
+from ticket_format import ticket_to_api
+
+SEARCH_FIELDS = ("description", "remarks", "completion_remarks")
+SNIPPET_RADIUS = 80
+# Deepest page served; each page re-sorts every result before it by text score
+SEARCH_MAX_PAGE = int(os.getenv("SEARCH_MAX_PAGE", 50))
+
+def query_terms(q: str) -> list:
+    """Words and quoted phrases to highlight; negated terms (-word) are skipped"""
+    terms = re.findall(r'"([^"]+)"', q)
+    for word in re.sub(r'"[^"]*"', " ", q).split():
+        if not word.startswith("-"):
+            terms.append(word)
+    return [term.strip() for term in terms if term.strip()]
+
+def highlight_pattern(terms: list) -> Optional[re.Pattern]:
+    if not terms:
+        return None
+    # The text index stems words, so highlight any word starting with a term
+    alternatives = sorted((re.escape(term) for term in terms), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\w*", re.IGNORECASE)
+
+def snippet(text: str, pattern: re.Pattern) -> Optional[str]:
+    """HTML-escaped excerpt around the first match, with matches wrapped in <mark>"""
+    first = pattern.search(text)
+    if not first:
+        return None
+    start = max(first.start() - SNIPPET_RADIUS, 0)
+    end = min(first.end() + SNIPPET_RADIUS, len(text))
+    excerpt = text[start:end]
+    parts = []
+    position = 0
+    for match in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        position = match.end()
+    parts.append(html.escape(excerpt[position:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(text) else "")
+
+def ticket_snippets(ticket: dict, pattern: Optional[re.Pattern]) -> dict:
+    if pattern is None:
+        return {}
+    snippets = {}
+    for field in SEARCH_FIELDS:
+        if isinstance(ticket.get(field), str):
+            excerpt = snippet(ticket[field], pattern)
+            if excerpt:
+                snippets[field] = excerpt
+    return snippets
+
+def _ranked(collection, query: dict, limit: int) -> list:
+    return list(
+        collection.find(query, {"score": {"$meta": "textScore"}})
+        .sort([("score", {"$meta": "textScore"}), ("cr_date", -1)])
+        .limit(limit)
+    )
+
+def search_tickets(q: str, module: Optional[str] = None, status: Optional[str] = None,
+                   page: int = 1, page_size: int = 20, include_archived: bool = False) -> dict:
+    query = {"$text": {"$search": q}}
+    if module:
+        query["module"] = module
+    if status:
+        query["status"] = status
+
+    # Fetch one extra to know whether there is a next page
+    limit = page * page_size + 1
+    tickets = _ranked(tickets_collection, query, limit)
+    if include_archived:
+        tickets += _ranked(tickets_archive_collection, query, limit)
+        tickets.sort(key=lambda t: t["score"], reverse=True)
+        tickets = tickets[:limit]
+
+    page_tickets = tickets[(page - 1) * page_size:page * page_size]
+    pattern = highlight_pattern(query_terms(q))
+    results = []
+    for ticket in page_tickets:
+        score = ticket.pop("score")
+        results.append({
+            "ticket": ticket_to_api(ticket),
+            "score": round(score, 3),
+            "snippets": ticket_snippets(ticket, pattern)
+        })
+    return {
+        "results": results,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(tickets) > page * page_size
+    }
@@ -1,11 +1,13 @@
-from fastapi import FastAPI, HTTPException, Depends, status, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, status, BackgroundTasks, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from starlette.concurrency import run_in_threadpool
+from pymongo import ASCENDING, DESCENDING
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
+from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 import os
 from dotenv import load_dotenv
@@ -19,6 +21,39 @@ import re
 import threading
 import time
 import uuid
+import json
+import asyncio
+import hashlib
+import heapq
+
+from database import (
+    tickets_archive_collection, tickets_archive_reporting_collection, TOMBSTONE_RETENTION_DAYS
+)
+from storage import storage
+from change_feed import ticket_events, format_sse, RESET
+from metrics import render_metrics, conditional_requests_total, background_tasks_pending, MetricsMiddleware
+from tracing import TraceMiddleware, slowest_requests
+from profiling import ProfileMiddleware, get_profile, list_profiles, profile_in_thread
+from ticket_format import ticket_to_api, as_datetime, DATE_FORMAT
+from json_response import FastJSONResponse, dumps as json_dumps
+from response_cache import ResponseCache
+from migrations import start_ticket_datetime_migration
+from routing import start_routing, current_routing, update_routing
+from workload import pending_counts, OPEN_STATUSES
+from ticket_service import (
+    send_assignment_email, create_audit_log, create_ticket_record,
+    queue_sort_fields, backfill_queue_fields, bump_data_version
+)
+from analytics import get_resolution_analytics
+from rollups import record_rollup, get_trends, ROLLUP_DIMENSIONS, TOTAL_DIMENSION
+from archival import start_archival
+from search import search_tickets, SEARCH_MAX_PAGE
+from duplicates import duplicate_index, get_duplicate_clusters
+from passwords import hash_password, verify_password
+from user_import import (
+    VALID_ROLES, USER_IMPORT_MAX_ROWS, detect_format, parse_users, import_users,
+    get_hash_executor, shutdown_hash_executor
+)
 
 load_dotenv()
 
@@ -32,78 +67,25 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# MongoDB Connection
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/erp_ticketing")
-client = MongoClient(MONGO_URL)
-db = client.get_database()
-
-# Collections
-users_collection = db["users"]
-tickets_collection = db["tickets"]
-ticket_counter_collection = db["ticket_counter"]
-audit_logs_collection = db["audit_logs"]
-
-# Create indexes
-tickets_collection.create_index([("ticket_number", ASCENDING)], unique=True)
-tickets_collection.create_index([("status", ASCENDING)])
-tickets_collection.create_index([("module", ASCENDING)])
-users_collection.create_index([("username", ASCENDING)], unique=True)
+app.add_middleware(TraceMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
 
-# Module Mappings (AS-IS from requirements)
-supportModuleMap = {
-    "PO": "Seenivasan", "Invy": "Seenivasan", "RMI": "Seenivasan",
-    "Paper RMI": "Muthuvel", "HT RMI": "Seenivasan", "WVG Yinvy": "Seenivasan",
-    "Knitting Yinvy": "Seenivasan", "Import": "Seenivasan", "Paper Import": "Seenivasan",
-    "PPC": "Vignesh", "Pre Spg": "Vignesh", "Spg": "Vignesh",
-    "Post Spg": "Vignesh", "QC": "Vignesh", "Knitting Prodn": "Vignesh",
-    "WVG Prep": "Vignesh", "WVG Prodn": "Vignesh", "Paper Prodn": "Vignesh",
-    "HT Prodn": "Vignesh", "MMS": "Mariyaiya", "EMS": "Mariyaiya",
-    "Power": "Mariyaiya", "DSales": "Seenivasan", "Paper Sales": "Seenivasan",
-    "WSales": "Seenivasan", "SSales": "Seenivasan", "ESales": "Seenivasan",
-    "WVG ESales": "Seenivasan", "Knitting Sales": "Seenivasan", "WVG Sales": "Seenivasan",
-    "HT Sales": "Seenivasan", "Payroll": "Palanivel", "HR": "Palanivel",
-    "Canteen": "Seenivasan", "GMS": "Seenivasan", "FA": "Palanivel",
-    "FAD": "Palanivel", "Costing": "Palanivel", "MIS": "Palanivel",
-    "WVG MIS": "Palanivel", "Txn Approval": "Seenivasan", "Web Reports": "Seenivasan",
-    "System Admin": "Seenivasan", "User Rights": "Palanivel", "Automail": "Seenivasan"
-}
-
-developerModuleMap = {
-    "PO": "Mariyaiya", "Invy": "Mariyaiya", "RMI": "Mariyaiya",
-    "Paper RMI": "Mariyaiya", "HT RMI": "Mariyaiya", "WVG Yinvy": "Mariyaiya",
-    "Knitting Yinvy": "Mariyaiya", "Import": "Sasi", "Paper Import": "Sasi",
-    "PPC": "Annamalai", "Pre Spg": "Annamalai", "Spg": "Annamalai",
-    "Post Spg": "Annamalai", "QC": "Annamalai", "Knitting Prodn": "Annamalai",
-    "WVG Prep": "Annamalai", "WVG Prodn": "Annamalai", "Paper Prodn": "Annamalai",
-    "HT Prodn": "Mariya", "MMS": "Mariyaiya", "EMS": "Mariyaiya",
-    "Power": "Mariyaiya", "DSales": "Annamalai", "Paper Sales": "Annamalai",
-    "WSales": "Annamalai", "SSales": "Annamalai", "ESales": "Annamalai",
-    "WVG ESales": "Annamalai", "Knitting Sales": "Annamalai", "WVG Sales": "Annamalai",
-    "HT Sales": "Mariya", "Payroll": "Sasi", "HR": "Sasi",
-    "Canteen": "Mariyaiya", "GMS": "Mariyaiya", "FA": "Sasi",
-    "FAD": "Sasi", "Costing": "Sasi", "MIS": "Mariya",
-    "WVG MIS": "Sasi", "PO Approval": "Mohan Babu", "Txn Approval": "Mohan Babu",
-    "Web Reports": "Mohan Babu", "System Admin": "Sasi", "User Rights": "Mariya",
-    "Automail": "Mohan Babu", "All Modules Report": "Udhay", "FGI": "Annamalai",
-    "PPS": "Mariya", "CSM": "Mohan Babu"
-}
-
-developerEmailMap = {
-    "Mariyaiya": "mariyaiya.m@kalsofte.com",
-    "Annamalai": "annamalai.s@kalsofte.com",
-    "Sasi": "sasikumar.r@kalsofte.com",
-    "Mariya": "maria@kalsofte.com",
-    "Mohan Babu": "mohanbabuvn@kalsofte.com",
-    "Udhay": "udhay@kalsofte.com"
-}
+# An in-progress Idempotency-Key whose request never finished (e.g. the worker
+# died) can be taken over by a retry after this many seconds
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", 60))
+
+# Delta sync watermarks trail the server clock so writes still in flight when a
+# sync query runs are picked up by the next sync (clients dedupe by ticket_number)
+SYNC_WATERMARK_LAG_SECONDS = int(os.getenv("SYNC_WATERMARK_LAG_SECONDS", 5))
+
+# Optional bearer token required to scrape GET /api/metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 # Pydantic Models
 class UserLogin(BaseModel):
@@ -154,12 +136,6 @@ class StatusUpdate(BaseModel):
     completion_remarks: Optional[str] = None
 
 # Helper Functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -167,14 +143,13 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+def get_user_from_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        user = users_collection.find_one({"username": username})
+        user = storage.users.get(username)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         user["_id"] = str(user["_id"])
@@ -182,114 +157,47 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
-def generate_ticket_number() -> str:
-    """Generate ticket number in YYYY-00001 format"""
-    current_year = datetime.now().year
-    counter_doc = ticket_counter_collection.find_one({"year": current_year})
-    
-    if counter_doc is None:
-        # Create new counter for the year
-        ticket_counter_collection.insert_one({"year": current_year, "counter": 1})
-        return f"{current_year}-00001"
-    else:
-        # Increment counter
-        new_counter = counter_doc["counter"] + 1
-        ticket_counter_collection.update_one(
-            {"year": current_year},
-            {"$set": {"counter": new_counter}}
-        )
-        return f"{current_year}-{str(new_counter).zfill(5)}"
-
-def auto_assign_ticket(module: str) -> dict:
-    """Auto-assign Support Engineer and Developer based on module"""
-    support_engineer = supportModuleMap.get(module, "Unassigned")
-    developer = developerModuleMap.get(module, "Unassigned")
-    developer_email = developerEmailMap.get(developer, "")
-    
-    return {
-        "support_engineer": support_engineer,
-        "developer": developer,
-        "developer_email": developer_email
-    }
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return get_user_from_token(credentials.credentials)
 
-def send_assignment_email(ticket_data: dict):
-    """Send email to assigned developer"""
+def is_admin_token(token: str) -> bool:
     try:
-        email_address = os.getenv("EMAIL_ADDRESS")
-        email_password = os.getenv("EMAIL_PASSWORD")
-        smtp_server = os.getenv("EMAIL_SMTP_SERVER", "smtp.gmail.com")
-        smtp_port = int(os.getenv("EMAIL_SMTP_PORT", 587))
-        cc_email = os.getenv("DEVELOPMENT_CC_EMAIL", "development@kalsofte.com")
-        
-        if not email_password or email_password == "your-app-password-here":
-            print("Email credentials not configured. Skipping email notification.")
-            return
-        
-        developer_email = ticket_data.get("developer_email")
-        if not developer_email:
-            print(f"No email found for developer: {ticket_data.get('developer')}")
-            return
-        
-        # Create email
-        msg = MIMEMultipart()
-        msg['From'] = email_address
-        msg['To'] = developer_email
-        msg['Cc'] = cc_email
-        msg['Subject'] = f"New CR Assigned - Ticket {ticket_data['ticket_number']}"
-        
-        body = f"""Dear Team,
+        return get_user_from_token(token)["role"] == "Admin"
+    except HTTPException:
+        return False
 
-A new Change Request (CR) has been received and assigned.
-Please find the details below:
+# Profiles single requests on demand (X-Profile header, Admin only)
+app.add_middleware(ProfileMiddleware, authorize=is_admin_token)
 
-Ticket No: {ticket_data['ticket_number']}
-Customer: {ticket_data['customer']}
-Module: {ticket_data['module']}
-Subject: {ticket_data.get('email_subject', 'N/A')}
+def parse_date_param(name: str, value: str) -> datetime:
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date in YYYY-MM-DD format")
 
-Original Message:
-{ticket_data['description']}
+def make_etag(*parts) -> str:
+    """Strong ETag from the values that identify a representation version"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
 
-Please review the request and take appropriate action at the earliest.
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
 
-Regards,
-CR Automation System"""
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(email_address, email_password)
-            recipients = [developer_email, cc_email]
-            server.send_message(msg, to_addrs=recipients)
-        
-        print(f"Assignment email sent to {developer_email}")
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-
-def parse_email_subject(subject: str) -> Optional[dict]:
-    """Parse email subject: Customer | Module | CRType | Issue Type | Description"""
-    parts = [part.strip() for part in subject.split("|")]
-    if len(parts) >= 5:
-        return {
-            "customer": parts[0],
-            "module": parts[1],
-            "cr_type": parts[2],
-            "issue_type": parts[3],
-            "description": " | ".join(parts[4:])
-        }
-    return None
-
-def create_audit_log(ticket_id: str, action: str, user: str, changes: dict):
-    """Create audit log entry"""
-    audit_logs_collection.insert_one({
-        "ticket_id": ticket_id,
-        "action": action,
-        "user": user,
-        "changes": changes,
-        "timestamp": datetime.utcnow().isoformat()
-    })
+def not_modified(endpoint: str, etag: str) -> Response:
+    conditional_requests_total.inc(endpoint=endpoint, result="not_modified")
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def with_etag(endpoint: str, content, etag: str, conditional: bool) -> JSONResponse:
+    conditional_requests_total.inc(endpoint=endpoint, result="modified" if conditional else "unconditional")
+    return JSONResponse(
+        content=jsonable_encoder(content),
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
 
 # Initialize default users
 def init_default_users():
@@ -311,8 +219,8 @@ def init_default_users():
     ]
     
     for user_data in default_users:
-        if not users_collection.find_one({"username": user_data["username"]}):
-            users_collection.insert_one({
+        if not storage.users.get(user_data["username"]):
+            storage.users.insert({
                 "username": user_data["username"],
                 "password": hash_password(user_data["password"]),
                 "full_name": user_data["full_name"],
@@ -325,15 +233,27 @@ def init_default_users():
 @app.on_event("startup")
 async def startup_event():
     init_default_users()
+    start_routing()
+    pending_counts.start()
+    threading.Thread(target=duplicate_index.start, name="duplicate-index-load", daemon=True).start()
+    if storage.uses_mongo:
+        threading.Thread(target=backfill_queue_fields, name="queue-fields-backfill", daemon=True).start()
+        start_ticket_datetime_migration()
+        start_archival()
+    ticket_events.start(asyncio.get_running_loop())
     print("ERP Ticketing System started successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_hash_executor()
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "ERP Ticketing Management System"}
 
 @app.post("/api/auth/login")
 async def login(user_login: UserLogin):
-    user = users_collection.find_one({"username": user_login.username})
+    user = storage.users.get(user_login.username)
     if not user or not verify_password(user_login.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
@@ -358,7 +278,7 @@ async def register(user_register: UserRegister):
     """Self-registration - First user gets Admin, rest get Manager role"""
     
     # Check if username already exists
-    if users_collection.find_one({"username": user_register.username}):
+    if storage.users.get(user_register.username):
         raise HTTPException(status_code=400, detail="Username already exists")
     
     # Validate username (alphanumeric and underscore only)
@@ -370,7 +290,7 @@ async def register(user_register: UserRegister):
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
     # Check if this is the first user
-    user_count = users_collection.count_documents({})
+    user_count = storage.users.count()
     
     if user_count == 0:
         # First user gets Admin role
@@ -389,7 +309,7 @@ async def register(user_register: UserRegister):
         "created_by": "self_registration"
     }
     
-    users_collection.insert_one(user_doc)
+    storage.users.insert(user_doc)
     
     # Generate token for immediate login
     access_token = create_access_token(data={"sub": user_register.username})
@@ -409,76 +329,148 @@ async def register(user_register: UserRegister):
 async def get_me(current_user: dict = Depends(get_current_user)):
     return current_user
 
+def require_mongo_backend(feature: str):
+    """Features built directly on MongoDB are not available with the memory backend"""
+    if not storage.uses_mongo:
+        raise HTTPException(status_code=501, detail=f"{feature} requires STORAGE_BACKEND=mongo")
+
+def claim_idempotency_key(key_id: str, request_hash: str) -> Optional[dict]:
+    """Claim an Idempotency-Key for this request.
+
+    Returns None when the caller now owns the key and should process the
+    request, or the stored response when the key was already completed.
+    The unique _id makes the insert the arbiter between concurrent duplicates.
+    """
+    now = datetime.utcnow()
+    if storage.idempotency_keys.claim(key_id, request_hash, now):
+        return None
+    
+    existing = storage.idempotency_keys.get(key_id)
+    if existing is None:
+        # Expired between the insert and the lookup; ask the client to retry
+        raise HTTPException(status_code=409, detail="Idempotency-Key is being reset, please retry")
+    if existing["request_hash"] != request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body"
+        )
+    if existing["status"] == "completed":
+        return existing["response"]
+    
+    # Take over a key whose original request appears to have died
+    stale_before = now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+    if storage.idempotency_keys.take_over(key_id, stale_before, now):
+        return None
+    raise HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still being processed"
+    )
+
+def schedule_task(background_tasks: BackgroundTasks, name: str, func, *args):
+    """Add a background task, tracked in the background_tasks_pending gauge"""
+    def run():
+        try:
+            func(*args)
+        finally:
+            background_tasks_pending.dec(task=name)
+    background_tasks_pending.inc(task=name)
+    background_tasks.add_task(run)
+
 @app.post("/api/tickets")
 async def create_ticket(
     ticket: TicketCreate,
     background_tasks: BackgroundTasks,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    # Generate ticket number
-    ticket_number = generate_ticket_number()
+    notify = lambda ticket_doc: schedule_task(background_tasks, "assignment_email", send_assignment_email, ticket_doc)
+    
+    if not idempotency_key:
+        return create_ticket_record(ticket.dict(), current_user["username"], notify=notify)
+    
+    # Keys are scoped per user so clients cannot replay each other's responses
+    key_id = f"{current_user['username']}:{idempotency_key}"
+    request_hash = hashlib.sha256(
+        json.dumps(ticket.dict(), sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    
+    stored_response = claim_idempotency_key(key_id, request_hash)
+    if stored_response is not None:
+        return JSONResponse(content=jsonable_encoder(stored_response), headers={"Idempotent-Replayed": "true"})
     
-    # Auto-assign based on module
-    assignment = auto_assign_ticket(ticket.module)
+    try:
+        ticket_doc = create_ticket_record(ticket.dict(), current_user["username"], notify=notify)
+    except Exception:
+        # Release the key so the client can retry
+        storage.idempotency_keys.release(key_id)
+        raise
+    
+    storage.idempotency_keys.complete(key_id, ticket_doc)
+    return ticket_doc
+
+def get_ticket_changes(query: dict, updated_since: str, public_ids: bool = False) -> dict:
+    """Delta sync: tickets created or modified since a watermark, plus tombstones.
+
+    With list filters, `left_filter` holds the numbers of tickets changed since
+    the watermark that no longer match them (e.g. closed while viewing open
+    tickets); clients drop those rows as they do for tombstones.
+    """
+    try:
+        since = datetime.fromisoformat(updated_since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="updated_since must be an ISO 8601 timestamp")
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
     
-    # Get current date and time
     now = datetime.utcnow()
-    cr_date = now.strftime("%Y-%m-%d")
-    cr_time = now.strftime("%H:%M:%S")
-    
-    # Create ticket document
-    ticket_doc = {
-        "ticket_number": ticket_number,
-        "customer": ticket.customer,
-        "cr_type": ticket.cr_type,
-        "issue_type": ticket.issue_type,
-        "type": ticket.type,
-        "cr_date": cr_date,
-        "cr_time": cr_time,
-        "module": ticket.module,
-        "description": ticket.description,
-        "amc_cost": ticket.amc_cost,
-        "pr_approval": ticket.pr_approval,
-        "priority": ticket.priority,
-        "status": "New",
-        "se_name": assignment["support_engineer"],
-        "developer": assignment["developer"],
-        "developer_email": assignment["developer_email"],
-        "planned_date": ticket.planned_date,
-        "commitment_date": ticket.commitment_date,
-        "completed_on": None,
-        "completed_by": None,
-        "completed_time": None,
-        "time_duration": None,
-        "resolution_type": None,
-        "completion_remarks": None,
-        "exe_sent": None,
-        "reason_for_issue": None,
-        "customer_call": None,
-        "remarks": ticket.remarks,
-        "created_by": current_user["username"],
-        "created_at": now.isoformat(),
-        "updated_at": now.isoformat()
-    }
+    watermark = (now - timedelta(seconds=SYNC_WATERMARK_LAG_SECONDS)).isoformat()
     
-    # Insert ticket
-    result = tickets_collection.insert_one(ticket_doc)
-    ticket_doc["_id"] = str(result.inserted_id)
+    # Tombstones older than the retention window are gone; the client must reload
+    if since < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        return {"tickets": [], "tombstones": [], "left_filter": [], "watermark": watermark,
+                "full_resync_required": True}
     
-    # Update status to Assigned
-    tickets_collection.update_one(
-        {"ticket_number": ticket_number},
-        {"$set": {"status": "Assigned"}}
-    )
-    ticket_doc["status"] = "Assigned"
+    changed = {"updated_at": {"$gte": since}}
+    tickets = [
+        ticket_to_api(t, public_ids)
+        for t in storage.tickets.find({**query, **changed}, sort=[("updated_at", ASCENDING)])
+    ]
     
-    # Create audit log
-    create_audit_log(ticket_doc["_id"], "created", current_user["username"], ticket_doc)
+    left_filter = []
+    if query:
+        matching = {ticket["ticket_number"] for ticket in tickets}
+        left_filter = [
+            t["ticket_number"]
+            for t in storage.tickets.find(changed, sort=[("updated_at", ASCENDING)], projection={"ticket_number": 1})
+            if t["ticket_number"] not in matching
+        ]
     
-    # Send assignment email in background
-    background_tasks.add_task(send_assignment_email, ticket_doc)
+    tombstones = storage.tombstones.find_since(since)
+    for tombstone in tombstones:
+        tombstone["deleted_at"] = as_datetime(tombstone["deleted_at"]).isoformat()
     
-    return ticket_doc
+    return {
+        "tickets": tickets,
+        "tombstones": tombstones,
+        "left_filter": left_filter,
+        "watermark": watermark,
+        "full_resync_required": False
+    }
+
+# Identical list requests share one query; the serialised body is what gets cached
+ticket_list_cache = ResponseCache("ticket_list")
+
+def render_ticket_list(query: dict, include_archived: bool, public_ids: bool) -> bytes:
+    tickets = storage.reporting_tickets.find(query, sort=[("cr_date", DESCENDING)])
+    if include_archived:
+        tickets = list(heapq.merge(
+            tickets,
+            tickets_archive_reporting_collection.find(query).sort("cr_date", DESCENDING),
+            key=lambda t: as_datetime(t.get("cr_date"), t.get("cr_time")) or datetime.min,
+            reverse=True
+        ))
+    # Large lists: serialised in one pass, without FastAPI's per-field encoder walk
+    return json_dumps([ticket_to_api(t, public_ids) for t in tickets])
 
 @app.get("/api/tickets")
 async def get_tickets(
@@ -491,8 +483,15 @@ async def get_tickets(
     issue_type: Optional[str] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
+    updated_since: Optional[str] = None,
+    include_archived: bool = False,
+    public_ids: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
+    """Tickets matching the filters, newest first.
+
+    `public_ids=true` identifies tickets by ticket number only (`id`) instead of `_id`.
+    """
     query = {}
     
     if status:
@@ -509,27 +508,162 @@ async def get_tickets(
         query["cr_type"] = cr_type
     if issue_type:
         query["issue_type"] = issue_type
+    # Dates are whole days: from_date 00:00 up to (but excluding) the day after to_date
     if from_date:
-        query["cr_date"] = {"$gte": from_date}
+        query["cr_date"] = {"$gte": parse_date_param("from_date", from_date)}
     if to_date:
-        if "cr_date" in query:
-            query["cr_date"]["$lte"] = to_date
-        else:
-            query["cr_date"] = {"$lte": to_date}
+        query.setdefault("cr_date", {})["$lt"] = parse_date_param("to_date", to_date) + timedelta(days=1)
     
-    tickets = list(tickets_collection.find(query).sort("cr_date", DESCENDING))
-    for ticket in tickets:
-        ticket["_id"] = str(ticket["_id"])
+    if updated_since:
+        return FastJSONResponse(get_ticket_changes(query, updated_since, public_ids))
+    if include_archived:
+        require_mongo_backend("include_archived")
     
-    return tickets
+    cache_key = (status, module, customer, developer, se_name, cr_type, issue_type,
+                 from_date, to_date, include_archived, public_ids)
+    body = await ticket_list_cache.get(cache_key, render_ticket_list, query, include_archived, public_ids)
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/tickets/stream")
+async def stream_ticket_changes(
+    request: Request,
+    module: Optional[str] = None,
+    developer: Optional[str] = None,
+    token: Optional[str] = None,
+    resume_after: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
+):
+    """Server-Sent Events stream of ticket created/updated/status_changed events.
+
+    EventSource cannot send headers, so the JWT may also be passed as ?token=.
+    Reconnects resume from Last-Event-ID (or ?resume_after=); if that event is
+    no longer buffered a `reset` event tells the client to reload once.
+    """
+    if credentials:
+        token = credentials.credentials
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    get_user_from_token(token)
+    
+    subscriber, backlog = ticket_events.subscribe(module, developer, last_event_id or resume_after)
+    
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            if backlog is None:
+                yield "event: reset\ndata: {}\n\n"
+            else:
+                for event in backlog:
+                    yield format_sse(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is RESET:
+                    yield "event: reset\ndata: {}\n\n"
+                    break
+                yield format_sse(event)
+        finally:
+            ticket_events.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/tickets/my-queue")
+async def get_my_queue(
+    page: int = 1,
+    page_size: int = 50,
+    public_ids: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Current user's open tickets ordered by priority, commitment date, then age"""
+    if current_user["role"] == "Developer":
+        owner_field = "developer"
+    elif current_user["role"] == "Support Engineer":
+        owner_field = "se_name"
+    else:
+        raise HTTPException(status_code=400, detail="Work queues are available to Developers and Support Engineers")
+    
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), 200)
+    
+    # Served by the (owner, status, priority_rank, commitment_sort, created_at) index
+    found = storage.tickets.find(
+        {owner_field: current_user["full_name"], "status": {"$in": list(OPEN_STATUSES)}},
+        sort=[("priority_rank", ASCENDING), ("commitment_sort", ASCENDING), ("created_at", ASCENDING)],
+        skip=(page - 1) * page_size,
+        limit=page_size + 1
+    )
+    
+    tickets = [ticket_to_api(t, public_ids) for t in found]
+    has_more = len(tickets) > page_size
+    tickets = tickets[:page_size]
+    
+    return FastJSONResponse({"tickets": tickets, "page": page, "page_size": page_size, "has_more": has_more})
+
+@app.get("/api/tickets/search")
+async def search_tickets_endpoint(
+    q: str,
+    module: Optional[str] = None,
+    status: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 20,
+    include_archived: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Full-text search over description, remarks and completion remarks, best matches first"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query must not be empty")
+    require_mongo_backend("Full-text search")
+    if page > SEARCH_MAX_PAGE:
+        raise HTTPException(status_code=400, detail=f"page must be at most {SEARCH_MAX_PAGE}; refine the search instead")
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), 100)
+    return search_tickets(q, module, status, page, page_size, include_archived)
+
+@app.get("/api/tickets/duplicates")
+async def get_duplicates(
+    module: Optional[str] = None,
+    customer: Optional[str] = None,
+    limit: int = 50,
+    current_user: dict = Depends(get_current_user)
+):
+    """Tickets flagged as probable duplicates, grouped under the ticket they repeat"""
+    require_mongo_backend("Duplicate clusters")
+    return {"clusters": get_duplicate_clusters(module, customer, min(max(limit, 1), 200))}
+
+def find_archived_ticket(ticket_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+    if not storage.uses_mongo:
+        return None
+    return tickets_archive_collection.find_one({"ticket_number": ticket_id}, projection)
 
 @app.get("/api/tickets/{ticket_id}")
-async def get_ticket(ticket_id: str, current_user: dict = Depends(get_current_user)):
-    ticket = tickets_collection.find_one({"ticket_number": ticket_id})
+async def get_ticket(
+    ticket_id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_user)
+):
+    if if_none_match:
+        # Covered by the (ticket_number, updated_at) index: no document fetch
+        stamp = (storage.tickets.get(ticket_id, {"_id": 0, "updated_at": 1})
+                 or find_archived_ticket(ticket_id, {"_id": 0, "updated_at": 1}))
+        if not stamp:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+        etag = make_etag(ticket_id, stamp.get("updated_at"))
+        if etag_matches(if_none_match, etag):
+            return not_modified("ticket", etag)
+    
+    ticket = storage.tickets.get(ticket_id) or find_archived_ticket(ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
-    ticket["_id"] = str(ticket["_id"])
-    return ticket
+    etag = make_etag(ticket_id, ticket.get("updated_at"))
+    return with_etag("ticket", ticket_to_api(ticket), etag, bool(if_none_match))
 
 @app.put("/api/tickets/{ticket_id}")
 async def update_ticket(
@@ -537,7 +671,7 @@ async def update_ticket(
     ticket_update: TicketUpdate,
     current_user: dict = Depends(get_current_user)
 ):
-    ticket = tickets_collection.find_one({"ticket_number": ticket_id})
+    ticket = storage.tickets.get(ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
     
@@ -545,25 +679,31 @@ async def update_ticket(
     if ticket["status"] == "Completed" and current_user["role"] not in ["Admin"]:
         # Only remarks can be updated
         if ticket_update.remarks:
-            tickets_collection.update_one(
-                {"ticket_number": ticket_id},
-                {"$set": {"remarks": ticket_update.remarks, "updated_at": datetime.utcnow().isoformat()}}
-            )
+            remarks_update = {"remarks": ticket_update.remarks, "updated_at": datetime.utcnow()}
+            storage.tickets.update(ticket_id, remarks_update)
+            bump_data_version("tickets")
+            ticket_events.publish_local("updated", {**ticket, **remarks_update}, list(remarks_update.keys()))
             return {"message": "Remarks updated successfully"}
         else:
             raise HTTPException(status_code=403, detail="Ticket is completed and locked")
     
     update_data = {k: v for k, v in ticket_update.dict(exclude_unset=True).items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow().isoformat()
+    update_data["updated_at"] = datetime.utcnow()
+    if "priority" in update_data or "commitment_date" in update_data:
+        update_data.update(queue_sort_fields(
+            update_data.get("priority", ticket.get("priority")),
+            update_data.get("commitment_date", ticket.get("commitment_date"))
+        ))
     
-    tickets_collection.update_one({"ticket_number": ticket_id}, {"$set": update_data})
+    storage.tickets.update(ticket_id, update_data)
+    bump_data_version("tickets")
     
     # Create audit log
     create_audit_log(str(ticket["_id"]), "updated", current_user["username"], update_data)
     
-    updated_ticket = tickets_collection.find_one({"ticket_number": ticket_id})
-    updated_ticket["_id"] = str(updated_ticket["_id"])
-    return updated_ticket
+    updated_ticket = storage.tickets.get(ticket_id)
+    ticket_events.publish_local("updated", updated_ticket, list(update_data.keys()))
+    return ticket_to_api(updated_ticket)
 
 @app.put("/api/tickets/{ticket_id}/status")
 async def update_ticket_status(
@@ -571,7 +711,7 @@ async def update_ticket_status(
     status_update: StatusUpdate,
     current_user: dict = Depends(get_current_user)
 ):
-    ticket = tickets_collection.find_one({"ticket_number": ticket_id})
+    ticket = storage.tickets.get(ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
     
@@ -617,86 +757,87 @@ async def update_ticket_status(
                 detail=f"Invalid Resolution Type. Must be one of: {', '.join(valid_resolution_types)}"
             )
     
-    update_data = {"status": status_update.status, "updated_at": datetime.utcnow().isoformat()}
+    now = datetime.utcnow()
+    update_data = {"status": status_update.status, "updated_at": now}
+    unset_fields = []
     
     # If status is Completed, capture completion details
     if status_update.status == "Completed":
-        now = datetime.utcnow()
-        completed_on = now.strftime("%Y-%m-%d")
-        completed_time = now.strftime("%H:%M:%S")
         completed_by = status_update.completed_by or current_user["full_name"]
         
-        # Calculate time duration
-        cr_date_str = ticket["cr_date"]
-        cr_date = datetime.strptime(cr_date_str, "%Y-%m-%d")
-        time_duration = (now - cr_date).days
+        # Resolution time in hours; the "N days" string is derived on output
+        cr_date = as_datetime(ticket["cr_date"], ticket.get("cr_time"))
+        time_duration_hours = round((now - cr_date).total_seconds() / 3600, 2)
         
         update_data.update({
-            "completed_on": completed_on,
-            "completed_time": completed_time,
+            "cr_date": cr_date,
+            "completed_on": now,
             "completed_by": completed_by,
-            "time_duration": f"{time_duration} days",
+            "time_duration_hours": time_duration_hours,
             "resolution_type": status_update.resolution_type,
             "completion_remarks": status_update.completion_remarks
         })
-    
-    tickets_collection.update_one({"ticket_number": ticket_id}, {"$set": update_data})
+        # Drop legacy string fields in case the ticket predates the datetime migration
+        unset_fields = ["cr_time", "completed_time", "time_duration"]
+    elif status_update.status == "Closed":
+        update_data["closed_at"] = now
+    
+    storage.tickets.update(ticket_id, update_data, unset_fields)
+    pending_counts.on_status_change(ticket.get("developer"), ticket["status"], status_update.status)
+    bump_data_version("tickets")
+    if (storage.uses_mongo and status_update.status in ("Completed", "Closed")
+            and ticket["status"] != status_update.status):
+        record_rollup(now, status_update.status.lower(), ticket)
     
     # Create audit log
     create_audit_log(str(ticket["_id"]), "status_updated", current_user["username"], update_data)
     
-    updated_ticket = tickets_collection.find_one({"ticket_number": ticket_id})
-    updated_ticket["_id"] = str(updated_ticket["_id"])
-    return updated_ticket
+    updated_ticket = storage.tickets.get(ticket_id)
+    ticket_events.publish_local("status_changed", updated_ticket, list(update_data.keys()))
+    return ticket_to_api(updated_ticket)
+
+dashboard_cache = ResponseCache("dashboard")
 
 @app.get("/api/dashboard/stats")
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
+    # Everyone opening the dashboard at once shares one computation
+    return await dashboard_cache.get("stats", compute_dashboard_stats)
+
+def compute_dashboard_stats() -> dict:
+    open_query = {"status": {"$in": ["New", "Assigned", "In Progress", "Pending"]}}
+    
+    # Totals and distributions include archived tickets; pending counts only need the hot set
+    def count_by_all(field: str) -> dict:
+        counts = storage.reporting_tickets.count_by(field)
+        for value, count in storage.archived_tickets.count_by(field).items():
+            counts[value] = counts.get(value, 0) + count
+        return counts
+    
     # Total tickets
-    total_tickets = tickets_collection.count_documents({})
+    total_tickets = storage.reporting_tickets.count() + storage.archived_tickets.count()
     
     # Status-wise count
-    status_counts = {}
-    for status in ["New", "Assigned", "In Progress", "Completed", "Closed", "Pending"]:
-        status_counts[status] = tickets_collection.count_documents({"status": status})
+    by_status = count_by_all("status")
+    status_counts = {
+        status: by_status.get(status, 0)
+        for status in ["New", "Assigned", "In Progress", "Completed", "Closed", "Pending"]
+    }
     
     # Issue type wise count
-    issue_types = tickets_collection.distinct("issue_type")
-    issue_type_counts = {}
-    for issue_type in issue_types:
-        issue_type_counts[issue_type] = tickets_collection.count_documents({"issue_type": issue_type})
-    
-    # Module wise pending
-    modules = tickets_collection.distinct("module")
-    module_pending = {}
-    for module in modules:
-        module_pending[module] = tickets_collection.count_documents({
-            "module": module,
-            "status": {"$in": ["New", "Assigned", "In Progress", "Pending"]}
-        })
+    issue_type_counts = count_by_all("issue_type")
     
-    # Developer wise pending
-    developers = tickets_collection.distinct("developer")
-    developer_pending = {}
-    for developer in developers:
-        developer_pending[developer] = tickets_collection.count_documents({
-            "developer": developer,
-            "status": {"$in": ["New", "Assigned", "In Progress", "Pending"]}
-        })
+    # Pending per module, developer and support engineer; every known value is listed, even at zero
+    def pending_by(field: str) -> dict:
+        pending = {value: 0 for value in storage.reporting_tickets.distinct(field)}
+        pending.update(storage.reporting_tickets.count_by(field, open_query))
+        return pending
     
-    # Support Engineer wise pending
-    support_engineers = tickets_collection.distinct("se_name")
-    se_pending = {}
-    for se in support_engineers:
-        se_pending[se] = tickets_collection.count_documents({
-            "se_name": se,
-            "status": {"$in": ["New", "Assigned", "In Progress", "Pending"]}
-        })
+    module_pending = pending_by("module")
+    developer_pending = pending_by("developer")
+    se_pending = pending_by("se_name")
     
     # CR Type wise
-    cr_types = tickets_collection.distinct("cr_type")
-    cr_type_counts = {}
-    for cr_type in cr_types:
-        cr_type_counts[cr_type] = tickets_collection.count_documents({"cr_type": cr_type})
+    cr_type_counts = count_by_all("cr_type")
     
     return {
         "total_tickets": total_tickets,
@@ -708,20 +849,147 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         "cr_type_counts": cr_type_counts
     }
 
+def reference_data_response(name: str, if_none_match: Optional[str]) -> Response:
+    """Serve reference data straight from the routing snapshot; the ETag is its version"""
+    routing = current_routing()
+    etag = make_etag(name, routing.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(name, etag)
+    return with_etag(name, {name: list(getattr(routing, name))}, etag, bool(if_none_match))
+
+@app.get("/api/analytics/resolution")
+async def get_resolution_analytics_endpoint(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """p50/p90/p99 resolution hours per module, developer, CR type and resolution type,
+    plus aging buckets for open tickets. from_date/to_date filter on completion date."""
+    require_mongo_backend("Resolution analytics")
+    start = parse_date_param("from_date", from_date) if from_date else None
+    end = parse_date_param("to_date", to_date) + timedelta(days=1) if to_date else None
+    # Aggregations (or the streamed fallback) block; keep them off the event loop
+    return await run_in_threadpool(profile_in_thread(get_resolution_analytics), start, end)
+
+@app.get("/api/analytics/trends")
+async def get_ticket_trends(
+    dimension: str = TOTAL_DIMENSION,
+    days: int = 30,
+    key: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Tickets opened/completed/closed per day, from the daily rollups"""
+    require_mongo_backend("Trends")
+    if dimension not in ROLLUP_DIMENSIONS + (TOTAL_DIMENSION,):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid dimension. Must be one of: {', '.join(ROLLUP_DIMENSIONS + (TOTAL_DIMENSION,))}"
+        )
+    days = min(max(days, 1), 731)
+    return {"dimension": dimension, "days": days, "series": get_trends(dimension, days, key)}
+
 @app.get("/api/modules")
-async def get_modules(current_user: dict = Depends(get_current_user)):
+async def get_modules(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_user)
+):
     """Get list of all modules"""
-    return {"modules": list(supportModuleMap.keys())}
+    return reference_data_response("modules", if_none_match)
 
 @app.get("/api/developers")
-async def get_developers(current_user: dict = Depends(get_current_user)):
+async def get_developers(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_user)
+):
     """Get list of all developers"""
-    return {"developers": list(set(developerModuleMap.values()))}
+    return reference_data_response("developers", if_none_match)
 
 @app.get("/api/support-engineers")
-async def get_support_engineers(current_user: dict = Depends(get_current_user)):
+async def get_support_engineers(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_user)
+):
     """Get list of all support engineers"""
-    return {"support_engineers": list(set(supportModuleMap.values()))}
+    return reference_data_response("support_engineers", if_none_match)
+
+class RoutingUpdate(BaseModel):
+    support_module_map: Optional[Dict[str, str]] = None
+    developer_module_map: Optional[Dict[str, str]] = None
+    developer_email_map: Optional[Dict[str, str]] = None
+    developer_pool_map: Optional[Dict[str, List[str]]] = None
+    expected_version: Optional[int] = None
+
+def routing_to_dict(routing) -> dict:
+    return {
+        "version": routing.version,
+        "support_module_map": dict(routing.support_module_map),
+        "developer_module_map": dict(routing.developer_module_map),
+        "developer_email_map": dict(routing.developer_email_map),
+        "developer_pool_map": {module: list(pool) for module, pool in routing.developer_pool_map.items()}
+    }
+
+@app.get("/api/routing")
+async def get_routing(current_user: dict = Depends(get_current_user)):
+    """Get the auto-assignment routing table (Admin only)"""
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only admins can view routing")
+    return routing_to_dict(current_routing())
+
+@app.put("/api/routing")
+async def put_routing(
+    routing_update: RoutingUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Update the auto-assignment routing table (Admin only); applies to all workers without restart"""
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only admins can update routing")
+    
+    require_mongo_backend("Routing updates")
+    
+    changes = routing_update.dict(exclude_none=True, exclude={"expected_version"})
+    if not changes:
+        raise HTTPException(status_code=400, detail="No routing maps provided")
+    
+    routing = update_routing(changes, routing_update.expected_version, current_user["username"])
+    if routing is None:
+        raise HTTPException(status_code=409, detail="Routing table was changed by someone else; reload and retry")
+    return routing_to_dict(routing)
+
+@app.get("/api/workload")
+async def get_workload(current_user: dict = Depends(get_current_user)):
+    """Pending ticket counts per developer as seen by this worker's assignment table"""
+    return {"developer_pending": pending_counts.snapshot()}
+
+@app.get("/api/admin/slow-requests")
+async def get_slow_requests(limit: int = 20, current_user: dict = Depends(get_current_user)):
+    """Slowest recent requests with their database command traces (Admin only)"""
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only admins can view request traces")
+    return {"requests": slowest_requests(min(max(limit, 1), 100))}
+
+@app.get("/api/admin/profiles")
+async def get_profiles(current_user: dict = Depends(get_current_user)):
+    """Recent on-demand request profiles (Admin only)"""
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only admins can view profiles")
+    return {"profiles": list_profiles()}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile_output(profile_id: str, current_user: dict = Depends(get_current_user)):
+    """Collapsed stacks (sample mode) or pstats report (cprofile mode) of one profiled request"""
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only admins can view profiles")
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["output"])
+
+@app.get("/api/metrics")
+async def get_metrics(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
+    """Prometheus metrics (requires METRICS_TOKEN as bearer token when configured)"""
+    if METRICS_TOKEN and (not credentials or credentials.credentials != METRICS_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # User Management APIs
 @app.post("/api/users")
@@ -734,13 +1002,12 @@ async def create_user(
         raise HTTPException(status_code=403, detail="Only admins can create users")
     
     # Check if user already exists
-    if users_collection.find_one({"username": user_create.username}):
+    if storage.users.get(user_create.username):
         raise HTTPException(status_code=400, detail="Username already exists")
     
     # Validate role
-    valid_roles = ["Admin", "Support Engineer", "Developer", "Manager"]
-    if user_create.role not in valid_roles:
-        raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}")
+    if user_create.role not in VALID_ROLES:
+        raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {', '.join(VALID_ROLES)}")
     
     # Create user
     user_doc = {
@@ -752,7 +1019,7 @@ async def create_user(
         "created_by": current_user["username"]
     }
     
-    result = users_collection.insert_one(user_doc)
+    storage.users.insert(user_doc)
     
     return {
         "message": "User created successfully",
@@ -760,17 +1027,38 @@ async def create_user(
         "role": user_create.role
     }
 
+@app.post("/api/users/import")
+async def import_users_bulk(
+    request: Request,
+    dry_run: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Create users in bulk from a CSV or JSON request body (Admin only)"""
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Only admins can create users")
+
+    try:
+        rows = parse_users(await request.body(), detect_format(content_type=request.headers.get("content-type", "")))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not rows:
+        raise HTTPException(status_code=400, detail="No users to import")
+    if len(rows) > USER_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {USER_IMPORT_MAX_ROWS} users per import")
+
+    # Hashing waits on the process pool; keep it off the event loop
+    return await run_in_threadpool(
+        import_users, rows, current_user["username"], get_hash_executor(), dry_run
+    )
+
 @app.get("/api/users")
 async def list_users(current_user: dict = Depends(get_current_user)):
     """List all users (Admin only)"""
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only admins can view users")
     
-    users = list(users_collection.find({}, {"password": 0}))
-    for user in users:
-        user["_id"] = str(user["_id"])
-    
-    return users
+    # ObjectIds are encoded by the response itself
+    return FastJSONResponse(storage.users.list())
 
 @app.delete("/api/users/{username}")
 async def delete_user(
@@ -784,9 +1072,7 @@ async def delete_user(
     if username == current_user["username"]:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
-    result = users_collection.delete_one({"username": username})
-    
-    if result.deleted_count == 0:
+    if not storage.users.delete(username):
         raise HTTPException(status_code=404, detail="User not found")
     
     return {"message": f"User {username} deleted successfully"}
@@ -802,16 +1088,13 @@ async def change_password(
 ):
     """Change own password"""
     # Verify current password
-    user = users_collection.find_one({"username": current_user["username"]})
+    user = storage.users.get(current_user["username"])
     if not verify_password(password_change.current_password, user["password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update password
     new_hashed = hash_password(password_change.new_password)
-    users_collection.update_one(
-        {"username": current_user["username"]},
-        {"$set": {"password": new_hashed}}
-    )
+    storage.users.update(current_user["username"], {"password": new_hashed})
     
     return {"message": "Password changed successfully"}
 
@@ -829,19 +1112,15 @@ async def update_user_role(
         raise HTTPException(status_code=403, detail="Only admins can update user roles")
     
     # Validate role
-    valid_roles = ["Admin", "Support Engineer", "Developer", "Manager"]
-    if role_update.role not in valid_roles:
-        raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}")
+    if role_update.role not in VALID_ROLES:
+        raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {', '.join(VALID_ROLES)}")
     
-    user = users_collection.find_one({"username": username})
+    user = storage.users.get(username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Update role
-    users_collection.update_one(
-        {"username": username},
-        {"$set": {"role": role_update.role}}
-    )
+    storage.users.update(username, {"role": role_update.role})
     
     return {"message": f"User {username} role updated to {role_update.role}"}
 
@@ -855,15 +1134,12 @@ async def reset_user_password(
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Only admins can reset passwords")
     
-    user = users_collection.find_one({"username": username})
+    user = storage.users.get(username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     new_hashed = hash_password(new_password)
-    users_collection.update_one(
-        {"username": username},
-        {"$set": {"password": new_hashed}}
-    )
+    storage.users.update(username, {"password": new_hashed})
     
     return {"message": f"Password reset successfully for user {username}"}
 
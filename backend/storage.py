@@ -0,0 +1,471 @@
+"""
+Storage backends for tickets, users, ticket-number counters, audit logs,
+Idempotency-Keys and delta sync tombstones.
+
+Handlers and the ticket service go through `storage` instead of the pymongo
+collections, so the backend is chosen with STORAGE_BACKEND:
+
+    mongo   MongoDB via database.py (default)
+    memory  in-process store (memory_store.py) for unit tests, CPU-side
+            benchmarks and running the API without a mongod
+
+Features built directly on MongoDB (change streams, aggregation analytics and
+rollups, full-text search, the archive, routing table storage) are only
+available with the mongo backend; their endpoints answer 501 under the
+memory backend.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from database import (
+    STORAGE_BACKEND, tickets_collection, tickets_reporting_collection, tickets_archive_reporting_collection,
+    users_collection,
+    ticket_counter_collection, audit_logs_collection, idempotency_keys_collection, ticket_tombstones_collection,
+    IDEMPOTENCY_KEY_TTL_SECONDS, TOMBSTONE_RETENTION_DAYS
+)
+from memory_store import MemoryCollection
+
+class TicketRepository(ABC):
+    @abstractmethod
+    def get(self, ticket_number: str, projection: Optional[dict] = None) -> Optional[dict]: ...
+
+    @abstractmethod
+    def find(self, query: dict, sort: Optional[list] = None, skip: int = 0, limit: int = 0,
+             projection: Optional[dict] = None) -> list: ...
+
+    @abstractmethod
+    def count(self, query: Optional[dict] = None) -> int: ...
+
+    @abstractmethod
+    def count_by(self, field: str, query: Optional[dict] = None) -> dict:
+        """{value of field: number of matching tickets}"""
+
+    @abstractmethod
+    def distinct(self, field: str, query: Optional[dict] = None) -> list: ...
+
+    @abstractmethod
+    def insert(self, ticket: dict):
+        """Insert a ticket; sets ticket["_id"]"""
+
+    @abstractmethod
+    def insert_many(self, tickets: list):
+        """Insert tickets in bulk (unordered); sets each ticket["_id"]"""
+
+    @abstractmethod
+    def update(self, ticket_number: str, set_fields: Optional[dict] = None,
+               unset_fields: Iterable[str] = ()) -> bool: ...
+
+class UserRepository(ABC):
+    @abstractmethod
+    def get(self, username: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    def list(self) -> list:
+        """All users without their password hashes"""
+
+    @abstractmethod
+    def count(self) -> int: ...
+
+    @abstractmethod
+    def insert(self, user: dict): ...
+
+    @abstractmethod
+    def insert_many(self, users: list) -> dict:
+        """Insert every user it can; returns {position in `users`: error message} for the rest"""
+
+    @abstractmethod
+    def update(self, username: str, fields: dict) -> bool: ...
+
+    @abstractmethod
+    def delete(self, username: str) -> bool: ...
+
+class CounterRepository(ABC):
+    @abstractmethod
+    def reserve(self, year: int, count: int) -> int:
+        """Atomically reserve `count` consecutive numbers for a year; returns the first"""
+
+class AuditLogRepository(ABC):
+    @abstractmethod
+    def append(self, entry: dict): ...
+
+    @abstractmethod
+    def append_many(self, entries: list): ...
+
+class IdempotencyKeyRepository(ABC):
+    @abstractmethod
+    def claim(self, key_id: str, request_hash: str, now: datetime) -> bool:
+        """Record the key as in progress; False when it already exists (the unique _id decides)"""
+
+    @abstractmethod
+    def get(self, key_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    def take_over(self, key_id: str, stale_before: datetime, now: datetime) -> bool:
+        """Relock a key still in progress since before `stale_before`; False if it is not"""
+
+    @abstractmethod
+    def complete(self, key_id: str, response: dict): ...
+
+    @abstractmethod
+    def release(self, key_id: str): ...
+
+class TombstoneRepository(ABC):
+    @abstractmethod
+    def append_many(self, tombstones: list): ...
+
+    @abstractmethod
+    def find_since(self, since: datetime) -> list:
+        """Tombstones recorded at or after `since`, oldest first"""
+
+# ---------------------------------------------------------------- MongoDB
+
+class MongoTicketRepository(TicketRepository):
+    def __init__(self, collection=tickets_collection):
+        self.collection = collection
+
+    def get(self, ticket_number, projection=None):
+        return self.collection.find_one({"ticket_number": ticket_number}, projection)
+
+    def find(self, query, sort=None, skip=0, limit=0, projection=None):
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        return list(cursor.skip(skip).limit(limit))
+
+    def count(self, query=None):
+        return self.collection.count_documents(query or {})
+
+    def count_by(self, field, query=None):
+        return {
+            row["_id"]: row["count"]
+            for row in self.collection.aggregate([
+                {"$match": query or {}},
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+            ])
+        }
+
+    def distinct(self, field, query=None):
+        return self.collection.distinct(field, query or {})
+
+    def insert(self, ticket):
+        self.collection.insert_one(ticket)
+
+    def insert_many(self, tickets):
+        if tickets:
+            self.collection.insert_many(tickets, ordered=False)
+
+    def update(self, ticket_number, set_fields=None, unset_fields=()):
+        update = {}
+        if set_fields:
+            update["$set"] = set_fields
+        if unset_fields:
+            update["$unset"] = {field: "" for field in unset_fields}
+        return self.collection.update_one({"ticket_number": ticket_number}, update).matched_count > 0
+
+class MongoUserRepository(UserRepository):
+    def __init__(self, collection=users_collection):
+        self.collection = collection
+
+    def get(self, username):
+        return self.collection.find_one({"username": username})
+
+    def list(self):
+        return list(self.collection.find({}, {"password": 0}))
+
+    def count(self):
+        return self.collection.count_documents({})
+
+    def insert(self, user):
+        self.collection.insert_one(user)
+
+    def insert_many(self, users):
+        if not users:
+            return {}
+        try:
+            # Unordered: one bad row does not stop the rows after it
+            self.collection.insert_many(users, ordered=False)
+        except BulkWriteError as e:
+            return {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+        return {}
+
+    def update(self, username, fields):
+        return self.collection.update_one({"username": username}, {"$set": fields}).matched_count > 0
+
+    def delete(self, username):
+        return self.collection.delete_one({"username": username}).deleted_count > 0
+
+class MongoCounterRepository(CounterRepository):
+    def __init__(self, collection=ticket_counter_collection):
+        self.collection = collection
+
+    def reserve(self, year, count):
+        try:
+            counter_doc = self._increment(year, count)
+        except DuplicateKeyError:
+            # Lost a first-of-year upsert race (unique index on year); the counter exists now
+            counter_doc = self._increment(year, count)
+        return counter_doc["counter"] - count + 1
+
+    def _increment(self, year, count):
+        return self.collection.find_one_and_update(
+            {"year": year},
+            {"$inc": {"counter": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+class MongoAuditLogRepository(AuditLogRepository):
+    def __init__(self, collection=audit_logs_collection):
+        self.collection = collection
+
+    def append(self, entry):
+        self.collection.insert_one(entry)
+
+    def append_many(self, entries):
+        if entries:
+            self.collection.insert_many(entries, ordered=False)
+
+class MongoIdempotencyKeyRepository(IdempotencyKeyRepository):
+    """Keys expire through the TTL index on created_at (IDEMPOTENCY_KEY_TTL_SECONDS)"""
+
+    def __init__(self, collection=idempotency_keys_collection):
+        self.collection = collection
+
+    def claim(self, key_id, request_hash, now):
+        try:
+            self.collection.insert_one({
+                "_id": key_id,
+                "request_hash": request_hash,
+                "status": "in_progress",
+                "created_at": now,
+                "locked_at": now
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def get(self, key_id):
+        return self.collection.find_one({"_id": key_id})
+
+    def take_over(self, key_id, stale_before, now):
+        return self.collection.update_one(
+            {"_id": key_id, "status": "in_progress", "locked_at": {"$lt": stale_before}},
+            {"$set": {"locked_at": now}}
+        ).modified_count == 1
+
+    def complete(self, key_id, response):
+        self.collection.update_one(
+            {"_id": key_id},
+            {"$set": {"status": "completed", "response": response, "completed_at": datetime.utcnow()}}
+        )
+
+    def release(self, key_id):
+        self.collection.delete_one({"_id": key_id})
+
+class MongoTombstoneRepository(TombstoneRepository):
+    """Tombstones expire through the TTL index on expires_from (TOMBSTONE_RETENTION_DAYS)"""
+
+    def __init__(self, collection=ticket_tombstones_collection):
+        self.collection = collection
+
+    def append_many(self, tombstones):
+        if tombstones:
+            self.collection.insert_many(tombstones)
+
+    def find_since(self, since):
+        return list(self.collection.find(
+            {"deleted_at": {"$gte": since}}, {"_id": 0, "expires_from": 0}
+        ).sort("deleted_at", ASCENDING))
+
+# ---------------------------------------------------------------- memory
+
+class MemoryTicketRepository(TicketRepository):
+    def __init__(self):
+        # Same lookups the MongoDB indexes in database.py serve
+        self.collection = MemoryCollection(
+            unique=("ticket_number",), indexed=("status", "module", "developer", "se_name")
+        )
+
+    def get(self, ticket_number, projection=None):
+        return self.collection.find_one({"ticket_number": ticket_number}, projection)
+
+    def find(self, query, sort=None, skip=0, limit=0, projection=None):
+        return self.collection.find(query, projection, sort, skip, limit)
+
+    def count(self, query=None):
+        return self.collection.count(query)
+
+    def count_by(self, field, query=None):
+        return self.collection.count_by(field, query)
+
+    def distinct(self, field, query=None):
+        return self.collection.distinct(field, query)
+
+    def insert(self, ticket):
+        self.collection.insert(ticket)
+
+    def insert_many(self, tickets):
+        for ticket in tickets:
+            self.collection.insert(ticket)
+
+    def update(self, ticket_number, set_fields=None, unset_fields=()):
+        return self.collection.update({"ticket_number": ticket_number}, set_fields, unset_fields) > 0
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self):
+        self.collection = MemoryCollection(unique=("username",))
+
+    def get(self, username):
+        return self.collection.find_one({"username": username})
+
+    def list(self):
+        return self.collection.find({}, {"password": 0})
+
+    def count(self):
+        return self.collection.count()
+
+    def insert(self, user):
+        self.collection.insert(user)
+
+    def insert_many(self, users):
+        errors = {}
+        for position, user in enumerate(users):
+            try:
+                self.collection.insert(user)
+            except DuplicateKeyError as e:
+                errors[position] = str(e)
+        return errors
+
+    def update(self, username, fields):
+        return self.collection.update({"username": username}, fields) > 0
+
+    def delete(self, username):
+        return self.collection.delete({"username": username}) > 0
+
+class MemoryCounterRepository(CounterRepository):
+    def __init__(self):
+        self.collection = MemoryCollection(unique=("year",))
+
+    def reserve(self, year, count):
+        counter_doc = self.collection.increment({"year": year}, "counter", count, upsert=True)
+        return counter_doc["counter"] - count + 1
+
+class MemoryAuditLogRepository(AuditLogRepository):
+    def __init__(self):
+        self.collection = MemoryCollection(indexed=("ticket_id",))
+
+    def append(self, entry):
+        self.collection.insert(entry)
+
+    def append_many(self, entries):
+        for entry in entries:
+            self.collection.insert(entry)
+
+class MemoryIdempotencyKeyRepository(IdempotencyKeyRepository):
+    """Same claim protocol as MongoDB: insert raises DuplicateKeyError on a taken _id"""
+
+    def __init__(self):
+        self.collection = MemoryCollection(unique=("_id",))
+
+    def claim(self, key_id, request_hash, now):
+        # No TTL index here: an expired key is dropped when it is claimed again
+        self.collection.delete({
+            "_id": key_id, "created_at": {"$lt": now - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)}
+        })
+        try:
+            self.collection.insert({
+                "_id": key_id,
+                "request_hash": request_hash,
+                "status": "in_progress",
+                "created_at": now,
+                "locked_at": now
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def get(self, key_id):
+        return self.collection.find_one({"_id": key_id})
+
+    def take_over(self, key_id, stale_before, now):
+        return self.collection.update(
+            {"_id": key_id, "status": "in_progress", "locked_at": {"$lt": stale_before}},
+            {"locked_at": now}
+        ) == 1
+
+    def complete(self, key_id, response):
+        self.collection.update(
+            {"_id": key_id}, {"status": "completed", "response": response, "completed_at": datetime.utcnow()}
+        )
+
+    def release(self, key_id):
+        self.collection.delete({"_id": key_id})
+
+class MemoryTombstoneRepository(TombstoneRepository):
+    def __init__(self):
+        self.collection = MemoryCollection()
+
+    def append_many(self, tombstones):
+        # No TTL index here: tombstones past the retention window are dropped on write
+        expired_before = datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        self.collection.delete({"expires_from": {"$lt": expired_before}}, multi=True)
+        for tombstone in tombstones:
+            self.collection.insert(tombstone)
+
+    def find_since(self, since):
+        return self.collection.find(
+            {"deleted_at": {"$gte": since}}, {"_id": 0, "expires_from": 0}, sort=[("deleted_at", 1)]
+        )
+
+# ---------------------------------------------------------------- selection
+
+class Storage:
+    """`reporting_tickets` serves read-heavy listings and aggregates and may lag `tickets`
+    (MONGO_REPORTING_READ_PREFERENCE); anything that must see its own writes uses `tickets`.
+    `archived_tickets` is the read side of the archive (archival.py); it stays empty under
+    the memory backend, which never archives."""
+
+    def __init__(self, backend: str, tickets: TicketRepository, users: UserRepository,
+                 counters: CounterRepository, audit_logs: AuditLogRepository,
+                 idempotency_keys: IdempotencyKeyRepository, tombstones: TombstoneRepository,
+                 reporting_tickets: Optional[TicketRepository] = None,
+                 archived_tickets: Optional[TicketRepository] = None):
+        self.backend = backend
+        self.tickets = tickets
+        self.reporting_tickets = reporting_tickets or tickets
+        self.archived_tickets = archived_tickets or MemoryTicketRepository()
+        self.users = users
+        self.counters = counters
+        self.audit_logs = audit_logs
+        self.idempotency_keys = idempotency_keys
+        self.tombstones = tombstones
+
+    @property
+    def uses_mongo(self) -> bool:
+        return self.backend == "mongo"
+
+def mongo_storage() -> Storage:
+    return Storage("mongo", MongoTicketRepository(), MongoUserRepository(),
+                   MongoCounterRepository(), MongoAuditLogRepository(),
+                   MongoIdempotencyKeyRepository(), MongoTombstoneRepository(),
+                   reporting_tickets=MongoTicketRepository(tickets_reporting_collection),
+                   archived_tickets=MongoTicketRepository(tickets_archive_reporting_collection))
+
+def memory_storage() -> Storage:
+    return Storage("memory", MemoryTicketRepository(), MemoryUserRepository(),
+                   MemoryCounterRepository(), MemoryAuditLogRepository(),
+                   MemoryIdempotencyKeyRepository(), MemoryTombstoneRepository())
+
+def create_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    if backend == "mongo":
+        return mongo_storage()
+    if backend == "memory":
+        return memory_storage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+storage = create_storage()
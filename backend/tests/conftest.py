@@ -0,0 +1,60 @@
+"""
+Tests run against the memory storage backend, so no mongod is needed:
+    cd backend && python -m pytest -q
+
+Tests of features built directly on MongoDB (aggregations, archival, search)
+use the `mongo_db` fixture and are skipped unless MONGO_TEST_URL points at a
+server, e.g. MONGO_TEST_URL=mongodb://localhost:27017. Each test gets a
+scratch database that is dropped afterwards.
+"""
+
+import os
+import sys
+import uuid
+
+# Must be set before anything imports database.py
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["EMAIL_PASSWORD"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+
+import duplicates  # noqa: E402
+import ticket_service  # noqa: E402
+from storage import storage, memory_storage  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def fresh_storage(monkeypatch):
+    """Empty repositories and duplicate index for every test"""
+    for name, repository in vars(memory_storage()).items():
+        monkeypatch.setattr(storage, name, repository)
+
+    index = duplicates.DuplicateIndex()
+    # Already "started": no resync thread, nothing to load from the empty store
+    index._started = True
+    monkeypatch.setattr(ticket_service, "duplicate_index", index)
+    return storage
+
+@pytest.fixture
+def admin(fresh_storage):
+    user = {"username": "admin", "password": "", "full_name": "System Admin", "role": "Admin"}
+    fresh_storage.users.insert(dict(user))
+    return user
+
+@pytest.fixture
+def mongo_db():
+    url = os.getenv("MONGO_TEST_URL")
+    if not url:
+        pytest.skip("MONGO_TEST_URL is not set")
+    client = MongoClient(url, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"MongoDB at MONGO_TEST_URL is not reachable: {e}")
+    name = f"erp_test_{uuid.uuid4().hex[:12]}"
+    yield client[name]
+    client.drop_database(name)
+    client.close()
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from pymongo.errors import OperationFailure
+
+import analytics
+import server
+
+class ReportingCollection:
+    """Resolved tickets behind the two calls analytics makes; $facet fails with `error`"""
+
+    def __init__(self, tickets, error):
+        self.tickets = tickets
+        self.error = error
+        self.find_calls = 0
+
+    def aggregate(self, pipeline):
+        if "$facet" in pipeline[-1]:
+            raise self.error
+        return iter([])  # open-ticket aging: no open tickets
+
+    def find(self, query, projection, batch_size=None):
+        self.find_calls += 1
+        return iter([dict(ticket) for ticket in self.tickets])
+
+def resolved(hours, module="PPC", developer="Sasi"):
+    return {"time_duration_hours": hours, "module": module, "developer": developer,
+            "cr_type": "Bug", "resolution_type": "Fixed"}
+
+@pytest.fixture
+def reporting(monkeypatch):
+    def install(tickets, error):
+        collection = ReportingCollection(tickets, error)
+        monkeypatch.setattr(analytics, "tickets_reporting_collection", collection)
+        monkeypatch.setattr(analytics, "_cache", {})
+        return collection
+    return install
+
+def test_percentiles_are_streamed_when_unsupported(reporting):
+    tickets = [resolved(hours) for hours in range(1, 101)] + [resolved(500, module="MM", developer="Mohan")]
+    collection = reporting(tickets, OperationFailure("unknown group operator '$percentile'", code=15952))
+
+    result = analytics.get_resolution_analytics()["resolution_hours"]
+
+    assert collection.find_calls == 1
+    assert result["overall"]["count"] == 101
+    assert (result["overall"]["p50_hours"], result["overall"]["p99_hours"]) == (51, 100)
+    ppc, mm = result["by_module"]
+    assert (ppc["key"], ppc["count"], ppc["p90_hours"], ppc["avg_hours"]) == ("PPC", 100, 90, 50.5)
+    assert (mm["key"], mm["p50_hours"]) == ("MM", 500)
+
+def test_feature_compatibility_version_also_falls_back(reporting):
+    reporting([resolved(4)], OperationFailure("$percentile is not allowed", code=224))
+    assert analytics.resolution_percentiles()["overall"]["p50_hours"] == 4
+
+def test_other_server_errors_are_raised(reporting):
+    collection = reporting([resolved(4)], OperationFailure("operation exceeded time limit", code=50))
+    with pytest.raises(OperationFailure):
+        analytics.resolution_percentiles()
+    assert collection.find_calls == 0
+
+def test_no_resolved_tickets(reporting):
+    reporting([], OperationFailure("unknown group operator '$percentile'", code=15952))
+    assert analytics.resolution_percentiles()["overall"] is None
+
+def test_results_are_cached_until_the_data_version_moves(reporting, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_CACHE_SECONDS", 300)
+    collection = reporting([resolved(4)], OperationFailure("unknown group operator '$percentile'", code=15952))
+    versions = iter([1, 1, 2])
+    monkeypatch.setattr(analytics, "get_data_version", lambda name: next(versions))
+
+    assert analytics.get_resolution_analytics()["cached"] is False
+    assert analytics.get_resolution_analytics()["cached"] is True
+    assert analytics.get_resolution_analytics()["cached"] is False
+    assert collection.find_calls == 2
+
+def test_endpoint_runs_the_computation_off_the_event_loop(monkeypatch):
+    def compute(start, end):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return {"start": start, "end": end}
+        raise AssertionError("computed on the event loop")
+
+    monkeypatch.setattr(server, "require_mongo_backend", lambda feature: None)
+    monkeypatch.setattr(server, "get_resolution_analytics", compute)
+    result = asyncio.run(server.get_resolution_analytics_endpoint("2024-01-01", "2024-01-31", current_user={}))
+    assert result == {"start": datetime(2024, 1, 1), "end": datetime(2024, 2, 1)}
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import archival
+import leases
+
+@pytest.fixture
+def archive_db(fresh_storage, mongo_db, monkeypatch):
+    monkeypatch.setattr(archival, "tickets_collection", mongo_db["tickets"])
+    monkeypatch.setattr(archival, "tickets_archive_collection", mongo_db["tickets_archive"])
+    monkeypatch.setattr(leases, "job_leases_collection", mongo_db["job_leases"])
+    return mongo_db
+
+def closed_ticket(number, days_ago, **fields):
+    closed_at = datetime.utcnow() - timedelta(days=days_ago)
+    return {"ticket_number": number, "status": "Closed", "closed_at": closed_at, "updated_at": closed_at, **fields}
+
+def test_only_long_closed_tickets_are_archivable():
+    now = datetime.utcnow()
+    query = archival.archivable_query(now)
+    cutoff = now - timedelta(days=archival.ARCHIVE_AFTER_DAYS)
+    assert query["status"] == "Closed"
+    assert {"closed_at": {"$lt": cutoff}} in query["$or"]
+
+def test_archives_old_closed_tickets_and_records_tombstones(archive_db, fresh_storage):
+    archive_db["tickets"].insert_many([
+        closed_ticket("2023-00001", archival.ARCHIVE_AFTER_DAYS + 10),
+        closed_ticket("2023-00002", 5),
+        {"ticket_number": "2023-00003", "status": "Assigned", "updated_at": datetime(2020, 1, 1)},
+        # Closed before closed_at was recorded
+        {"ticket_number": "2023-00004", "status": "Closed", "updated_at": datetime(2020, 1, 1)},
+    ])
+
+    assert archival.archive_closed_tickets(batch_size=1) == 2
+    assert sorted(archive_db["tickets_archive"].distinct("ticket_number")) == ["2023-00001", "2023-00004"]
+    assert sorted(archive_db["tickets"].distinct("ticket_number")) == ["2023-00002", "2023-00003"]
+    tombstones = fresh_storage.tombstones.find_since(datetime.utcnow() - timedelta(minutes=1))
+    assert {(t["ticket_number"], t["reason"]) for t in tombstones} == {
+        ("2023-00001", "archived"), ("2023-00004", "archived")
+    }
+
+def test_ticket_changed_during_the_move_stays_hot(archive_db):
+    ticket = closed_ticket("2023-00001", archival.ARCHIVE_AFTER_DAYS + 10)
+    archive_db["tickets"].insert_one(dict(ticket))
+    read = archive_db["tickets"].find_one()
+    # Reopened between the read and the delete
+    archive_db["tickets"].update_one({"_id": read["_id"]}, {"$set": {"status": "Assigned"}})
+
+    assert archival.archive_batch([read]) == 0
+    assert archive_db["tickets"].count_documents({}) == 1
+    assert archive_db["tickets_archive"].count_documents({}) == 0
+
+def test_pass_is_skipped_while_another_worker_holds_the_lease(archive_db):
+    archive_db["tickets"].insert_one(closed_ticket("2023-00001", archival.ARCHIVE_AFTER_DAYS + 10))
+    archive_db["job_leases"].insert_one({"_id": archival.ARCHIVAL_LEASE, "owner": "other-host:1",
+                                         "expires_at": datetime.utcnow() + timedelta(minutes=5)})
+
+    assert archival.archive_closed_tickets() == 0
+    assert archive_db["tickets"].count_documents({}) == 1
@@ -0,0 +1,80 @@
+import asyncio
+
+import server
+import ticket_service
+from change_feed import RESET, Subscriber, TicketEventHub, ticket_event
+
+def event(number, module="PPC"):
+    return ticket_event(f"e{number}", "updated", {"_id": number, "module": module}, str(number))
+
+def local_hub(monkeypatch):
+    hub = TicketEventHub()
+    hub._set_mode("local")
+    for module in (server, ticket_service):
+        monkeypatch.setattr(module, "ticket_events", hub)
+    return hub
+
+def test_replay_from_last_event_id():
+    hub = TicketEventHub()
+    for number in range(1, 4):
+        hub.publish(event(number, module="PPC" if number != 2 else "QC"))
+
+    _, backlog = hub.subscribe(module="PPC", last_event_id="e1")
+    assert [e["id"] for e in backlog] == ["e3"]
+    # Fell out of the buffer: the client has to reload
+    assert hub.subscribe(last_event_id="gone")[1] is None
+
+def test_slow_subscriber_is_reset(monkeypatch):
+    async def overflow():
+        subscriber = Subscriber()
+        monkeypatch.setattr(subscriber, "queue", asyncio.Queue(maxsize=2))
+        for number in range(3):
+            subscriber.offer(event(number))
+        return subscriber
+
+    subscriber = asyncio.run(overflow())
+    assert subscriber.overflowed
+    assert subscriber.queue.get_nowait() is RESET
+    assert subscriber.queue.empty()
+
+def test_local_events_published_while_starting_are_delivered():
+    async def publish_while_starting():
+        hub = TicketEventHub()
+        hub._loop = asyncio.get_running_loop()
+        hub.mode = "starting"
+        subscriber, _ = hub.subscribe()
+        hub.publish_local("created", {"_id": 1, "ticket_number": "2024-00001"})
+        assert subscriber.queue.empty()
+
+        hub._set_mode("local")
+        await asyncio.sleep(0)
+        return subscriber.queue.get_nowait()
+
+    delivered = asyncio.run(publish_while_starting())
+    assert (delivered["type"], delivered["ticket_number"]) == ("created", "2024-00001")
+
+def test_no_local_events_before_start_or_with_a_change_stream():
+    hub = TicketEventHub()
+    hub.publish_local("created", {"_id": 1})
+    hub._set_mode("change_stream")
+    hub.publish_local("created", {"_id": 2})
+    assert not hub._buffer
+
+def test_every_update_path_publishes(admin, monkeypatch):
+    hub = local_hub(monkeypatch)
+    ticket = ticket_service.create_ticket_record({
+        "customer": "Acme", "cr_type": "Bug", "issue_type": "Error", "module": "PPC",
+        "description": "Stock report is empty", "priority": "Medium"
+    }, "admin", notify=None)
+    number = ticket["ticket_number"]
+    developer = {"username": "dev", "full_name": "Dev", "role": "Developer"}
+
+    asyncio.run(server.update_ticket(number, server.TicketUpdate(priority="High"), admin))
+    asyncio.run(server.update_ticket_status(number, server.StatusUpdate(
+        status="Completed", resolution_type="Fixed", completion_remarks="Done"), admin))
+    asyncio.run(server.update_ticket(number, server.TicketUpdate(remarks="Customer confirmed"), developer))
+
+    assert [e["type"] for e in hub._buffer] == ["created", "updated", "status_changed", "updated"]
+    remarks = hub._buffer[-1]
+    assert remarks["changed_fields"] == ["remarks", "updated_at"]
+    assert remarks["ticket"]["remarks"] == "Customer confirmed"
@@ -0,0 +1,74 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from routing import current_routing
+from ticket_service import create_ticket_record, record_tombstones
+
+def new_ticket(**fields):
+    data = {"customer": "Acme Industries", "cr_type": "Bug", "issue_type": "Error",
+            "module": current_routing().modules[0], "description": "Invoice posting fails", **fields}
+    return create_ticket_record(data, "admin", notify=None)
+
+def changes(since: datetime, **filters):
+    response = asyncio.run(server.get_tickets(updated_since=since.isoformat(), current_user={}, **filters))
+    return json.loads(response.body)
+
+def numbers(tickets):
+    return [ticket["ticket_number"] for ticket in tickets]
+
+def test_only_tickets_changed_since_the_watermark(fresh_storage):
+    old = new_ticket()["ticket_number"]
+    since = datetime.utcnow()
+    new = new_ticket()["ticket_number"]
+
+    result = changes(since)
+    assert numbers(result["tickets"]) == [new]
+    assert result["full_resync_required"] is False
+    assert changes(since - timedelta(minutes=1))["tickets"][0]["ticket_number"] == old
+
+def test_watermark_trails_the_clock(fresh_storage):
+    watermark = datetime.fromisoformat(changes(datetime.utcnow())["watermark"])
+    assert watermark <= datetime.utcnow() - timedelta(seconds=server.SYNC_WATERMARK_LAG_SECONDS)
+
+def test_timezone_aware_timestamps_are_compared_in_utc(fresh_storage):
+    since = datetime.now(timezone(timedelta(hours=5, minutes=30)))
+    new = new_ticket()["ticket_number"]
+    assert numbers(changes(since)["tickets"]) == [new]
+
+def test_tombstones_since_the_watermark(fresh_storage):
+    ticket = fresh_storage.tickets.get(new_ticket()["ticket_number"])
+    since = datetime.utcnow()
+    record_tombstones([ticket], "archived")
+
+    tombstones = changes(since)["tombstones"]
+    assert [(t["ticket_number"], t["reason"]) for t in tombstones] == [(ticket["ticket_number"], "archived")]
+    assert datetime.fromisoformat(tombstones[0]["deleted_at"]) >= since
+    assert changes(datetime.utcnow() + timedelta(seconds=1))["tombstones"] == []
+
+def test_tickets_leaving_the_filter_are_reported(fresh_storage, admin):
+    leaving = new_ticket()["ticket_number"]
+    staying = new_ticket()["ticket_number"]
+    since = datetime.utcnow()
+    asyncio.run(server.update_ticket_status(leaving, server.StatusUpdate(status="In Progress"), admin))
+    asyncio.run(server.update_ticket(staying, server.TicketUpdate(remarks="Called the customer"), admin))
+
+    result = changes(since, status="Assigned")
+    assert numbers(result["tickets"]) == [staying]
+    assert result["left_filter"] == [leaving]
+    # Without filters every change is a ticket
+    assert changes(since)["left_filter"] == []
+
+def test_sync_beyond_tombstone_retention_needs_a_reload(fresh_storage):
+    result = changes(datetime.utcnow() - timedelta(days=server.TOMBSTONE_RETENTION_DAYS + 1))
+    assert result["full_resync_required"] is True
+    assert result["tickets"] == []
+
+def test_invalid_timestamp_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        server.get_ticket_changes({}, "yesterday")
+    assert error.value.status_code == 400
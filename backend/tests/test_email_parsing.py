@@ -0,0 +1,21 @@
+import pytest
+
+from email_parsing import parse_email_subject
+
+def test_parses_the_five_fields():
+    assert parse_email_subject(" Acme |  Finance | Change Request | Bug |  Totals are off  ") == {
+        "customer": "Acme",
+        "module": "Finance",
+        "cr_type": "Change Request",
+        "issue_type": "Bug",
+        "description": "Totals are off"
+    }
+
+@pytest.mark.parametrize("subject", ["", "Hello", "Acme | Finance | Change Request | Bug"])
+def test_fewer_than_five_parts_is_rejected(subject):
+    assert parse_email_subject(subject) is None
+
+def test_description_keeps_its_separators():
+    parsed = parse_email_subject("Acme | Finance | CR | Bug | Totals |off|  by one ")
+    assert parsed["issue_type"] == "Bug"
+    assert parsed["description"] == "Totals | off | by one"
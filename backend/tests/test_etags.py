@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import server
+from ticket_service import create_ticket_record
+
+def get_ticket(number, if_none_match=None):
+    return asyncio.run(server.get_ticket(number, if_none_match=if_none_match, current_user={}))
+
+def new_ticket():
+    return create_ticket_record({
+        "customer": "Acme", "cr_type": "Bug", "issue_type": "Error", "module": "PPC",
+        "description": "Stock report is empty", "priority": "Medium"
+    }, "admin", notify=None)
+
+def test_unchanged_ticket_answers_304(fresh_storage):
+    number = new_ticket()["ticket_number"]
+    first = get_ticket(number)
+    etag = first.headers["ETag"]
+    assert json.loads(first.body)["ticket_number"] == number
+
+    not_modified = get_ticket(number, etag)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    # Weak comparison and lists of candidates, as sent by browsers and proxies
+    assert get_ticket(number, f'"other", W/{etag}').status_code == 304
+
+def test_updated_ticket_gets_a_new_etag(admin):
+    number = new_ticket()["ticket_number"]
+    etag = get_ticket(number).headers["ETag"]
+    asyncio.run(server.update_ticket(number, server.TicketUpdate(priority="High"), admin))
+
+    changed = get_ticket(number, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert json.loads(changed.body)["priority"] == "High"
+
+def test_reference_data_etag_follows_the_routing_version():
+    first = asyncio.run(server.get_modules(if_none_match=None, current_user={}))
+    assert "PPC" in json.loads(first.body)["modules"]
+
+    again = asyncio.run(server.get_modules(if_none_match=first.headers["ETag"], current_user={}))
+    assert again.status_code == 304
+    other = asyncio.run(server.get_developers(if_none_match=first.headers["ETag"], current_user={}))
+    assert other.status_code == 200
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+
+import server
+from database import IDEMPOTENCY_KEY_TTL_SECONDS
+from routing import current_routing
+
+def create(user, key, description="Invoice posting fails for vendor 4711"):
+    ticket = server.TicketCreate(
+        customer="Acme Industries", cr_type="Bug", issue_type="Error",
+        module=current_routing().modules[0], description=description
+    )
+    return asyncio.run(server.create_ticket(ticket, BackgroundTasks(), user, idempotency_key=key))
+
+def test_retry_replays_the_first_response(fresh_storage, admin):
+    first = create(admin, "key-1")
+    replay = create(admin, "key-1")
+
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert first["ticket_number"] in replay.body.decode()
+    assert fresh_storage.tickets.count() == 1
+
+def test_other_keys_and_users_create_new_tickets(fresh_storage, admin):
+    create(admin, "key-1")
+    create(admin, "key-2")
+    create({**admin, "username": "manager"}, "key-1")
+    assert fresh_storage.tickets.count() == 3
+
+def test_key_reused_with_another_body_is_rejected(fresh_storage, admin):
+    create(admin, "key-1")
+    with pytest.raises(HTTPException) as error:
+        create(admin, "key-1", description="Something else entirely")
+    assert error.value.status_code == 422
+
+def test_in_progress_key_is_taken_over_once_stale(fresh_storage, admin):
+    keys = fresh_storage.idempotency_keys
+    now = datetime.utcnow()
+    assert keys.claim("admin:key-1", "hash", now)
+
+    # A duplicate while the first request is still running
+    with pytest.raises(HTTPException) as error:
+        server.claim_idempotency_key("admin:key-1", "hash")
+    assert error.value.status_code == 409
+
+    later = now + timedelta(seconds=server.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS + 1)
+    assert keys.take_over("admin:key-1", later - timedelta(seconds=server.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS), later)
+
+def test_failed_create_releases_the_key(fresh_storage, admin, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(server, "create_ticket_record", fail)
+    with pytest.raises(RuntimeError):
+        create(admin, "key-1")
+    assert fresh_storage.idempotency_keys.get("admin:key-1") is None
+
+def test_requests_without_a_key_are_not_deduplicated(fresh_storage, admin):
+    create(admin, None)
+    create(admin, None)
+    assert fresh_storage.tickets.count() == 2
+    assert fresh_storage.idempotency_keys.collection.count() == 0
+
+def test_expired_key_creates_a_new_ticket(fresh_storage, admin, monkeypatch):
+    create(admin, "key-1")
+    expired = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS + 1)
+    fresh_storage.idempotency_keys.collection.update({"_id": "admin:key-1"}, {"created_at": expired})
+
+    second = create(admin, "key-1")
+    assert isinstance(second, dict)
+    assert fresh_storage.tickets.count() == 2
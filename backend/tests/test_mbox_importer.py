@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from email_parsing import parse_email_subject
+from mbox_importer import imported_message_ids, write_batch
+from storage import MongoTicketRepository
+from workload import pending_counts
+
+SENT_AT = datetime(2023, 3, 14, 9, 30)
+
+def message(message_id, subject="Acme | PPC | Change Request | Bug | Totals are off"):
+    return {"key": message_id, "message_id": message_id, "date": SENT_AT, "subject": subject,
+            "body": "Please check.", "parsed": parse_email_subject(subject), "reason": None}
+
+def test_batch_creates_tickets_dated_by_the_email(fresh_storage):
+    assert write_batch([message("<a@mail>"), message("<b@mail>")], "mbox_import") == (2, 0)
+
+    tickets = fresh_storage.tickets.find({}, sort=[("ticket_number", 1)])
+    assert [t["ticket_number"] for t in tickets] == ["2023-00001", "2023-00002"]
+    assert all(t["cr_date"] == SENT_AT for t in tickets)
+    # Import time, so delta sync and the duplicate index pick them up
+    assert all(datetime.utcnow() - t["created_at"] < timedelta(minutes=1) for t in tickets)
+    assert fresh_storage.audit_logs.collection.count() == 2
+
+def test_archived_mail_is_imported_closed(fresh_storage):
+    pending = pending_counts.get("Annamalai")
+    write_batch([message("<a@mail>")], "mbox_import")
+
+    ticket = fresh_storage.tickets.find({})[0]
+    assert (ticket["status"], ticket["closed_at"]) == ("Closed", SENT_AT)
+    assert ticket["developer"] == "Annamalai"
+    # Not open work: queues and pending counts are unaffected
+    assert pending_counts.get("Annamalai") == pending
+
+def test_mail_can_be_imported_as_open_work(fresh_storage):
+    pending = pending_counts.get("Annamalai")
+    write_batch([message("<a@mail>"), message("<b@mail>")], "mbox_import", status="Assigned")
+
+    assert fresh_storage.tickets.count_by("status") == {"Assigned": 2}
+    assert "closed_at" not in fresh_storage.tickets.find({})[0]
+    assert pending_counts.get("Annamalai") == pending + 2
+
+def test_rerun_skips_messages_already_imported(fresh_storage):
+    write_batch([message("<a@mail>")], "mbox_import")
+    assert write_batch([message("<a@mail>"), message("<b@mail>")], "mbox_import") == (1, 1)
+    assert write_batch([message("<a@mail>"), message("<b@mail>")], "mbox_import") == (0, 2)
+    assert sorted(fresh_storage.tickets.distinct("email_message_id")) == ["<a@mail>", "<b@mail>"]
+
+def test_duplicates_within_a_batch_are_imported_once(fresh_storage):
+    assert write_batch([message("<a@mail>"), message("<a@mail>")], "mbox_import") == (1, 1)
+
+def test_messages_without_message_id_are_never_deduplicated(fresh_storage):
+    assert write_batch([message(None), message(None)], "mbox_import") == (2, 0)
+
+def test_archived_tickets_count_as_imported(fresh_storage, mongo_db, monkeypatch):
+    import database
+
+    monkeypatch.setattr(fresh_storage, "backend", "mongo")
+    monkeypatch.setattr(fresh_storage, "tickets", MongoTicketRepository(mongo_db["tickets"]))
+    monkeypatch.setattr(database, "tickets_archive_collection", mongo_db["tickets_archive"])
+    mongo_db["tickets"].insert_one({"ticket_number": "2023-00001", "email_message_id": "<live@mail>"})
+    mongo_db["tickets_archive"].insert_one({"ticket_number": "2023-00002", "email_message_id": "<archived@mail>"})
+
+    assert imported_message_ids(["<live@mail>", "<archived@mail>", "<new@mail>"]) == {
+        "<live@mail>", "<archived@mail>"
+    }
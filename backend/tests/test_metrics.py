@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import metrics
+import server
+from metrics import Counter, Histogram, MetricsMiddleware, MongoCommandMetrics
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = []
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    return registry
+
+def series(metric, suffix="", **labels):
+    """Value of one exposition line, e.g. series(histogram, "_count", route="/a")"""
+    label_text = metrics.format_labels(tuple(labels), tuple(labels.values()))
+    prefix = f"{metric.name}{suffix}{label_text} "
+    return next(float(line[len(prefix):]) for line in metric.collect() if line.startswith(prefix))
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value)
+
+    assert series(histogram, "_bucket", le=0.1) == 1
+    assert series(histogram, "_bucket", le=1) == 3
+    assert series(histogram, "_bucket", le="+Inf") == 4
+    assert series(histogram, "_count") == 4
+    assert series(histogram, "_sum") == pytest.approx(4.25)
+
+def test_label_values_are_escaped(registry):
+    counter = Counter("events_total", "Events", ("name",))
+    counter.inc(name='say "hi"\n')
+    assert 'events_total{name="say \\"hi\\"\\n"} 1' in metrics.render_metrics()
+
+def run_middleware(app, route):
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/api/tickets/2024-00001",
+             "route": SimpleNamespace(path=route)}
+    asyncio.run(MetricsMiddleware(app)(scope, None, send))
+
+def test_requests_are_labelled_by_route_template():
+    async def ok(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def crash(scope, receive, send):
+        raise RuntimeError("boom")
+
+    route = "/api/test-metrics/{ticket_id}"
+    run_middleware(ok, route)
+    with pytest.raises(RuntimeError):
+        run_middleware(crash, route)
+
+    duration = metrics.http_request_duration_seconds
+    assert series(duration, "_count", method="GET", route=route, status=200) == 1
+    assert series(duration, "_count", method="GET", route=route, status=500) == 1
+    assert series(metrics.http_requests_in_flight) == 0
+
+def test_mongo_commands_are_timed_by_collection():
+    listener = MongoCommandMetrics()
+
+    def event(request_id, **fields):
+        return SimpleNamespace(connection_id=("db", 27017), request_id=request_id, command_name="find",
+                               command={"find": "test_metrics_tickets"}, duration_micros=2500, **fields)
+
+    for request_id in (1, 2):
+        listener.started(event(request_id))
+    listener.succeeded(event(1))
+    listener.failed(event(2))
+
+    labels = {"collection": "test_metrics_tickets", "command": "find"}
+    assert series(metrics.mongodb_command_duration_seconds, "_count", **labels) == 2
+    assert metrics.mongodb_command_failures_total.value(**labels) == 1
+    assert not listener._collections
+
+def test_metrics_endpoint_requires_the_configured_token(monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-me")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_metrics(credentials=None))
+    assert error.value.status_code == 401
+
+    response = asyncio.run(server.get_metrics(
+        credentials=HTTPAuthorizationCredentials(scheme="Bearer", credentials="scrape-me")
+    ))
+    assert b"# TYPE http_request_duration_seconds histogram" in response.body
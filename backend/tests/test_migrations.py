@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import leases
+import migrations
+
+LEGACY_TICKET = {
+    "ticket_number": "2023-00001", "cr_date": "2023-03-14", "cr_time": "09:30:00",
+    "completed_on": "2023-03-16", "completed_time": "09:30:00", "time_duration": "2 days",
+    "created_at": "2023-03-14T09:30:00", "updated_at": "2023-03-16T10:00:00"
+}
+
+@pytest.fixture
+def migration_db(mongo_db, monkeypatch):
+    monkeypatch.setattr(migrations, "tickets_collection", mongo_db["tickets"])
+    monkeypatch.setattr(leases, "job_leases_collection", mongo_db["job_leases"])
+    return mongo_db
+
+def test_legacy_strings_become_datetimes():
+    update = migrations.convert_legacy_datetimes(LEGACY_TICKET)
+    assert update["$set"]["cr_date"] == datetime(2023, 3, 14, 9, 30)
+    assert update["$set"]["completed_on"] == datetime(2023, 3, 16, 9, 30)
+    assert update["$set"]["updated_at"] == datetime(2023, 3, 16, 10, 0)
+    assert update["$set"]["time_duration_hours"] == 48.0
+    assert set(update["$unset"]) == {"cr_time", "completed_time", "time_duration"}
+
+def test_migration_converts_and_releases_the_lease(migration_db):
+    migration_db["tickets"].insert_one(dict(LEGACY_TICKET))
+
+    assert migrations.migrate_ticket_datetimes(pause_seconds=0) == 1
+    assert isinstance(migration_db["tickets"].find_one()["cr_date"], datetime)
+    lease = migration_db["job_leases"].find_one({"_id": migrations.MIGRATION_LEASE})
+    assert lease["expires_at"] <= datetime.utcnow()
+
+def test_migration_waits_for_the_worker_holding_the_lease(migration_db):
+    migration_db["tickets"].insert_one(dict(LEGACY_TICKET))
+    migration_db["job_leases"].insert_one({"_id": migrations.MIGRATION_LEASE, "owner": "other-host:1",
+                                           "expires_at": datetime.utcnow() + timedelta(minutes=5)})
+
+    assert migrations.migrate_ticket_datetimes(pause_seconds=0) == 0
+    assert migration_db["tickets"].find_one()["cr_date"] == "2023-03-14"
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from duplicates import DuplicateIndex, DUPLICATE_THRESHOLD
+from minhash import LSHIndex, NUM_PERM, shingles, signature, similarity
+
+BASE = ("Invoice posting fails for vendor 4711 when the posting period 12 is closed "
+        "and the document type is KR with withholding tax")
+
+def jaccard(first: str, second: str) -> float:
+    a, b = shingles(first), shingles(second)
+    return len(a & b) / len(a | b)
+
+def test_identical_texts_have_identical_signatures():
+    assert signature(BASE) == signature(BASE.upper())
+    assert similarity(signature(BASE), signature(BASE)) == 1.0
+
+def test_empty_text_has_no_signature():
+    assert signature("") is None
+    assert signature("  --- ") is None
+
+def test_estimate_tracks_jaccard():
+    near = BASE.replace("4711", "4712")
+    unrelated = "Goods receipt for purchase order 450001 is blocked in plant 1000 by quality inspection"
+    # Standard error with NUM_PERM hashes is at most 0.5 / sqrt(NUM_PERM); allow three of them
+    tolerance = 3 * 0.5 / NUM_PERM ** 0.5
+    for other in (near, unrelated):
+        assert abs(similarity(signature(BASE), signature(other)) - jaccard(BASE, other)) <= tolerance
+
+def test_best_match_respects_threshold_and_partition():
+    index = LSHIndex()
+    index.add("T1", ("acme", "FI"), signature(BASE))
+    near = signature(BASE + " again")
+    unrelated = signature("Goods receipt blocked in plant 1000 by quality inspection lot")
+
+    key, score = index.best_match(("acme", "FI"), near, DUPLICATE_THRESHOLD)
+    assert key == "T1" and score >= DUPLICATE_THRESHOLD
+    assert index.best_match(("acme", "FI"), unrelated, DUPLICATE_THRESHOLD) is None
+    # Same text for another customer is never compared
+    assert index.best_match(("globex", "FI"), near, DUPLICATE_THRESHOLD) is None
+    # A threshold above the score rejects the match
+    assert index.best_match(("acme", "FI"), near, min(score + 0.01, 1.01)) is None
+
+def test_remove_and_readd():
+    index = LSHIndex()
+    index.add("T1", "p", signature(BASE))
+    index.add("T1", "p", signature(BASE))
+    assert len(index) == 1
+    index.remove("T1")
+    assert "T1" not in index
+    assert index.best_match("p", signature(BASE), 0.1) is None
+
+def test_duplicate_index_points_to_cluster_root():
+    index = DuplicateIndex()
+    index._started = True
+    now = datetime.utcnow()
+    index.add({"ticket_number": "T1", "customer": "Acme", "module": "FI", "description": BASE, "created_at": now})
+    index.add({"ticket_number": "T2", "customer": "acme ", "module": "FI", "description": BASE + " again",
+               "possible_duplicate_of": "T1", "created_at": now})
+
+    match = index.find({"customer": "ACME", "module": "FI", "description": BASE + " again"})
+    assert match["ticket_number"] == "T1"
+    assert match["matched_ticket"] == "T2"
+    assert index.find({"customer": "Acme", "module": "MM", "description": BASE}) is None
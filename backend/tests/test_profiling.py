@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import pytest
+from starlette.concurrency import run_in_threadpool
+
+import profiling
+from profiling import ProfileMiddleware, profile_in_thread
+
+ADMIN_TOKEN = "admin-token"
+
+@pytest.fixture(autouse=True)
+def profiles(monkeypatch):
+    monkeypatch.setattr(profiling, "_profiles", OrderedDict())
+    monkeypatch.setattr(profiling, "_last_started", 0.0)
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_INTERVAL_MS", 1)
+    return profiling._profiles
+
+def busy_handler(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def threadpool_report_work():
+    busy_handler(0.01)
+
+async def app(scope, receive, send):
+    busy_handler()
+    await run_in_threadpool(profile_in_thread(threadpool_report_work))
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+def request(headers=(), query=b"", token=ADMIN_TOKEN) -> dict:
+    """Run one request through the middleware; returns the response headers"""
+    sent = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent.update((name.decode(), value.decode()) for name, value in message["headers"])
+
+    headers = [(b"authorization", f"Bearer {token}".encode())] + list(headers)
+    scope = {"type": "http", "method": "GET", "path": "/api/dashboard/stats",
+             "headers": headers, "query_string": query}
+    asyncio.run(ProfileMiddleware(app, authorize=lambda t: t == ADMIN_TOKEN)(scope, None, send))
+    return sent
+
+def test_unflagged_and_non_admin_requests_are_not_profiled(profiles):
+    assert "x-profile-id" not in request()
+    assert "x-profile-id" not in request([(b"x-profile", b"sample")], token="developer-token")
+    assert not profiles
+
+def test_sampled_profile_is_stored_as_collapsed_stacks(profiles):
+    headers = request([(b"x-profile", b"sample")])
+
+    profile = profiling.get_profile(headers["x-profile-id"])
+    assert (profile["mode"], profile["path"]) == ("sample", "/api/dashboard/stats")
+    assert profile["samples"] > 0
+    stacks = profile["output"].splitlines()
+    assert any("test_profiling.py:busy_handler" in stack for stack in stacks)
+    assert all(stack.rsplit(" ", 1)[1].isdigit() for stack in stacks)
+    assert "output" not in profiling.list_profiles()[0]
+
+def test_cprofile_report_covers_threadpool_work(profiles):
+    headers = request(query=b"profile=cprofile")
+
+    report = profiling.get_profile(headers["x-profile-id"])["output"]
+    assert "busy_handler" in report
+    assert "threadpool_report_work" in report
+
+def test_back_to_back_profiles_are_rate_limited(monkeypatch, profiles):
+    monkeypatch.setattr(profiling, "PROFILE_MIN_INTERVAL_SECONDS", 60)
+    request([(b"x-profile", b"sample")])
+    second = request([(b"x-profile", b"sample")])
+
+    assert second["x-profile-status"] == "rate-limited"
+    assert len(profiles) == 1
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import database
+from storage import mongo_storage
+
+def read_preference(monkeypatch, mode, max_staleness=90):
+    monkeypatch.setattr(database, "MONGO_REPORTING_READ_PREFERENCE", mode)
+    monkeypatch.setattr(database, "MONGO_MAX_STALENESS_SECONDS", max_staleness)
+    return database.reporting_read_preference()
+
+def test_primary_needs_no_staleness_bound(monkeypatch):
+    assert read_preference(monkeypatch, "primary", max_staleness=0) == Primary()
+
+def test_secondary_reads_are_bounded_by_staleness(monkeypatch):
+    preference = read_preference(monkeypatch, "secondaryPreferred", max_staleness=120)
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == 120
+
+@pytest.mark.parametrize("mode, max_staleness", [("secondary", 30), ("fastest", 90)])
+def test_invalid_settings_fail_at_startup(monkeypatch, mode, max_staleness):
+    with pytest.raises(ValueError):
+        read_preference(monkeypatch, mode, max_staleness)
+
+def test_only_reporting_reads_are_routed():
+    storage = mongo_storage()
+    assert storage.reporting_tickets.collection is database.tickets_reporting_collection
+    assert storage.archived_tickets.collection is database.tickets_archive_reporting_collection
+    assert storage.tickets.collection.read_preference == Primary()
+
+def test_caches_are_off_when_reporting_reads_can_lag():
+    # Settings are read at import, so check them in a fresh interpreter
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "STORAGE_BACKEND": "memory", "MONGO_REPORTING_READ_PREFERENCE": "nearest"}
+    settings = subprocess.run(
+        [sys.executable, "-c", "import analytics, database, response_cache; print("
+         "database.tickets_reporting_collection.read_preference.mode, database.REPORTING_READS_FROM_PRIMARY, "
+         "response_cache.RESPONSE_CACHE_SECONDS, analytics.ANALYTICS_CACHE_SECONDS)"],
+        cwd=backend, env=env, capture_output=True, text=True, check=True
+    ).stdout.split()
+    assert settings == ["4", "False", "0.0", "0.0"]
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import pytest
+
+from response_cache import ResponseCache
+from ticket_service import bump_data_version
+
+class SlowCompute:
+    """Blocks until released, counting how often it really ran"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, value):
+        self.calls += 1
+        self.release.wait(5)
+        return f"{value}-{self.calls}"
+
+async def gather_while_blocked(cache, compute, key, requests):
+    tasks = [asyncio.ensure_future(cache.get(key, compute, key)) for _ in range(requests)]
+    await asyncio.sleep(0.05)
+    compute.release.set()
+    return await asyncio.gather(*tasks)
+
+def test_concurrent_requests_are_coalesced():
+    cache = ResponseCache("test_coalesce")
+    compute = SlowCompute()
+    results = asyncio.run(gather_while_blocked(cache, compute, "k", 20))
+    assert compute.calls == 1
+    assert results == ["k-1"] * 20
+
+def test_hit_until_data_version_moves():
+    cache = ResponseCache("test_version", ttl_seconds=60)
+    compute = SlowCompute()
+    compute.release.set()
+
+    async def scenario():
+        first = await cache.get("k", compute, "k")
+        again = await cache.get("k", compute, "k")
+        bump_data_version("tickets")
+        after_write = await cache.get("k", compute, "k")
+        return first, again, after_write
+
+    assert asyncio.run(scenario()) == ("k-1", "k-1", "k-2")
+    assert compute.calls == 2
+
+def test_zero_ttl_only_coalesces():
+    cache = ResponseCache("test_no_ttl", ttl_seconds=0)
+    compute = SlowCompute()
+    compute.release.set()
+
+    async def scenario():
+        return [await cache.get("k", compute, "k") for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["k-1", "k-2", "k-3"]
+
+def test_errors_are_not_cached():
+    cache = ResponseCache("test_errors", ttl_seconds=60)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await cache.get("k", failing)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+def test_entries_are_bounded():
+    cache = ResponseCache("test_bounded", ttl_seconds=60, max_entries=3)
+    compute = SlowCompute()
+    compute.release.set()
+
+    async def scenario():
+        for key in range(10):
+            await cache.get(key, compute, key)
+
+    asyncio.run(scenario())
+    assert len(cache._entries) <= 3
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import archival
+import leases
+import rollups
+
+@pytest.fixture
+def rollup_db(mongo_db, monkeypatch):
+    for module in (rollups, archival):
+        monkeypatch.setattr(module, "tickets_collection", mongo_db["tickets"])
+        monkeypatch.setattr(module, "tickets_archive_collection", mongo_db["tickets_archive"])
+    monkeypatch.setattr(rollups, "db", mongo_db)
+    monkeypatch.setattr(rollups, "ticket_rollups_collection", mongo_db["ticket_rollups"])
+    monkeypatch.setattr(leases, "job_leases_collection", mongo_db["job_leases"])
+    return mongo_db
+
+def day(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+def test_rollup_keys_cover_every_dimension():
+    ticket = {"module": "PPC", "developer": "Sasi", "customer": "", "status": "New"}
+    assert rollups.rollup_keys(ticket) == [("total", "all"), ("module", "PPC"), ("developer", "Sasi")]
+
+def test_backfill_after_archival_keeps_archived_history(rollup_db):
+    now = datetime.utcnow()
+    opened = now - timedelta(days=400)
+    closed = now - timedelta(days=300)
+    rollup_db["tickets"].insert_many([
+        {"ticket_number": "2024-00001", "module": "PPC", "developer": "Sasi", "customer": "Acme",
+         "status": "Closed", "cr_date": opened, "completed_on": closed, "closed_at": closed, "updated_at": closed},
+        {"ticket_number": "2024-00002", "module": "PPC", "developer": "Sasi", "customer": "Acme",
+         "status": "Assigned", "cr_date": opened, "updated_at": opened},
+    ])
+
+    assert archival.archive_closed_tickets() == 1
+    assert rollup_db["tickets"].count_documents({}) == 1
+    rollups.backfill_rollups()
+
+    rows = {row["_id"]: row for row in rollup_db["ticket_rollups"].find()}
+    assert rows[f"{day(opened)}|total|all"]["opened"] == 2
+    assert rows[f"{day(opened)}|module|PPC"]["opened"] == 2
+    assert rows[f"{day(closed)}|total|all"]["completed"] == 1
+    assert rows[f"{day(closed)}|customer|Acme"]["closed"] == 1
+
+def test_backfill_replaces_previous_rollups(rollup_db):
+    opened = datetime(2024, 5, 1, 10)
+    rollup_db["ticket_rollups"].insert_one({"_id": "stale", "dimension": "total", "key": "all"})
+    rollup_db["tickets"].insert_one({"ticket_number": "2024-00001", "status": "New", "cr_date": opened})
+
+    rollups.backfill_rollups()
+
+    assert rollup_db["ticket_rollups"].find_one({"_id": "stale"}) is None
+    assert rollup_db["ticket_rollups"].find_one({"_id": "2024-05-01|total|all"})["opened"] == 1
+    assert "ticket_rollups_rebuild" not in rollup_db.list_collection_names()
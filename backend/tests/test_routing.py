@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import routing
+import server
+from routing import build_snapshot, reload_routing, seed_routing_doc, update_routing
+
+ADMIN = {"username": "admin", "role": "Admin"}
+
+@pytest.fixture
+def routing_db(mongo_db, monkeypatch):
+    monkeypatch.setattr(routing, "routing_collection", mongo_db["routing_config"])
+    monkeypatch.setattr(routing, "_snapshot", None)
+    monkeypatch.setattr(server.storage, "backend", "mongo")
+    return mongo_db
+
+def test_snapshot_is_read_only_and_precomputes_reference_data():
+    doc = {**seed_routing_doc(), "developer_pool_map": {"PPC": ["Annamalai", "Newhire"], "QC": []}}
+    snapshot = build_snapshot(doc)
+
+    with pytest.raises(TypeError):
+        snapshot.developer_module_map["PPC"] = "Sasi"
+    assert dict(snapshot.developer_pool_map) == {"PPC": ("Annamalai", "Newhire")}
+    # Pool members are developers even when no module maps to them directly
+    assert "Newhire" in snapshot.developers
+    assert snapshot.modules == tuple(routing.supportModuleMap)
+
+def test_routing_is_admin_only():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_routing(current_user={"username": "dev", "role": "Developer"}))
+    assert error.value.status_code == 403
+
+def test_updates_need_the_mongo_backend(fresh_storage):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.put_routing(server.RoutingUpdate(developer_module_map={"PPC": "Sasi"}),
+                                       current_user=ADMIN))
+    assert error.value.status_code == 501
+
+def test_update_bumps_the_version_and_swaps_the_snapshot(routing_db):
+    assert reload_routing().version == 1
+
+    updated = asyncio.run(server.put_routing(
+        server.RoutingUpdate(developer_module_map={"PPC": "Sasi"}, expected_version=1), current_user=ADMIN
+    ))
+    assert updated["version"] == 2
+    assert routing.current_routing().developer_module_map == {"PPC": "Sasi"}
+    assert routing_db["routing_config"].find_one()["updated_by"] == "admin"
+
+def test_concurrent_edit_is_rejected(routing_db):
+    reload_routing()
+    assert update_routing({"developer_pool_map": {"PPC": ["Sasi"]}}, 1, "someone") is not None
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.put_routing(
+            server.RoutingUpdate(developer_module_map={"PPC": "Sasi"}, expected_version=1), current_user=ADMIN
+        ))
+    assert error.value.status_code == 409
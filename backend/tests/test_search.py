@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import search
+import server
+from search import highlight_pattern, query_terms, snippet
+
+def search_endpoint(q, **params):
+    return asyncio.run(server.search_tickets_endpoint(q, current_user={}, **params))
+
+def test_query_terms_keep_phrases_and_skip_negations():
+    assert query_terms('"goods receipt" blocked -plant') == ["goods receipt", "blocked"]
+
+def test_snippet_marks_stemmed_matches_and_escapes_html():
+    pattern = highlight_pattern(["post"])
+    text = "x" * 100 + " <b>Posting</b> fails for posted invoices"
+    excerpt = snippet(text, pattern)
+    assert excerpt.startswith("…")
+    assert "&lt;b&gt;<mark>Posting</mark>&lt;/b&gt;" in excerpt
+    assert "<mark>posted</mark>" in excerpt
+    assert snippet("nothing here", pattern) is None
+
+def test_endpoint_validates_before_searching(fresh_storage, monkeypatch):
+    with pytest.raises(HTTPException) as empty:
+        search_endpoint("  ")
+    assert empty.value.status_code == 400
+
+    with pytest.raises(HTTPException) as memory:
+        search_endpoint("invoice")
+    assert memory.value.status_code == 501
+
+    monkeypatch.setattr(fresh_storage, "backend", "mongo")
+    with pytest.raises(HTTPException) as too_deep:
+        search_endpoint("invoice", page=search.SEARCH_MAX_PAGE + 1)
+    assert too_deep.value.status_code == 400
+
+@pytest.fixture
+def search_db(mongo_db, monkeypatch):
+    for name in ("tickets", "tickets_archive"):
+        mongo_db[name].create_index([("description", "text"), ("remarks", "text"), ("completion_remarks", "text")],
+                                    weights={"description": 3, "remarks": 1, "completion_remarks": 2})
+    monkeypatch.setattr(search, "tickets_collection", mongo_db["tickets"])
+    monkeypatch.setattr(search, "tickets_archive_collection", mongo_db["tickets_archive"])
+    return mongo_db
+
+def ticket(number, description, **fields):
+    return {"ticket_number": number, "description": description, "module": "PPC", "status": "Assigned",
+            "cr_date": datetime(2024, 1, 1), **fields}
+
+def test_results_are_ranked_and_can_include_the_archive(search_db):
+    search_db["tickets"].insert_many([
+        ticket("2024-00001", "Stock report is empty", remarks="invoice attached"),
+        ticket("2024-00002", "Invoice posting fails for invoice 4711"),
+        ticket("2024-00003", "Label printing misaligned"),
+    ])
+    search_db["tickets_archive"].insert_one(ticket("2023-00001", "Invoice totals wrong", status="Closed"))
+
+    live = search.search_tickets("invoice")
+    assert [r["ticket"]["ticket_number"] for r in live["results"]] == ["2024-00002", "2024-00001"]
+    assert live["results"][1]["snippets"] == {"remarks": "<mark>invoice</mark> attached"}
+
+    everything = search.search_tickets("invoice", include_archived=True, page_size=2)
+    assert len(everything["results"]) == 2 and everything["has_more"]
+    assert "2023-00001" in [r["ticket"]["ticket_number"] for r in search.search_tickets(
+        "invoice", include_archived=True)["results"]]
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from routing import current_routing
+from ticket_service import create_ticket_record, get_data_version
+
+def new_ticket(module=None, **fields):
+    data = {
+        "customer": "Acme Industries",
+        "cr_type": "Bug",
+        "issue_type": "Error",
+        "module": module or current_routing().modules[0],
+        "description": "Invoice posting fails for vendor 4711",
+        "priority": "Medium",
+        **fields
+    }
+    return create_ticket_record(data, "admin", notify=None)
+
+def set_status(ticket_number, user, **fields):
+    return asyncio.run(server.update_ticket_status(ticket_number, server.StatusUpdate(**fields), user))
+
+def test_create_numbers_assigns_and_audits(fresh_storage):
+    version = get_data_version("tickets")
+    first, second = new_ticket(), new_ticket(description="Goods receipt blocked for plant 1000")
+
+    year = datetime.utcnow().year
+    assert first["ticket_number"] == f"{year}-00001"
+    assert second["ticket_number"] == f"{year}-00002"
+    stored = fresh_storage.tickets.get(first["ticket_number"])
+    assert stored["status"] == "Assigned"
+    assert stored["priority_rank"] == 2
+    assert stored["commitment_sort"] == "9999-12-31"
+    assert first["se_name"] == current_routing().support_module_map[first["module"]]
+    assert fresh_storage.audit_logs.collection.count() == 2
+    assert get_data_version("tickets") == version + 2
+
+def test_update_recomputes_queue_fields(admin):
+    ticket = new_ticket()
+    updated = asyncio.run(server.update_ticket(
+        ticket["ticket_number"], server.TicketUpdate(priority="High", commitment_date="2030-01-31"), admin
+    ))
+    assert updated["priority"] == "High"
+    assert updated["priority_rank"] == 1
+    assert updated["commitment_sort"] == "2030-01-31"
+    assert updated["updated_at"] > ticket["updated_at"]
+
+def test_status_flow(admin, fresh_storage):
+    number = new_ticket()["ticket_number"]
+
+    with pytest.raises(HTTPException) as closed_early:
+        set_status(number, admin, status="Closed")
+    assert closed_early.value.status_code == 400
+
+    with pytest.raises(HTTPException) as missing_resolution:
+        set_status(number, admin, status="Completed", completion_remarks="Fixed the period check")
+    assert missing_resolution.value.status_code == 400
+
+    set_status(number, admin, status="In Progress")
+    set_status(number, admin, status="Completed", resolution_type="Fixed",
+               completion_remarks="Fixed the period check")
+    completed = fresh_storage.tickets.get(number)
+    assert completed["status"] == "Completed"
+    assert isinstance(completed["completed_on"], datetime)
+    assert completed["time_duration_hours"] >= 0
+    assert completed["completed_by"] == "System Admin"
+
+    set_status(number, admin, status="Closed")
+    assert isinstance(fresh_storage.tickets.get(number)["closed_at"], datetime)
+
+def test_completed_ticket_is_locked_except_remarks(admin):
+    number = new_ticket()["ticket_number"]
+    set_status(number, admin, status="Completed", resolution_type="Fixed", completion_remarks="Done")
+    developer = {"username": "dev", "full_name": "Dev", "role": "Developer"}
+
+    with pytest.raises(HTTPException) as locked:
+        asyncio.run(server.update_ticket(number, server.TicketUpdate(priority="High"), developer))
+    assert locked.value.status_code == 403
+
+    result = asyncio.run(server.update_ticket(number, server.TicketUpdate(remarks="Customer confirmed"), developer))
+    assert result == {"message": "Remarks updated successfully"}
+
+def test_dashboard_totals_include_archived_tickets(admin, fresh_storage):
+    new_ticket(issue_type="Error")
+    fresh_storage.archived_tickets.insert({"ticket_number": "2020-00001", "status": "Closed",
+                                           "issue_type": "Error", "cr_type": "Bug", "module": "PPC"})
+
+    stats = server.compute_dashboard_stats()
+    assert stats["total_tickets"] == 2
+    assert stats["status_counts"]["Closed"] == 1
+    assert stats["issue_type_counts"] == {"Error": 2}
+    assert stats["cr_type_counts"] == {"Bug": 2}
+    # Archived tickets are closed, so they never show up as pending work
+    assert sum(stats["module_pending"].values()) == 1
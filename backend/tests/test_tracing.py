@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import threading
+
+import tracing
+
+def run_request(path: str, query_string: bytes):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "PUT", "path": path, "query_string": query_string}
+    asyncio.run(tracing.TraceMiddleware(app)(scope, None, send))
+
+def test_reset_password_trace_keeps_no_plaintext(monkeypatch):
+    logged = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            logged.append(record.getMessage())
+
+    logger = logging.getLogger("test_slow_requests")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(ListHandler())
+    monkeypatch.setattr(tracing, "_slow_logger", lambda: logger)
+    # Every request counts as slow, so it is written to the log too
+    monkeypatch.setattr(tracing, "SLOW_REQUEST_MS", 0)
+    monkeypatch.setattr(tracing, "_recent", type(tracing._recent)(maxlen=10))
+
+    run_request("/api/users/bob/reset-password", b"new_password=hunter2secret&token=abc.def")
+    for thread in threading.enumerate():
+        if thread.name == "slow-request-log":
+            thread.join()
+
+    traces = tracing.slowest_requests()
+    assert traces[0]["path"] == "/api/users/bob/reset-password"
+    assert traces[0]["query"] == "new_password=redacted&token=redacted"
+    assert len(logged) == 1
+    assert "hunter2secret" not in logged[0] and "abc.def" not in logged[0]
+
+def test_list_filters_are_kept(monkeypatch):
+    monkeypatch.setattr(tracing, "_recent", type(tracing._recent)(maxlen=10))
+    run_request("/api/tickets", b"status=Open&module=PPC&q=secret+words")
+    assert tracing.slowest_requests()[0]["query"] == "status=Open&module=PPC&q=redacted"
@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import user_import
+from user_import import import_users, parse_users, validate_row
+
+@pytest.fixture(autouse=True)
+def cheap_hashing(monkeypatch):
+    # bcrypt is deliberately slow; the import logic is what is under test
+    monkeypatch.setattr(user_import, "hash_password", lambda password: f"hashed:{password}")
+
+def row(username="jdoe", password="secret1", full_name="Jane Doe", role="Developer"):
+    return {"username": username, "password": password, "full_name": full_name, "role": role}
+
+@pytest.mark.parametrize("bad_row, error", [
+    ("jdoe", "Row must be an object"),
+    ({"username": "jdoe"}, "Missing password, full_name, role"),
+    (row(full_name="   "), "Missing full_name"),
+    (row(username="j doe"), "Username must contain only letters"),
+    (row(password="abc"), "Password must be at least 6 characters"),
+    (row(role="Boss"), "Invalid role"),
+    (row(role=7), "Missing role"),
+])
+def test_validate_row_errors(bad_row, error):
+    assert validate_row(bad_row).startswith(error)
+
+def test_validate_row_accepts_every_valid_role():
+    for role in user_import.VALID_ROLES:
+        assert validate_row(row(role=role)) is None
+
+def test_import_reports_each_rejected_row(fresh_storage):
+    fresh_storage.users.insert({"username": "taken", "password": "", "full_name": "T", "role": "Manager"})
+    rows = [
+        row("alice"),
+        row("bob", role="Boss"),
+        row("taken"),
+        row("alice", full_name="Alice Again"),
+        row("carol", password="abc"),
+        row(" dave ", role=" Manager "),
+    ]
+    result = import_users(rows, "admin")
+
+    assert result["received"] == 6
+    assert result["valid"] == result["created"] == 2
+    assert [(f["row"], f["username"], f["error"].split(".")[0]) for f in result["failed"]] == [
+        (2, "bob", "Invalid role"),
+        (3, "taken", "Username already exists"),
+        (4, "alice", "Duplicate username in file"),
+        (5, "carol", "Password must be at least 6 characters"),
+    ]
+    dave = fresh_storage.users.get("dave")
+    assert dave["role"] == "Manager"
+    assert dave["password"] == "hashed:secret1"
+    assert dave["created_by"] == "admin"
+
+def test_write_errors_are_reported_per_row(fresh_storage, monkeypatch):
+    # A username taken between the existence check and the insert
+    real_insert_many = fresh_storage.users.insert_many
+
+    def insert_many_after_race(docs):
+        fresh_storage.users.insert(row("bob"))
+        return real_insert_many(docs)
+
+    monkeypatch.setattr(fresh_storage.users, "insert_many", insert_many_after_race)
+    result = import_users([row("alice"), row("bob")], "admin")
+    assert result["created"] == 1
+    assert result["failed"] == [{"row": 2, "username": "bob", "error": "Username already exists"}]
+
+def test_dry_run_writes_nothing(fresh_storage):
+    result = import_users([row("alice"), row("bob", role="Boss")], "admin", dry_run=True)
+    assert result["valid"] == 1
+    assert result["created"] == 0
+    assert len(result["failed"]) == 1
+    assert fresh_storage.users.count() == 0
+
+def test_parse_csv_and_json():
+    csv_body = "﻿username,password,full_name,role\nalice,secret1,Alice,Developer\n".encode("utf-8")
+    assert parse_users(csv_body, "csv") == [row("alice", full_name="Alice")]
+    assert parse_users(json.dumps([row()]), "json") == [row()]
+    assert parse_users(json.dumps({"users": [row()]}), "json") == [row()]
+
+@pytest.mark.parametrize("content, fmt", [
+    ("username,full_name\nalice,Alice\n", "csv"),
+    ("{not json", "json"),
+    ('{"people": []}', "json"),
+])
+def test_parse_rejects_unreadable_files(content, fmt):
+    with pytest.raises(ValueError):
+        parse_users(content, fmt)
+
+def test_module_import_loads_no_database_modules():
+    # Spawned hashing workers re-import user_import.py as __mp_main__ under the CLI
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, user_import; "
+         "print(sorted({'database', 'storage', 'pymongo'} & set(sys.modules)))"],
+        cwd=backend, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert loaded == "[]"
@@ -0,0 +1,64 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import server
+import ticket_service
+from ticket_service import create_ticket_record
+
+DEVELOPER = {"username": "annamalai", "full_name": "Annamalai", "role": "Developer"}
+
+def new_ticket(description, **fields):
+    return create_ticket_record({
+        "customer": "Acme", "cr_type": "Bug", "issue_type": "Error", "module": "PPC",
+        "description": description, "priority": "Medium", **fields
+    }, "admin", notify=None)["ticket_number"]
+
+def my_queue(user=DEVELOPER, **params):
+    return json.loads(asyncio.run(server.get_my_queue(current_user=user, **params)).body)
+
+def test_queue_orders_by_priority_commitment_then_age(fresh_storage):
+    oldest_medium = new_ticket("Stock report is empty")
+    low = new_ticket("Label printing misaligned", priority="Low")
+    due_later = new_ticket("Yarn count report missing", priority="High", commitment_date="2030-02-01")
+    undated_high = new_ticket("Production entry locked", priority="High")
+    due_soon = new_ticket("Rate master not updating", priority="High", commitment_date="2030-01-15")
+    closed = new_ticket("Attendance not synced", priority="High")
+    fresh_storage.tickets.update(closed, {"status": "Closed"})
+
+    queue = my_queue()
+    assert [t["ticket_number"] for t in queue["tickets"]] == [due_soon, due_later, undated_high, oldest_medium, low]
+    assert not queue["has_more"]
+
+def test_queue_pages(fresh_storage):
+    numbers = [new_ticket(f"Report {i} shows wrong totals") for i in range(3)]
+
+    first = my_queue(page=1, page_size=2)
+    second = my_queue(page=2, page_size=2)
+    assert [t["ticket_number"] for t in first["tickets"] + second["tickets"]] == numbers
+    assert (first["has_more"], second["has_more"]) == (True, False)
+
+def test_queue_needs_an_owner_role():
+    with pytest.raises(HTTPException) as error:
+        my_queue({"username": "manager", "full_name": "Manager", "role": "Manager"})
+    assert error.value.status_code == 400
+
+def test_backfill_derives_queue_fields_for_legacy_tickets(mongo_db, monkeypatch):
+    monkeypatch.setattr(ticket_service, "tickets_collection", mongo_db["tickets"])
+    monkeypatch.setattr(ticket_service, "bump_data_version", lambda name: None)
+    legacy_time = datetime(2023, 1, 1)
+    mongo_db["tickets"].insert_many([
+        {"ticket_number": "2023-00001", "priority": "High", "commitment_date": "2023-02-01", "updated_at": legacy_time},
+        {"ticket_number": "2023-00002", "priority": None, "commitment_date": "", "updated_at": legacy_time},
+    ])
+
+    assert ticket_service.backfill_queue_fields() == 2
+    high, unset = mongo_db["tickets"].find({}, sort=[("ticket_number", 1)])
+    assert (high["priority_rank"], high["commitment_sort"]) == (1, "2023-02-01")
+    assert (unset["priority_rank"], unset["commitment_sort"]) == (2, "9999-12-31")
+    # Moved so ETags, caches and delta sync see the new fields
+    assert high["updated_at"] > legacy_time
+    assert ticket_service.backfill_queue_fields() == 0
@@ -0,0 +1,42 @@
+import pytest
+
+import routing
+import ticket_service
+import workload
+from routing import build_snapshot, seed_routing_doc
+from workload import PendingCounts
+
+@pytest.fixture
+def counts(fresh_storage, monkeypatch):
+    counts = PendingCounts()
+    monkeypatch.setattr(ticket_service, "pending_counts", counts)
+    doc = {**seed_routing_doc(), "developer_pool_map": {"PPC": ["Annamalai", "Sasi"]}}
+    monkeypatch.setattr(routing, "_snapshot", build_snapshot(doc))
+    return counts
+
+def open_ticket(storage, number, developer):
+    storage.tickets.insert({"ticket_number": number, "developer": developer, "status": "Assigned"})
+
+def test_pool_goes_to_the_least_loaded_developer(counts, fresh_storage):
+    open_ticket(fresh_storage, "2024-00001", "Annamalai")
+
+    assert ticket_service.auto_assign_ticket("PPC")["developer"] == "Sasi"
+    assert ticket_service.auto_assign_ticket("PPC")["developer"] == "Annamalai"
+    assert counts.snapshot() == {"Annamalai": 2, "Sasi": 1}
+
+def test_assignment_never_starts_the_resync_thread(counts):
+    ticket_service.auto_assign_ticket("PPC")
+    ticket_service.auto_assign_ticket("QC")
+
+    assert not counts._started
+    assert counts.get("Annamalai") == 2
+
+def test_stale_counts_pick_up_other_processes(counts, fresh_storage, monkeypatch):
+    assert ticket_service.auto_assign_ticket("PPC")["developer"] == "Annamalai"
+    # Written by another worker; invisible until the table is rebuilt
+    for number in ("2024-00002", "2024-00003"):
+        open_ticket(fresh_storage, number, "Sasi")
+    assert ticket_service.auto_assign_ticket("PPC")["developer"] == "Sasi"
+
+    monkeypatch.setattr(workload, "WORKLOAD_RESYNC_SECONDS", 0)
+    assert ticket_service.auto_assign_ticket("PPC")["developer"] == "Annamalai"
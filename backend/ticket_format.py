@@ -0,0 +1,65 @@
+"""
+Conversion between stored ticket documents and the API representation.
+
+Tickets store cr_date, completed_on, created_at and updated_at as native
+datetimes (UTC) and the resolution time as a number of hours. The API keeps
+the legacy string fields (cr_date, cr_time, completed_on, completed_time,
+time_duration, ISO created_at/updated_at), which are derived here on output.
+Documents not yet migrated from the old string format pass through as-is.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%H:%M:%S"
+
+def as_datetime(value, time_value: Optional[str] = None) -> Optional[datetime]:
+    """Read a stored timestamp that may still be in the legacy string format"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if len(value) == 10:
+        # Legacy date-only field with a separate HH:MM:SS field
+        return datetime.strptime(f"{value} {time_value or '00:00:00'}", f"{DATE_FORMAT} {TIME_FORMAT}")
+    return datetime.fromisoformat(value)
+
+def date_and_time(value: datetime) -> tuple:
+    """(DATE_FORMAT, TIME_FORMAT) strings; one isoformat call is several times cheaper than two strftime calls"""
+    stamp = value.isoformat(" ", "seconds")
+    return stamp[:10], stamp[11:]
+
+def duration_days(cr_date: datetime, completed_on: datetime) -> int:
+    """Calendar days from CR date to completion, as the legacy time_duration counted them"""
+    return (completed_on.date() - cr_date.date()).days
+
+def ticket_to_api(ticket: dict, public_id: bool = False) -> dict:
+    """Stored ticket document -> API dict with the legacy string fields
+
+    With public_id the ticket is identified by its ticket number alone (`id`)
+    and the internal `_id` is left out.
+    """
+    result = dict(ticket)
+    if public_id:
+        result.pop("_id", None)
+        result["id"] = result.get("ticket_number")
+    elif "_id" in result:
+        result["_id"] = str(result["_id"])
+
+    cr_date = result.get("cr_date")
+    if isinstance(cr_date, datetime):
+        result["cr_date"], result["cr_time"] = date_and_time(cr_date)
+
+    completed_on = result.get("completed_on")
+    if isinstance(completed_on, datetime):
+        result["completed_on"], result["completed_time"] = date_and_time(completed_on)
+        if isinstance(cr_date, datetime):
+            result["time_duration"] = f"{duration_days(cr_date, completed_on)} days"
+    elif "completed_on" in result and "completed_time" not in result:
+        result["completed_time"] = None
+        result["time_duration"] = None
+
+    for field in ("created_at", "updated_at", "closed_at"):
+        if isinstance(result.get(field), datetime):
+            result[field] = result[field].isoformat()
+
+    return result
@@ -0,0 +1,293 @@
+"""
+Ticket service layer: numbering, auto-assignment, audit logging and notifications.
+
+Used by the API server and by batch jobs (email listener, importers) that
+create tickets directly against the database instead of going through HTTP.
+"""
+
+from typing import Callable, Optional
+from datetime import datetime
+import os
+import smtplib
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from database import tickets_collection, cache_versions_collection
+from change_feed import ticket_events
+from routing import current_routing
+from ticket_format import ticket_to_api
+from rollups import record_rollup
+from workload import pending_counts
+from duplicates import duplicate_index
+from storage import storage
+
+def reserve_ticket_numbers(year: int, count: int) -> int:
+    """Atomically reserve `count` consecutive ticket numbers for a year.
+
+    Returns the first reserved counter value.
+    """
+    return storage.counters.reserve(year, count)
+
+def format_ticket_number(year: int, counter: int) -> str:
+    return f"{year}-{str(counter).zfill(5)}"
+
+def generate_ticket_number() -> str:
+    """Generate ticket number in YYYY-00001 format"""
+    current_year = datetime.now().year
+    return format_ticket_number(current_year, reserve_ticket_numbers(current_year, 1))
+
+def auto_assign_ticket(module: str, open_ticket: bool = True) -> dict:
+    """Auto-assign Support Engineer and Developer based on module.
+
+    Modules with a developer pool go to the pool member with the fewest
+    pending tickets; the others use the fixed developer mapping. Either way
+    the new ticket is counted against the chosen developer. Tickets that are
+    not open (historical mail imported as Closed) take the fixed mapping, or
+    the pool's first developer, and are not counted.
+    """
+    routing = current_routing()
+    support_engineer = routing.support_module_map.get(module, "Unassigned")
+    pool = routing.developer_pool_map.get(module)
+    if pool and open_ticket:
+        developer = pending_counts.assign(pool)
+    elif open_ticket:
+        developer = routing.developer_module_map.get(module, "Unassigned")
+        if developer != "Unassigned":
+            pending_counts.adjust(developer, 1)
+    else:
+        developer = routing.developer_module_map.get(module) or (pool[0] if pool else "Unassigned")
+    developer_email = routing.developer_email_map.get(developer, "")
+    
+    return {
+        "support_engineer": support_engineer,
+        "developer": developer,
+        "developer_email": developer_email
+    }
+
+# Numeric priority so work queues can sort in the database; unknown values rank as Medium
+PRIORITY_RANKS = {"High": 1, "Medium": 2, "Low": 3}
+DEFAULT_PRIORITY_RANK = PRIORITY_RANKS["Medium"]
+# Tickets without a commitment date sort after every dated ticket
+NO_COMMITMENT_DATE = "9999-12-31"
+
+def queue_sort_fields(priority: Optional[str], commitment_date: Optional[str]) -> dict:
+    """Derived fields backing the personal work queue index"""
+    return {
+        "priority_rank": PRIORITY_RANKS.get(priority, DEFAULT_PRIORITY_RANK),
+        "commitment_sort": commitment_date or NO_COMMITMENT_DATE
+    }
+
+def backfill_queue_fields() -> int:
+    """Derive priority_rank/commitment_sort for tickets written before they existed
+
+    The new fields are part of the API representation, so updated_at moves and
+    the data version is bumped: ETags, cached lists and delta sync clients see
+    the change.
+    """
+    priority_branches = [
+        {"case": {"$eq": ["$priority", priority]}, "then": rank}
+        for priority, rank in PRIORITY_RANKS.items()
+    ]
+    result = tickets_collection.update_many(
+        {"priority_rank": {"$exists": False}},
+        [{"$set": {
+            "priority_rank": {"$switch": {"branches": priority_branches, "default": DEFAULT_PRIORITY_RANK}},
+            "commitment_sort": {"$cond": [
+                {"$gt": [{"$ifNull": ["$commitment_date", ""]}, ""]},
+                "$commitment_date",
+                NO_COMMITMENT_DATE
+            ]},
+            "updated_at": {"$literal": datetime.utcnow()}
+        }}]
+    )
+    if result.modified_count:
+        bump_data_version("tickets")
+    return result.modified_count
+
+def send_assignment_email(ticket_data: dict):
+    """Send email to assigned developer"""
+    try:
+        email_address = os.getenv("EMAIL_ADDRESS")
+        email_password = os.getenv("EMAIL_PASSWORD")
+        smtp_server = os.getenv("EMAIL_SMTP_SERVER", "smtp.gmail.com")
+        smtp_port = int(os.getenv("EMAIL_SMTP_PORT", 587))
+        cc_email = os.getenv("DEVELOPMENT_CC_EMAIL", "development@kalsofte.com")
+        
+        if not email_password or email_password == "your-app-password-here":
+            print("Email credentials not configured. Skipping email notification.")
+            return
+        
+        developer_email = ticket_data.get("developer_email")
+        if not developer_email:
+            print(f"No email found for developer: {ticket_data.get('developer')}")
+            return
+        
+        # Create email
+        msg = MIMEMultipart()
+        msg['From'] = email_address
+        msg['To'] = developer_email
+        msg['Cc'] = cc_email
+        msg['Subject'] = f"New CR Assigned - Ticket {ticket_data['ticket_number']}"
+        
+        body = f"""Dear Team,
+
+A new Change Request (CR) has been received and assigned.
+Please find the details below:
+
+Ticket No: {ticket_data['ticket_number']}
+Customer: {ticket_data['customer']}
+Module: {ticket_data['module']}
+Subject: {ticket_data.get('email_subject', 'N/A')}
+
+Original Message:
+{ticket_data['description']}
+
+Please review the request and take appropriate action at the earliest.
+
+Regards,
+CR Automation System"""
+        
+        msg.attach(MIMEText(body, 'plain'))
+        
+        # Send email
+        with smtplib.SMTP(smtp_server, smtp_port) as server:
+            server.starttls()
+            server.login(email_address, email_password)
+            recipients = [developer_email, cc_email]
+            server.send_message(msg, to_addrs=recipients)
+        
+        print(f"Assignment email sent to {developer_email}")
+    except Exception as e:
+        print(f"Error sending email: {str(e)}")
+
+def create_audit_log(ticket_id: str, action: str, user: str, changes: dict):
+    """Create audit log entry"""
+    storage.audit_logs.append({
+        "ticket_id": ticket_id,
+        "action": action,
+        "user": user,
+        "changes": changes,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+# Data versions for the memory backend, where there is only one worker to invalidate
+_local_data_versions = {}
+
+def bump_data_version(name: str = "tickets"):
+    """Invalidate cached results derived from a dataset, across all workers"""
+    if not storage.uses_mongo:
+        _local_data_versions[name] = _local_data_versions.get(name, 0) + 1
+        return
+    cache_versions_collection.update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+def get_data_version(name: str = "tickets") -> int:
+    if not storage.uses_mongo:
+        return _local_data_versions.get(name, 0)
+    doc = cache_versions_collection.find_one({"_id": name})
+    return doc["version"] if doc else 0
+
+def record_tombstone(ticket_doc: dict, reason: str):
+    """Record that a ticket left the live collection, for delta sync clients"""
+    record_tombstones([ticket_doc], reason)
+
+def record_tombstones(ticket_docs: list, reason: str):
+    if not ticket_docs:
+        return
+    now = datetime.utcnow()
+    storage.tombstones.append_many([
+        {
+            "ticket_id": str(ticket_doc["_id"]),
+            "ticket_number": ticket_doc["ticket_number"],
+            "reason": reason,
+            "deleted_at": now,
+            "expires_from": now
+        }
+        for ticket_doc in ticket_docs
+    ])
+
+def create_ticket_record(
+    ticket_data: dict,
+    created_by: str,
+    notify: Optional[Callable[[dict], None]] = send_assignment_email
+) -> dict:
+    """Create a ticket: number it, auto-assign it, write the audit log and notify.
+
+    `ticket_data` carries the TicketCreate fields. `notify` is called with the
+    stored ticket once it is assigned; the API passes a callable that schedules
+    the email as a background task, batch jobs may send inline or pass None.
+    """
+    # Generate ticket number
+    ticket_number = generate_ticket_number()
+    
+    # Auto-assign based on module
+    assignment = auto_assign_ticket(ticket_data["module"])
+    
+    # Get current date and time
+    now = datetime.utcnow()
+    
+    # Create ticket document
+    ticket_doc = {
+        "ticket_number": ticket_number,
+        "customer": ticket_data["customer"],
+        "cr_type": ticket_data["cr_type"],
+        "issue_type": ticket_data["issue_type"],
+        "type": ticket_data.get("type"),
+        "cr_date": now,
+        "module": ticket_data["module"],
+        "description": ticket_data["description"],
+        "amc_cost": ticket_data.get("amc_cost"),
+        "pr_approval": ticket_data.get("pr_approval"),
+        "priority": ticket_data.get("priority", "Medium"),
+        "status": "New",
+        "se_name": assignment["support_engineer"],
+        "developer": assignment["developer"],
+        "developer_email": assignment["developer_email"],
+        "planned_date": ticket_data.get("planned_date"),
+        "commitment_date": ticket_data.get("commitment_date"),
+        "completed_on": None,
+        "completed_by": None,
+        "time_duration_hours": None,
+        "resolution_type": None,
+        "completion_remarks": None,
+        "exe_sent": None,
+        "reason_for_issue": None,
+        "customer_call": None,
+        "remarks": ticket_data.get("remarks"),
+        **queue_sort_fields(ticket_data.get("priority", "Medium"), ticket_data.get("commitment_date")),
+        "created_by": created_by,
+        "created_at": now,
+        "updated_at": now
+    }
+    if ticket_data.get("email_subject"):
+        ticket_doc["email_subject"] = ticket_data["email_subject"]
+    if ticket_data.get("email_message_id"):
+        ticket_doc["email_message_id"] = ticket_data["email_message_id"]
+    
+    # Flag probable duplicates of recent tickets from the same customer and module
+    duplicate = duplicate_index.find(ticket_doc)
+    if duplicate:
+        ticket_doc["possible_duplicate_of"] = duplicate["ticket_number"]
+        ticket_doc["duplicate_similarity"] = duplicate["similarity"]
+    
+    # Insert ticket
+    storage.tickets.insert(ticket_doc)
+    duplicate_index.add(ticket_doc)
+    
+    # Update status to Assigned
+    storage.tickets.update(ticket_number, {"status": "Assigned"})
+    ticket_doc["status"] = "Assigned"
+    ticket_events.publish_local("created", ticket_doc)
+    
+    ticket = ticket_to_api(ticket_doc)
+    bump_data_version("tickets")
+    if storage.uses_mongo:
+        record_rollup(now, "opened", ticket_doc)
+    
+    # Create audit log
+    create_audit_log(ticket["_id"], "created", created_by, ticket)
+    
+    # Send assignment email
+    if notify:
+        notify(ticket)
+    
+    return ticket
@@ -0,0 +1,304 @@
+"""
+Per-request database tracing and the slow-request log.
+
+TraceMiddleware opens a trace for every HTTP request; the pymongo command
+listener below appends each MongoDB command issued while handling it (the
+trace lives in a ContextVar, which is also copied into threadpool handlers
+and tasks; commands arriving after the request finished are ignored). A
+command records its collection, the shape of its filter (field names and
+operators, values replaced by their type), duration, documents returned and
+the server (replica set member) that answered it.
+
+Requests slower than SLOW_REQUEST_MS are written as JSON lines to a rotating
+log (SLOW_REQUEST_LOG). For those, the slowest read commands are re-run with
+explain("executionStats") on a background thread to add documents and keys
+examined. The most recent TRACE_BUFFER_SIZE traces are kept in memory for
+GET /api/admin/slow-requests. Only the query parameters in TRACED_PARAMS keep
+their values; the rest (tokens, passwords, search text) are stored redacted.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from pymongo import monitoring
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG", "slow_requests.log")
+SLOW_REQUEST_LOG_MAX_BYTES = int(os.getenv("SLOW_REQUEST_LOG_MAX_BYTES", 10 * 1024 * 1024))
+SLOW_REQUEST_LOG_BACKUPS = int(os.getenv("SLOW_REQUEST_LOG_BACKUPS", 5))
+SLOW_REQUEST_EXPLAIN = os.getenv("SLOW_REQUEST_EXPLAIN", "true").lower() == "true"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 500))
+# Commands kept per trace; a request issuing more only counts the rest
+TRACE_MAX_COMMANDS = 200
+EXPLAIN_MAX_COMMANDS = 5
+
+EXPLAINABLE_COMMANDS = ("find", "aggregate", "count", "distinct")
+# Query parameters recorded as sent; every other value (token, new_password, ...) is redacted
+TRACED_PARAMS = frozenset({
+    "status", "module", "customer", "developer", "se_name", "cr_type", "issue_type",
+    "from_date", "to_date", "updated_since", "include_archived", "public_ids",
+    "page", "page_size", "limit", "days", "dimension", "key", "dry_run", "profile"
+})
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+_recent = deque(maxlen=TRACE_BUFFER_SIZE)
+_recent_lock = threading.Lock()
+_slow_log = None
+_slow_log_lock = threading.Lock()
+
+def filter_shape(value):
+    """Query with every literal replaced by its type name, e.g. {"status": {"$in": "list"}}"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [filter_shape(item) for item in value]
+        return "list"
+    return type(value).__name__
+
+def command_shape(command_name: str, command: dict):
+    if command_name == "find":
+        return {"filter": filter_shape(command.get("filter", {})), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        stages = []
+        for stage in command.get("pipeline", []):
+            name = next(iter(stage), "")
+            stages.append({name: filter_shape(stage[name])} if name == "$match" else name)
+        return {"pipeline": stages}
+    if command_name in ("count", "distinct", "findAndModify"):
+        return {"filter": filter_shape(command.get("query") or {})}
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or []
+        return {"filter": filter_shape(statements[0].get("q", {})) if statements else None,
+                "statements": len(statements)}
+    if command_name == "insert":
+        return {"documents": len(command.get("documents", []))}
+    return None
+
+def docs_returned(command_name: str, reply: dict) -> Optional[int]:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    if "n" in reply:
+        return reply["n"]
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    return None
+
+class RequestTrace:
+    def __init__(self, method: str, path: str, query_string: str):
+        self.method = method
+        self.path = path
+        self.query = query_string
+        self.started_at = datetime.utcnow()
+        self.status = None
+        self.duration_ms = None
+        self.commands = []
+        self.command_count = 0
+        self.db_time_ms = 0.0
+        self._pending = {}
+        # (database, command) per entry in self.commands, for explain; never serialised
+        self._raw_commands = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def command_started(self, event):
+        if self._closed:
+            return
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._pending[(event.connection_id, event.request_id)] = (
+            target if isinstance(target, str) else "", event.command
+        )
+
+    def command_finished(self, event, reply: Optional[dict], error: Optional[str] = None):
+        collection, command = self._pending.pop((event.connection_id, event.request_id), ("", None))
+        duration_ms = event.duration_micros / 1000
+        host, port = event.connection_id
+        entry = {
+            "command": event.command_name,
+            "collection": collection,
+            # Which replica set member served it (see MONGO_REPORTING_READ_PREFERENCE)
+            "server": f"{host}:{port}" if port else host,
+            "duration_ms": round(duration_ms, 3),
+            "shape": command_shape(event.command_name, command or {}),
+            "docs_returned": docs_returned(event.command_name, reply) if reply else None
+        }
+        if error:
+            entry["error"] = error
+        with self._lock:
+            # e.g. a ResponseCache computation that outlived the request that started it
+            if self._closed:
+                return
+            self.command_count += 1
+            self.db_time_ms += duration_ms
+            if len(self.commands) >= TRACE_MAX_COMMANDS:
+                return
+            self.commands.append(entry)
+            self._raw_commands.append((event.database_name, command))
+
+    def close(self) -> list:
+        """Stop recording; returns the raw (database, command) of each entry in self.commands"""
+        with self._lock:
+            self._closed = True
+            raw_commands, self._raw_commands = self._raw_commands, []
+        self._pending.clear()
+        return raw_commands
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "db_commands": self.command_count,
+            "db_time_ms": round(self.db_time_ms, 3),
+            "commands": [dict(entry) for entry in self.commands]
+        }
+
+class TraceCommandListener(monitoring.CommandListener):
+    """Adds every MongoDB command to the trace of the request that issued it"""
+
+    def started(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.command_started(event)
+
+    def succeeded(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.command_finished(event, event.reply)
+
+    def failed(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.command_finished(event, None, str(event.failure.get("errmsg", "")))
+
+trace_command_listener = TraceCommandListener()
+
+def _redact(query_string: str) -> str:
+    params = [(key, value if key in TRACED_PARAMS else "redacted")
+              for key, value in parse_qsl(query_string, keep_blank_values=True)]
+    return urlencode(params)
+
+def _slow_logger() -> logging.Logger:
+    global _slow_log
+    with _slow_log_lock:
+        if _slow_log is None:
+            _slow_log = logging.getLogger("slow_requests")
+            _slow_log.propagate = False
+            _slow_log.setLevel(logging.INFO)
+            handler = RotatingFileHandler(
+                SLOW_REQUEST_LOG, maxBytes=SLOW_REQUEST_LOG_MAX_BYTES, backupCount=SLOW_REQUEST_LOG_BACKUPS
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _slow_log.addHandler(handler)
+        return _slow_log
+
+def _execution_stats(explain_result: dict) -> Optional[dict]:
+    """Find the executionStats section, wherever this server version puts it"""
+    if isinstance(explain_result, dict):
+        stats = explain_result.get("executionStats")
+        if isinstance(stats, dict) and "totalDocsExamined" in stats:
+            return stats
+        children = explain_result.values()
+    elif isinstance(explain_result, list):
+        children = explain_result
+    else:
+        return None
+    for child in children:
+        if isinstance(child, (dict, list)):
+            stats = _execution_stats(child)
+            if stats:
+                return stats
+    return None
+
+def _explain(database_name: str, command: dict) -> dict:
+    # Imported here: database.py registers this module's listener on the client
+    from database import client
+
+    explained = {key: value for key, value in command.items()
+                 if key not in ("lsid", "$clusterTime", "$db", "$readPreference", "txnNumber")}
+    stats = _execution_stats(
+        client[database_name].command({"explain": explained, "verbosity": "executionStats"})
+    ) or {}
+    return {"docs": stats.get("totalDocsExamined"), "keys": stats.get("totalKeysExamined")}
+
+def _log_slow_request(trace: RequestTrace, to_explain: list):
+    for entry, (database_name, command) in to_explain:
+        try:
+            entry["examined"] = _explain(database_name, command)
+        except Exception as e:
+            entry["examined"] = {"error": str(e)}
+    _slow_logger().info(json.dumps(trace.to_dict(), default=str))
+
+def finish_trace(trace: RequestTrace):
+    slow = trace.duration_ms is not None and trace.duration_ms >= SLOW_REQUEST_MS
+    raw_commands = trace.close()
+    to_explain = []
+    if slow and SLOW_REQUEST_EXPLAIN:
+        reads = [(entry, raw) for entry, raw in zip(trace.commands, raw_commands)
+                 if entry["command"] in EXPLAINABLE_COMMANDS and raw[1] is not None]
+        for entry, raw in sorted(reads, key=lambda read: read[0]["duration_ms"], reverse=True)[:EXPLAIN_MAX_COMMANDS]:
+            # Filled in by the logging thread; the key exists up front so readers never see it appear
+            entry["examined"] = None
+            to_explain.append((entry, raw))
+
+    with _recent_lock:
+        _recent.append(trace)
+    if slow:
+        threading.Thread(
+            target=_log_slow_request, args=(trace, to_explain), name="slow-request-log", daemon=True
+        ).start()
+
+def slowest_requests(limit: int = 20) -> list:
+    with _recent_lock:
+        traces = list(_recent)
+    traces.sort(key=lambda trace: trace.duration_ms or 0, reverse=True)
+    return [trace.to_dict() for trace in traces[:limit]]
+
+class TraceMiddleware:
+    """ASGI middleware opening a RequestTrace for each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"], _redact(scope.get("query_string", b"").decode("latin-1")))
+        started = time.perf_counter()
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                # Time to first byte, so long-lived streams are not reported as slow
+                trace.status = message["status"]
+                trace.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            await send(message)
+
+        token = current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            current_trace.reset(token)
+            if trace.status is None:
+                trace.status = 500
+                trace.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            finish_trace(trace)
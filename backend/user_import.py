@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Bulk User Import for ERP Ticketing System
+Creates many users at once from a CSV or JSON file
+
+Usage:
+    python user_import.py staff.csv --created-by admin --workers 8
+
+CSV files need a header row with username, password, full_name and role;
+JSON files hold a list of objects with the same fields (or {"users": [...]}).
+The same import is available to admins as POST /api/users/import.
+
+Rows are validated like POST /api/users and self-registration (username
+format, password length, role), usernames already taken or repeated in the
+file are rejected, and the passwords of the remaining rows are bcrypt-hashed
+across a process pool: bcrypt is deliberately slow (~0.25 s per hash), so
+1,000 users take minutes on one core. All valid rows are then written with
+one unordered insert_many. Every rejected row is reported with its 1-based
+position among the records and the reason; the other rows are still created.
+"""
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+# Nothing here may import database.py at module level: spawned hashing workers
+# re-import the parent's __main__, which is this file when run as a script
+from passwords import hash_password
+
+VALID_ROLES = ["Admin", "Support Engineer", "Developer", "Manager"]
+REQUIRED_FIELDS = ("username", "password", "full_name", "role")
+USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_]+$')
+MIN_PASSWORD_LENGTH = 6
+
+USER_IMPORT_MAX_ROWS = int(os.getenv("USER_IMPORT_MAX_ROWS", 5000))
+USER_IMPORT_WORKERS = int(os.getenv("USER_IMPORT_WORKERS", os.cpu_count() or 1))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_hash_executor() -> ProcessPoolExecutor:
+    """Process pool shared by API imports, started on first use
+
+    Workers are spawned rather than forked so they do not inherit the API's
+    MongoClient and threads. A spawned worker imports the parent's __main__
+    module (uvicorn under the API, this file under the CLI) and passwords.py.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=USER_IMPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+def shutdown_hash_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+def detect_format(filename: str = "", content_type: str = "") -> str:
+    if "csv" in content_type or filename.lower().endswith(".csv"):
+        return "csv"
+    return "json"
+
+def parse_users(content, fmt: str) -> list:
+    """CSV or JSON content -> list of row dicts; raises ValueError when the file itself is unreadable"""
+    if isinstance(content, bytes):
+        # utf-8-sig: spreadsheet exports often start with a BOM
+        content = content.decode("utf-8-sig")
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(content))
+        missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(missing)}")
+        return list(reader)
+
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get("users")
+    if not isinstance(data, list):
+        raise ValueError('JSON must be a list of users or {"users": [...]}')
+    return data
+
+def validate_row(row) -> Optional[str]:
+    """Reason the row cannot be imported, or None"""
+    if not isinstance(row, dict):
+        return "Row must be an object with username, password, full_name and role"
+    missing = [field for field in REQUIRED_FIELDS if not isinstance(row.get(field), str) or not row[field].strip()]
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    if not USERNAME_PATTERN.match(row["username"].strip()):
+        return "Username must contain only letters, numbers, and underscores"
+    if len(row["password"]) < MIN_PASSWORD_LENGTH:
+        return f"Password must be at least {MIN_PASSWORD_LENGTH} characters"
+    if row["role"].strip() not in VALID_ROLES:
+        return f"Invalid role. Must be one of: {', '.join(VALID_ROLES)}"
+    return None
+
+def hash_passwords(passwords: list, executor: Optional[ProcessPoolExecutor] = None) -> list:
+    """bcrypt hashes in input order, computed across the executor's processes"""
+    if executor is None or len(passwords) < 2:
+        return [hash_password(password) for password in passwords]
+    workers = getattr(executor, "_max_workers", 1)
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(executor.map(hash_password, passwords, chunksize=chunksize))
+
+def import_users(rows: list, created_by: str, executor: Optional[ProcessPoolExecutor] = None,
+                 dry_run: bool = False) -> dict:
+    """Validate, hash and insert `rows`; returns counts and the per-row errors"""
+    from storage import storage
+
+    failed = []
+    accepted = []
+    existing = {user["username"] for user in storage.users.list()}
+    seen = set()
+    for position, row in enumerate(rows, start=1):
+        username = row.get("username") if isinstance(row, dict) else None
+        error = validate_row(row)
+        if error is None:
+            username = username.strip()
+            if username in existing:
+                error = "Username already exists"
+            elif username in seen:
+                error = "Duplicate username in file"
+        if error:
+            failed.append({"row": position, "username": username, "error": error})
+            continue
+        seen.add(username)
+        accepted.append((position, row))
+
+    created = 0
+    if accepted and not dry_run:
+        hashes = hash_passwords([row["password"] for _, row in accepted], executor)
+        now = datetime.utcnow().isoformat()
+        docs = [{
+            "username": row["username"].strip(),
+            "password": password_hash,
+            "full_name": row["full_name"].strip(),
+            "role": row["role"].strip(),
+            "created_at": now,
+            "created_by": created_by
+        } for (_, row), password_hash in zip(accepted, hashes)]
+
+        # Usernames taken since the check above come back as write errors
+        write_errors = storage.users.insert_many(docs)
+        for index, message in sorted(write_errors.items()):
+            position, row = accepted[index]
+            error = "Username already exists" if "E11000" in message else message
+            failed.append({"row": position, "username": row["username"].strip(), "error": error})
+        created = len(docs) - len(write_errors)
+        failed.sort(key=lambda failure: failure["row"])
+
+    return {
+        "received": len(rows),
+        "created": created,
+        "valid": len(accepted),
+        "failed": failed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Create users in bulk from a CSV or JSON file")
+    parser.add_argument("path", help="CSV (username,password,full_name,role) or JSON file")
+    parser.add_argument("--format", choices=["auto", "csv", "json"], default="auto")
+    parser.add_argument("--workers", type=int, default=USER_IMPORT_WORKERS)
+    parser.add_argument("--created-by", default="user_import")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without creating users")
+    args = parser.parse_args()
+
+    fmt = detect_format(args.path) if args.format == "auto" else args.format
+    with open(args.path, "rb") as f:
+        rows = parse_users(f.read(), fmt)
+
+    print("=" * 70)
+    print("ERP TICKETING SYSTEM - BULK USER IMPORT")
+    print("=" * 70)
+
+    started = datetime.utcnow()
+    # Spawned, not forked: import_users opens a MongoClient in this process before the workers start
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        result = import_users(rows, args.created_by, executor, dry_run=args.dry_run)
+    elapsed = (datetime.utcnow() - started).total_seconds()
+
+    for failure in result["failed"]:
+        print(f"  row {failure['row']} ({failure['username']}): {failure['error']}")
+    print("=" * 70)
+    print(f"Received: {result['received']}  Valid: {result['valid']}  "
+          f"Created: {result['created']}  Failed: {len(result['failed'])}  ({elapsed:.1f}s)")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
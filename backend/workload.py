@@ -0,0 +1,95 @@
+"""
+Live pending-ticket counts per developer, used for workload-aware assignment.
+
+The table is built once from a single aggregation and then kept current
+incrementally: assignment counts the new ticket immediately and status
+changes move tickets in and out of the open set. Writes made by other
+processes are folded in by a resync every WORKLOAD_RESYNC_SECONDS, so
+assignment never issues a counting query per ticket. The API server runs the
+resync in a background thread (start()); short-lived processes such as the
+mbox importer and the email listener never start it and instead rebuild the
+table inline when pool assignment finds it stale.
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Sequence
+
+from pymongo.errors import PyMongoError
+
+from storage import storage
+
+OPEN_STATUSES = ("New", "Assigned", "In Progress", "Pending")
+WORKLOAD_RESYNC_SECONDS = float(os.getenv("WORKLOAD_RESYNC_SECONDS", 30))
+
+class PendingCounts:
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._started = False
+        # time.monotonic() of the last rebuild; None until the table is first built
+        self._built_at = None
+
+    def rebuild(self):
+        counts = storage.tickets.count_by("developer", {"status": {"$in": list(OPEN_STATUSES)}})
+        with self._lock:
+            self._counts = counts
+            self._built_at = time.monotonic()
+
+    def refresh_if_stale(self):
+        """Rebuild inline when the table was never built or missed its resync"""
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at >= WORKLOAD_RESYNC_SECONDS:
+            self.rebuild()
+
+    def start(self):
+        """Build the table and start the periodic resync thread (idempotent; API server only)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.rebuild()
+        threading.Thread(target=self._resync_loop, name="workload-resync", daemon=True).start()
+
+    def _resync_loop(self):
+        while True:
+            time.sleep(WORKLOAD_RESYNC_SECONDS)
+            try:
+                self.rebuild()
+            except PyMongoError as e:
+                print(f"Error resyncing pending counts: {str(e)}")
+
+    def get(self, developer: str) -> int:
+        return self._counts.get(developer, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+    def adjust(self, developer: Optional[str], delta: int):
+        if not developer:
+            return
+        with self._lock:
+            self._counts[developer] = max(0, self._counts.get(developer, 0) + delta)
+
+    def assign(self, pool: Sequence[str]) -> str:
+        """Pick the least-loaded developer in the pool and count the new ticket.
+
+        Ties go to the earliest developer in the pool's configured order.
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            developer = min(pool, key=lambda name: self._counts.get(name, 0))
+            self._counts[developer] = self._counts.get(developer, 0) + 1
+        return developer
+
+    def on_status_change(self, developer: Optional[str], old_status: str, new_status: str):
+        was_open = old_status in OPEN_STATUSES
+        is_open = new_status in OPEN_STATUSES
+        if was_open and not is_open:
+            self.adjust(developer, -1)
+        elif is_open and not was_open:
+            self.adjust(developer, 1)
+
+pending_counts = PendingCounts()
@@ -4,6 +4,11 @@ import { useNavigate } from 'react-router-dom';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL || '';
 
+const newIdempotencyKey = () =>
+  (window.crypto && window.crypto.randomUUID)
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 function CreateTicket({ user }) {
   const navigate = useNavigate();
   const [modules, setModules] = useState([]);
@@ -23,6 +28,8 @@ function CreateTicket({ user }) {
   });
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState('');
+  // One key per form submission so retried requests don't create duplicate tickets
+  const [idempotencyKey, setIdempotencyKey] = useState(newIdempotencyKey);
 
   useEffect(() => {
     fetchModules();
@@ -39,6 +46,7 @@ function CreateTicket({ user }) {
 
   const handleChange = (field, value) => {
     setFormData(prev => ({ ...prev, [field]: value }));
+    setIdempotencyKey(newIdempotencyKey());
   };
 
   const handleSubmit = async (e) => {
@@ -47,7 +55,9 @@ function CreateTicket({ user }) {
     setMessage('');
 
     try {
-      const response = await axios.post(`${API_URL}/api/tickets`, formData);
+      const response = await axios.post(`${API_URL}/api/tickets`, formData, {
+        headers: { 'Idempotency-Key': idempotencyKey }
+      });
       setMessage(`Ticket ${response.data.ticket_number} created successfully!`);
       
       // Reset form
@@ -1,40 +1,52 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL || '';
 
+const EMPTY_FILTERS = {
+  status: '',
+  module: '',
+  customer: '',
+  developer: '',
+  se_name: '',
+  cr_type: '',
+  issue_type: '',
+  from_date: '',
+  to_date: ''
+};
+
+const EXACT_FILTERS = ['status', 'module', 'developer', 'se_name', 'cr_type', 'issue_type'];
+
+// Same rules as the GET /api/tickets filters, for tickets pushed over the stream
+const matchesFilters = (ticket, active) => {
+  if (EXACT_FILTERS.some(key => active[key] && ticket[key] !== active[key])) return false;
+  if (active.customer && !(ticket.customer || '').toLowerCase().includes(active.customer.toLowerCase())) return false;
+  if (active.from_date && !(ticket.cr_date >= active.from_date)) return false;
+  if (active.to_date && !(ticket.cr_date <= active.to_date)) return false;
+  return true;
+};
+
+// Newest first by CR date and time, as the list endpoint sorts
+const crStamp = (ticket) => `${ticket.cr_date || ''} ${ticket.cr_time || ''}`;
+
 function TicketList({ user }) {
   const [tickets, setTickets] = useState([]);
   const [loading, setLoading] = useState(true);
-  const [filters, setFilters] = useState({
-    status: '',
-    module: '',
-    customer: '',
-    developer: '',
-    se_name: '',
-    cr_type: '',
-    issue_type: '',
-    from_date: '',
-    to_date: ''
-  });
+  const [filters, setFilters] = useState(EMPTY_FILTERS);
+  // Filters the loaded list was fetched with (edits apply only on Apply / Refresh)
+  const appliedFilters = useRef(EMPTY_FILTERS);
   const [modules, setModules] = useState([]);
   const [developers, setDevelopers] = useState([]);
   const [supportEngineers, setSupportEngineers] = useState([]);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    fetchTickets();
-    fetchModules();
-    fetchDevelopers();
-    fetchSupportEngineers();
-  }, []);
-
-  const fetchTickets = async () => {
+  const fetchTickets = useCallback(async (active) => {
     setLoading(true);
+    appliedFilters.current = active;
     try {
       const params = new URLSearchParams();
-      Object.entries(filters).forEach(([key, value]) => {
+      Object.entries(active).forEach(([key, value]) => {
         if (value) params.append(key, value);
       });
       
@@ -45,7 +57,50 @@ function TicketList({ user }) {
     } finally {
       setLoading(false);
     }
-  };
+  }, []);
+
+  useEffect(() => {
+    fetchTickets(EMPTY_FILTERS);
+    fetchModules();
+    fetchDevelopers();
+    fetchSupportEngineers();
+  }, [fetchTickets]);
+
+  // Apply pushed ticket changes to the loaded list instead of re-downloading it
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!token || !window.EventSource) return undefined;
+
+    const source = new EventSource(`${API_URL}/api/tickets/stream?token=${encodeURIComponent(token)}`);
+    const applyChange = (event) => {
+      const change = JSON.parse(event.data);
+      if (!change.ticket) {
+        setTickets(prev => prev.filter(t => t._id !== change.ticket_id));
+        return;
+      }
+      setTickets(prev => {
+        const index = prev.findIndex(t => t.ticket_number === change.ticket_number);
+        // Tickets that stop matching the filters (e.g. a status change) leave the list
+        if (!matchesFilters(change.ticket, appliedFilters.current)) {
+          return index === -1 ? prev : prev.filter((_, i) => i !== index);
+        }
+        if (index !== -1) {
+          const next = [...prev];
+          next[index] = change.ticket;
+          return next;
+        }
+        if (change.type === 'created') return [change.ticket, ...prev];
+        // Edited into the filtered view: place it where a reload would
+        const stamp = crStamp(change.ticket);
+        const at = prev.findIndex(t => crStamp(t) < stamp);
+        return at === -1 ? [...prev, change.ticket] : [...prev.slice(0, at), change.ticket, ...prev.slice(at)];
+      });
+    };
+    ['created', 'updated', 'status_changed', 'deleted'].forEach(type => source.addEventListener(type, applyChange));
+    source.addEventListener('reset', () => fetchTickets(appliedFilters.current));
+
+    return () => source.close();
+  }, [fetchTickets]);
 
   const fetchModules = async () => {
     try {
@@ -79,21 +134,11 @@ function TicketList({ user }) {
   };
 
   const handleApplyFilters = () => {
-    fetchTickets();
+    fetchTickets(filters);
   };
 
   const handleClearFilters = () => {
-    setFilters({
-      status: '',
-      module: '',
-      customer: '',
-      developer: '',
-      se_name: '',
-      cr_type: '',
-      issue_type: '',
-      from_date: '',
-      to_date: ''
-    });
+    setFilters(EMPTY_FILTERS);
   };
 
   const getStatusClass = (status) => {